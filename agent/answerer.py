@@ -1,33 +1,63 @@
-import json
+import json, contextvars
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
-from agent.llm import llm_array
+from agent.llm import llm_array, LLMError
+from agent.deadline import Deadline
+from agent.trace import span
 from agent.prompts import ANSWERER_SYSTEM, ANSWERER_USER_TEMPLATE
 from app.settings import settings
 
 _DEF_BATCH = 3
 
-def _artefacts_excerpt(artefacts: Dict[str, Any], keys: List[str]|None=None) -> str:
-    items = []
+def _excerpt_lines(artefacts: Dict[str, Any]) -> Dict[str, str]:
+    # Built once per request; batches pick the lines they need
+    lines = {}
     for k, v in artefacts.items():
-        if keys and k not in keys: 
-            continue
         if isinstance(v, (dict, list)):
             s = json.dumps(v)[:1200]
         else:
             s = str(v)[:1200]
-        items.append(f"- {k}: {s}")
-    return "\n".join(items)
+        lines[k] = f"- {k}: {s}"
+    return lines
 
-def batch_answer(questions: List[str], artefacts: Dict[str, Any]) -> List[Any]:
+def _artefacts_excerpt(artefacts: Dict[str, Any], keys: List[str]|None=None, lines: Dict[str, str]|None=None) -> str:
+    lines = lines if lines is not None else _excerpt_lines(artefacts)
+    return "\n".join(line for k, line in lines.items() if not keys or k in keys)
+
+def batch_answer(questions: List[str], artefacts: Dict[str, Any],
+                 question_keys: List[List[str]]|None=None, deadline: Deadline|None=None,
+                 strict: bool=True) -> List[Any]:
+    """Answer questions in concurrent batches of _DEF_BATCH.
+
+    question_keys[i] optionally lists the artefacts question i needs; a batch
+    then only sees the union of its questions' keys. With strict=False a batch
+    that fails or runs out of time leaves its answers as None.
+    """
     answers = [None] * len(questions)
-    for i in range(0, len(questions), _DEF_BATCH):
-        idxs = list(range(i, min(i+_DEF_BATCH, len(questions))))
-        qs = [questions[j] for j in idxs]
+    lines = _excerpt_lines(artefacts)
+    batches = [list(range(i, min(i+_DEF_BATCH, len(questions)))) for i in range(0, len(questions), _DEF_BATCH)]
+
+    def run(idxs: List[int]):
+        keys = None
+        if question_keys:
+            keys = sorted({k for j in idxs if j < len(question_keys) for k in (question_keys[j] or [])}) or None
         user = ANSWERER_USER_TEMPLATE.format(
             indices=idxs,
-            artefacts_excerpt=_artefacts_excerpt(artefacts)
+            artefacts_excerpt=_artefacts_excerpt(artefacts, keys, lines)
         )
-        batch = llm_array(ANSWERER_SYSTEM, user, model=settings.MODEL_ANSWERER)
-        for j, val in zip(idxs, batch):
-            answers[j] = val
+        try:
+            with span("answer.batch", bytes_in=len(user)):
+                return llm_array(ANSWERER_SYSTEM, user, model=settings.MODEL_ANSWERER,
+                             deadline=deadline.at if deadline else None)
+        except LLMError:
+            if strict:
+                raise
+            return []
+
+    workers = max(1, min(settings.ANSWER_CONCURRENCY, len(batches)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, run, b) for b in batches]
+        for idxs, batch in zip(batches, (f.result() for f in futures)):
+            for j, val in zip(idxs, batch if isinstance(batch, list) else []):
+                answers[j] = val
     return answers
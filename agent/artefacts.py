@@ -0,0 +1,47 @@
+from __future__ import annotations
+import os, shutil
+
+# --- Handoff of artefacts into job directories (copy-on-write where the fs allows) ---
+_FICLONE = 0x40049409  # Linux ioctl: share extents, copy-on-write (btrfs, xfs, ...)
+
+def _reflink(src: str, dst: str) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as fs, open(dst, "wb") as fd:
+            fcntl.ioctl(fd.fileno(), _FICLONE, fs.fileno())
+        return True
+    except OSError:
+        try: os.remove(dst)
+        except OSError: pass
+        return False
+
+def link_file(src: str, dst: str) -> str:
+    """Expose src at dst as an independent file: a reflink (copy-on-write) or a streamed copy.
+
+    Never a hardlink or symlink: jobs run with the server's uid (root in the
+    image), which ignores mode bits, so a job opening a shared inode with "w"
+    would rewrite the upstream artefact and any memo entry behind it.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if _reflink(src, dst):
+        return "reflink"
+    shutil.copyfile(src, dst)
+    return "copy"
+
+def link_tree(src: str, dst: str) -> None:
+    if os.path.exists(dst):
+        shutil.rmtree(dst)
+    shutil.copytree(src, dst, copy_function=link_file)
+
+def link_input(src: str, dst: str) -> str:
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return dst
+    if os.path.isdir(src):
+        link_tree(src, dst)
+    else:
+        link_file(src, dst)
+    return dst
@@ -0,0 +1,141 @@
+from __future__ import annotations
+import os, re, sqlite3, threading
+from typing import Any, Dict, List
+from app.settings import settings
+
+_IDENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_sqlite_ext: bool | None = None  # DuckDB's sqlite scanner usable? (probed once per process)
+
+def _quote(path: str) -> str:
+    return "'" + path.replace("'", "''") + "'"
+
+class Catalog:
+    """One DuckDB database per request.
+
+    Artefacts are bound once under an alias: tables become views over the
+    csv/parquet files (arrow files are registered memory-mapped), JSON files
+    become read_json_auto views and SQLite databases are attached as a schema.
+    Queries run on per-thread cursors over the same database and return Arrow.
+    """
+
+    def __init__(self, temp_dir: str|None = None):
+        import duckdb
+        self.con = duckdb.connect()
+        self.con.execute(f"SET memory_limit={_quote(settings.DUCKDB_MEMORY_LIMIT)}")
+        if settings.DUCKDB_THREADS:
+            self.con.execute(f"SET threads={int(settings.DUCKDB_THREADS)}")
+        if temp_dir:
+            self.con.execute(f"SET temp_directory={_quote(temp_dir)}")
+        self._lock = threading.Lock()
+        self._bound: Dict[str, str] = {}
+        self._arrow: Dict[str, Any] = {}  # registered objects are per connection: re-registered on each cursor
+        self._cursors: List[Any] = []
+
+    def bind(self, alias: str, value: Any) -> None:
+        if not _IDENT.fullmatch(alias):
+            raise ValueError(f"Invalid table name for duckdb_query: {alias!r}")
+        if isinstance(value, list):
+            for i, v in enumerate(value):
+                self.bind(f"{alias}_{i}", v)
+            return
+        path = str(value)
+        with self._lock:
+            if self._bound.get(alias) == path:
+                return
+            if alias in self._bound:
+                raise ValueError(f"{alias} is already bound to {self._bound[alias]}")
+            self._attach(alias, path)
+            self._bound[alias] = path
+
+    def _attach(self, alias: str, path: str) -> None:
+        p = path.lower()
+        if p.endswith((".sqlite", ".sqlite3", ".db")):
+            self._attach_sqlite(alias, path)
+        elif p.endswith(".parquet"):
+            self.con.execute(f"CREATE VIEW {alias} AS SELECT * FROM read_parquet({_quote(path)})")
+        elif p.endswith((".arrow", ".feather")):
+            import pyarrow.feather as feather
+            self._arrow[alias] = feather.read_table(path, memory_map=True)
+        elif p.endswith(".json"):
+            self.con.execute(f"CREATE VIEW {alias} AS SELECT * FROM read_json_auto({_quote(path)})")
+        else:
+            self.con.execute(f"CREATE VIEW {alias} AS SELECT * FROM read_csv_auto({_quote(path)})")
+
+    def _attach_sqlite(self, alias: str, path: str) -> None:
+        global _sqlite_ext
+        if _sqlite_ext is not False:
+            try:
+                self.con.execute("INSTALL sqlite; LOAD sqlite")
+                self.con.execute(f"ATTACH {_quote(path)} AS {alias} (TYPE sqlite, READ_ONLY)")
+                _sqlite_ext = True
+                return
+            except Exception:
+                _sqlite_ext = False  # offline/no extension: copy the tables in instead
+        import pandas as pd
+        src = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            self.con.execute(f"CREATE SCHEMA {alias}")
+            tables = [r[0] for r in src.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+            for t in tables:
+                df = pd.read_sql_query(f'SELECT * FROM "{t}"', src)
+                self.con.register("_sqlite_tmp", df)
+                self.con.execute(f'CREATE TABLE {alias}."{t}" AS SELECT * FROM _sqlite_tmp')
+                self.con.unregister("_sqlite_tmp")
+        finally:
+            src.close()
+
+    def query(self, sql: str):
+        """Run sql on a fresh cursor (safe alongside other threads); returns a pyarrow.Table."""
+        with self._lock:
+            cur = self.con.cursor()
+            self._cursors.append(cur)
+            arrow = dict(self._arrow)
+        try:
+            for alias, table in arrow.items():
+                cur.register(alias, table)
+            return cur.execute(sql).fetch_arrow_table()
+        finally:
+            with self._lock:
+                self._cursors.remove(cur)
+            cur.close()
+
+    def close(self) -> None:
+        # Abandoned steps (deadline) may still be scanning: interrupt them first
+        with self._lock:
+            for cur in self._cursors:
+                try: cur.interrupt()
+                except Exception: pass
+        self.con.close()
+
+# --- Arrow results to artefacts ---
+def _scalar(v: Any) -> Any:
+    import decimal, datetime
+    if isinstance(v, decimal.Decimal):  # SUM over integers is DECIMAL(38,0) in DuckDB
+        return int(v) if v.is_finite() and v == v.to_integral_value() else float(v)
+    if isinstance(v, (datetime.date, datetime.datetime, datetime.time)):
+        return v.isoformat()
+    return v
+
+def arrow_to_json(table) -> Any:
+    """1x1 results become a scalar, single-column results a list, anything else a list of records."""
+    rows = table.to_pylist()
+    if table.num_columns == 1:
+        col = [_scalar(r[table.column_names[0]]) for r in rows]
+        return col[0] if len(col) == 1 else col
+    return [{k: _scalar(v) for k, v in r.items()} for r in rows]
+
+def save_arrow(table, out_path: str, fmt: str = "csv") -> str:
+    """Write a pyarrow.Table as csv, parquet or arrow without going through pandas."""
+    from agent.tools import table_path
+    path = table_path(out_path, fmt)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+    elif fmt == "arrow":
+        import pyarrow.feather as feather
+        feather.write_feather(table, path)
+    else:
+        import pyarrow.csv as pacsv
+        pacsv.write_csv(table, path)
+    return path
@@ -0,0 +1,51 @@
+from __future__ import annotations
+import time, contextvars
+from typing import Any, List, Optional
+
+class Deadline:
+    """Absolute time budget for one request (time.monotonic based)."""
+
+    def __init__(self, seconds: float, at: float|None=None):
+        self.at = at if at is not None else time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cap(self, seconds: float) -> float:
+        """seconds, shortened to what is left of the budget."""
+        return min(seconds, self.remaining())
+
+    def reserve(self, seconds: float) -> "Deadline":
+        """A deadline that ends `seconds` earlier, leaving time for later stages."""
+        return Deadline(0, at=self.at - seconds)
+
+# --- Deadline of the step running in this thread (set by the executor, copied with contextvars) ---
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("deadline", default=None)
+# Work a request left running past its deadline; app.main waits for it before cleaning up
+_stragglers: contextvars.ContextVar[Optional[List[Any]]] = contextvars.ContextVar("stragglers", default=None)
+
+def bind(deadline: Deadline|None) -> None:
+    _current.set(deadline)
+
+def current() -> Deadline|None:
+    return _current.get()
+
+def check() -> None:
+    """Raise TimeoutError once the current deadline has passed (cooperative cancel for long loops)."""
+    d = _current.get()
+    if d is not None and d.expired():
+        raise TimeoutError("request deadline reached")
+
+def track_stragglers() -> List[Any]:
+    """Start collecting this request's abandoned futures; returns the (shared) list."""
+    out: List[Any] = []
+    _stragglers.set(out)
+    return out
+
+def add_stragglers(futures) -> None:
+    out = _stragglers.get()
+    if out is not None:
+        out.extend(futures)
@@ -1,140 +1,337 @@
 from __future__ import annotations
-import os, json, shutil
-from typing import Dict, Any
+import os, json, threading, contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, List
 from app.settings import settings
 from agent.tools import (
     http_fetch, html_table_to_csv, pdf_to_text, pdf_tables_to_csv, image_ocr_to_text,
-    csv_to_df, excel_to_df, json_load, sql_to_sqlite
+    sql_to_sqlite, pdf_pages_suffix, duckdb_query
 )
 from agent.sandbox import python_exec, python_exec_with_venv
+from agent.artefacts import link_input
+from agent.catalog import Catalog
+from agent.plan_cache import remember_plan, forget_plan
+from agent.memo import get_memo, MEMO_TOOLS
+from agent.deadline import Deadline, bind as bind_deadline, add_stragglers
+from agent.trace import span, size_of, record
+from agent.sandbox_lib.plotenc import shrink_data_uri
 
-def execute_plan(plan: Dict[str, Any], workdir: str, max_plot_bytes: int=100000) -> Dict[str, Any]:
-    artefacts: Dict[str, Any] = {}
-    derived_dir = os.path.join(workdir, "derived")
-    os.makedirs(derived_dir, exist_ok=True)
+# --- Step graph ---
+def _refs(obj) -> List[str]:
+    """All `$name` artefact references inside a step's args (uploads excluded)."""
+    if isinstance(obj, str):
+        if obj.startswith("$") and not obj.startswith("$UPLOADS/"):
+            return [obj[1:]]
+        return []
+    if isinstance(obj, dict):
+        return [r for v in obj.values() for r in _refs(v)]
+    if isinstance(obj, list):
+        return [r for v in obj for r in _refs(v)]
+    return []
+
+def _upload_path(path: str, workdir: str) -> str:
+    return path.replace("$UPLOADS/", os.path.join(workdir, "uploads") + "/")
+
+def _ingest_key(a: Dict[str, Any]) -> str:
+    # Mirrors the artefact names chosen by _run_ingest
+    tool, writes, args = a.get("tool"), a.get("writes", {}), a.get("args", {})
+    base = os.path.basename(args.get("path", ""))
+    pages = pdf_pages_suffix(args.get("pages"))
+    defaults = {
+        "pdf_to_text": ("text", base + pages + ".txt"),
+        "pdf_tables_to_csv": ("csvs", "csvs"),
+        "image_ocr_to_text": ("text", base + ".txt"),
+        "excel_to_df": ("df", base + ".csv"),
+        "csv_to_df": ("df", base),
+        "json_load": ("json", base),
+        "json_to_df": ("df", base + ".csv"),
+        "sql_to_sqlite": ("db", "db"),
+    }
+    field, default = defaults.get(tool, (None, None))
+    if field is None:
+        return ""
+    return writes.get(field) or default
 
-    # 1) Scrapes
+def _read_refs(reads: Dict[str, Any]) -> List[str]:
+    return [ref[1:] if ref.startswith("$") else ref for ref in reads.values() if isinstance(ref, str)]
+
+def _build_steps(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    steps = []
     for s in plan.get("scrapes", []):
-        tool = s.get("tool")
         writes = s.get("writes", {})
-        if tool == "http_fetch":
-            url = s["args"]["url"]
-            data = http_fetch(url, allowlist=settings.HTTP_ALLOWLIST)
-            out_html = os.path.join(derived_dir, writes.get("html", "page.html"))
-            with open(out_html, "wb") as f:
-                f.write(data)
-            artefacts[writes.get("html") or "html"] = out_html
-        elif tool == "html_table_to_csv":
-            html_spec = s["args"]["html"]
-            if isinstance(html_spec, str) and html_spec.startswith("$"):
-                src = artefacts[html_spec[1:]]
-                html = open(src, "r", encoding="utf-8", errors="ignore").read()
-            else:
-                html = html_spec
-            out_csv = os.path.join(derived_dir, writes.get("csv", "table.csv"))
-            html_table_to_csv(html, s["args"].get("css_selector"), out_csv)
-            artefacts[writes.get("csv") or "csv"] = out_csv
+        if s.get("tool") == "http_fetch":
+            key = writes.get("html") or "html"
         else:
-            raise RuntimeError(f"Unsupported scrape tool: {tool}")
-
-    # 2) Ingest
+            key = writes.get("csv") or "csv"
+        steps.append({"kind": "scrape", "spec": s, "inputs": _refs(s.get("args", {})), "outputs": [key]})
     for a in plan.get("ingest", []):
-        tool = a.get("tool")
-        writes = a.get("writes", {})
-        args = a.get("args", {})
-        if tool == "pdf_to_text":
-            p = args["path"].replace("$UPLOADS/", os.path.join(workdir, "uploads") + "/")
-            out = pdf_to_text(p)
-            artefacts[writes.get("text") or os.path.basename(out)] = out
-        elif tool == "pdf_tables_to_csv":
-            p = args["path"].replace("$UPLOADS/", os.path.join(workdir, "uploads") + "/")
-            out_dir = os.path.join(derived_dir, "pdf_tables")
-            paths = pdf_tables_to_csv(p, out_dir)
-            artefacts[writes.get("csvs") or "csvs"] = paths
-        elif tool == "image_ocr_to_text":
-            p = args["path"].replace("$UPLOADS/", os.path.join(workdir, "uploads") + "/")
-            out = image_ocr_to_text(p)
-            artefacts[writes.get("text") or os.path.basename(out)] = out
-        elif tool == "excel_to_df":
-            p = args["path"].replace("$UPLOADS/", os.path.join(workdir, "uploads") + "/")
-            df = excel_to_df(p)
-            out = os.path.join(derived_dir, writes.get("df", os.path.basename(p) + ".csv"))
-            df.to_csv(out, index=False)
-            artefacts[writes.get("df") or os.path.basename(out)] = out
-        elif tool == "csv_to_df":
-            p = args["path"].replace("$UPLOADS/", os.path.join(workdir, "uploads") + "/")
-            df = csv_to_df(p)
-            out = os.path.join(derived_dir, writes.get("df", os.path.basename(p)))
-            df.to_csv(out, index=False)
-            artefacts[writes.get("df") or os.path.basename(out)] = out
-        elif tool == "json_load":
-            p = args["path"].replace("$UPLOADS/", os.path.join(workdir, "uploads") + "/")
-            obj = json_load(p)
-            out = os.path.join(derived_dir, writes.get("json", os.path.basename(p)))
-            with open(out, "w", encoding="utf-8") as f: json.dump(obj, f)
-            artefacts[writes.get("json") or os.path.basename(out)] = out
-        elif tool == "sql_to_sqlite":
-            sql_path = args.get("sql_path")
-            sql_str = args.get("sql_str")
-            if sql_path:
-                sql_path = sql_path.replace("$UPLOADS/", os.path.join(workdir, "uploads") + "/")
-            out_db = os.path.join(derived_dir, writes.get("db", "tmp.sqlite"))
-            db = sql_to_sqlite(sql_path, sql_str, out_db)
-            artefacts[writes.get("db") or "db"] = db
+        steps.append({"kind": "ingest", "spec": a, "inputs": _refs(a.get("args", {})), "outputs": [_ingest_key(a)]})
+    for q in plan.get("queries", []):
+        steps.append({"kind": "query", "spec": q, "inputs": _read_refs(q.get("reads", {})),
+                      "outputs": list(q.get("writes", {}).keys())})
+    for i, pj in enumerate(plan.get("python_jobs", [])):
+        steps.append({"kind": "python_job", "spec": pj, "index": i, "inputs": _read_refs(pj.get("reads", {})),
+                      "outputs": list(pj.get("writes", {}).keys())})
+
+    # Each input depends on the producers declared before it (plan order)
+    for i, st in enumerate(steps):
+        st["deps"] = {j for j in range(i) for name in st["inputs"] if name in steps[j]["outputs"]}
+    return steps
+
+# --- Step runners (each returns the artefacts it produced) ---
+def _run_scrape(s: Dict[str, Any], artefacts: Dict[str, Any], derived_dir: str) -> Dict[str, Any]:
+    tool = s.get("tool")
+    writes = s.get("writes", {})
+    if tool == "http_fetch":
+        url = s["args"]["url"]
+        data = http_fetch(url, allowlist=settings.HTTP_ALLOWLIST)
+        out_html = os.path.join(derived_dir, writes.get("html", "page.html"))
+        with open(out_html, "wb") as f:
+            f.write(data)
+        return {writes.get("html") or "html": out_html}
+    elif tool == "html_table_to_csv":
+        args = s["args"]
+        html_spec = args["html"]
+        # Saved pages are parsed from the file (and shared between steps), not read into a str
+        html = artefacts[html_spec[1:]] if isinstance(html_spec, str) and html_spec.startswith("$") else html_spec
+        out_csv = os.path.join(derived_dir, writes.get("csv", "table.csv"))
+        out_csv = html_table_to_csv(html, args.get("css_selector"), out_csv, fmt=settings.INGEST_FORMAT,
+                                    match=args.get("match"), index=args.get("index"))
+        return {writes.get("csv") or "csv": out_csv}
+    raise RuntimeError(f"Unsupported scrape tool: {tool}")
+
+def _run_ingest(a: Dict[str, Any], workdir: str, derived_dir: str) -> Dict[str, Any]:
+    tool = a.get("tool")
+    writes = a.get("writes", {})
+    args = a.get("args", {})
+    if tool == "pdf_to_text":
+        p = _upload_path(args["path"], workdir)
+        out = pdf_to_text(p, pages=args.get("pages"))
+        return {writes.get("text") or os.path.basename(out): out}
+    elif tool == "pdf_tables_to_csv":
+        p = _upload_path(args["path"], workdir)
+        out_dir = os.path.join(derived_dir, "pdf_tables")
+        paths = pdf_tables_to_csv(p, out_dir, fmt=settings.INGEST_FORMAT, pages=args.get("pages"))
+        return {writes.get("csvs") or "csvs": paths}
+    elif tool == "image_ocr_to_text":
+        p = _upload_path(args["path"], workdir)
+        out = image_ocr_to_text(p)
+        return {writes.get("text") or os.path.basename(out): out}
+    elif tool == "excel_to_df":
+        p = _upload_path(args["path"], workdir)
+        out = os.path.join(derived_dir, writes.get("df", os.path.basename(p) + ".csv"))
+        key = writes.get("df") or os.path.basename(out)
+        from agent.ingest import ingest_table
+        return {key: ingest_table(p, out, settings.INGEST_FORMAT, kind="excel")}
+    elif tool == "csv_to_df":
+        p = _upload_path(args["path"], workdir)
+        out = os.path.join(derived_dir, writes.get("df", os.path.basename(p)))
+        key = writes.get("df") or os.path.basename(out)
+        from agent.ingest import ingest_table
+        return {key: ingest_table(p, out, settings.INGEST_FORMAT, kind="csv")}
+    elif tool == "json_load":
+        p = _upload_path(args["path"], workdir)
+        out = os.path.join(derived_dir, writes.get("json", os.path.basename(p)))
+        from agent.ingest import ingest_json
+        return {writes.get("json") or os.path.basename(out): ingest_json(p, out)}
+    elif tool == "json_to_df":
+        p = _upload_path(args["path"], workdir)
+        out = os.path.join(derived_dir, writes.get("df", os.path.basename(p) + ".csv"))
+        key = writes.get("df") or os.path.basename(out)
+        from agent.ingest import ingest_table
+        return {key: ingest_table(p, out, settings.INGEST_FORMAT, kind="json", records=args.get("records"))}
+    elif tool == "sql_to_sqlite":
+        sql_path = args.get("sql_path")
+        sql_str = args.get("sql_str")
+        if sql_path:
+            sql_path = _upload_path(sql_path, workdir)
+        out_db = os.path.join(derived_dir, writes.get("db", "tmp.sqlite"))
+        db = sql_to_sqlite(sql_path, sql_str, out_db)
+        return {writes.get("db") or "db": db}
+    raise RuntimeError(f"Unsupported ingest tool: {tool}")
+
+def _run_query(q: Dict[str, Any], artefacts: Dict[str, Any], derived_dir: str, catalog: Catalog) -> Dict[str, Any]:
+    writes = q.get("writes", {})
+    if len(writes) != 1:
+        raise RuntimeError("duckdb_query must write exactly one output")
+    (name, relpath), = writes.items()
+    tables = {alias: artefacts[ref[1:]] if ref.startswith("$") else artefacts.get(ref, ref)
+              for alias, ref in q.get("reads", {}).items()}
+    out = os.path.join(derived_dir, q.get("id", "query"), relpath)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    return {name: duckdb_query(q["sql"], tables, out, fmt=settings.INGEST_FORMAT, catalog=catalog)}
+
+def _plot_log(path: str) -> List[Dict[str, Any]]:
+    # Per-attempt timings written by plotenc.save_plot inside the job
+    try:
+        with open(path + ".log.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def _run_job(pj: Dict[str, Any], index: int, artefacts: Dict[str, Any], derived_dir: str,
+             max_plot_bytes: int, timeout_sec: int) -> Dict[str, Any]:
+    produced: Dict[str, Any] = {}
+    job_dir = os.path.join(derived_dir, pj.get("id", f"job{index}"))
+    os.makedirs(job_dir, exist_ok=True)
+
+    # Materialize inputs
+    reads = pj.get("reads", {})
+    for name, ref in reads.items():
+        if isinstance(ref, str) and ref.startswith("$"):
+            refkey = ref[1:]
+            src = artefacts[refkey]
         else:
-            raise RuntimeError(f"Unsupported ingest tool: {tool}")
-
-    # 3) Python jobs
-    for pj in plan.get("python_jobs", []):
-        job_dir = os.path.join(derived_dir, pj.get("id", "job"))
-        os.makedirs(job_dir, exist_ok=True)
-
-        # Materialize inputs
-        reads = pj.get("reads", {})
-        for name, ref in reads.items():
-            if isinstance(ref, str) and ref.startswith("$"):
-                refkey = ref[1:]
-                src = artefacts[refkey]
-            else:
-                src = ref
-            alias = os.path.join(job_dir, f"{name}")
-            if os.path.isdir(src):
-                # Copy directory if needed
-                if alias != src:
-                    if os.path.exists(alias): shutil.rmtree(alias)
-                    shutil.copytree(src, alias)
-                artefacts[name] = alias
-            else:
-                with open(src, "rb") as fsrc, open(alias, "wb") as fdst:
-                    fdst.write(fsrc.read())
-                artefacts[name] = alias
-
-        # Run code (optionally with venv)
-        pkgs = pj.get("pkgs")
-        if pkgs:
-            rc, out, err = python_exec_with_venv(pj["code"], job_dir, pkgs=pkgs, timeout_sec=settings.TOOL_TIMEOUT)
+            src = artefacts.get(ref, ref)
+        alias = os.path.join(job_dir, f"{name}")
+        # Reflink where the filesystem supports it, else copy (see agent/artefacts.py)
+        produced[name] = link_input(src, alias)
+
+    # Run code (optionally with venv)
+    pkgs = pj.get("pkgs")
+    if pkgs:
+        rc, out, err = python_exec_with_venv(pj["code"], job_dir, pkgs=pkgs, timeout_sec=timeout_sec)
+    else:
+        rc, out, err = python_exec(pj["code"], job_dir, timeout_sec=timeout_sec)
+    if rc != 0:
+        raise RuntimeError(f"python_exec failed: {err[:800]}")
+
+    # Collect writes
+    for k, relpath in pj.get("writes", {}).items():
+        path = os.path.join(job_dir, relpath)
+        if not os.path.exists(path):
+            raise RuntimeError(f"Expected output missing: {path}")
+        if path.endswith(".datauri"):
+            data = open(path, "r", encoding="utf-8").read().strip()
+            attempts = _plot_log(path)
+            if len(data.encode("utf-8")) > max_plot_bytes:
+                # Written without plotenc.save_plot: shrink it here rather than fail the plan
+                try:
+                    data = shrink_data_uri(data, max_plot_bytes, attempts)
+                except Exception as e:
+                    raise RuntimeError(f"Plot exceeds size limit: {e}")
+            for a in attempts:
+                record("plot.encode", a["strategy"].split("@")[0], a["ms"] / 1000, bytes_out=a["bytes"])
+            produced[k] = data
+        elif path.endswith(".json"):
+            produced[k] = json.load(open(path, "r", encoding="utf-8"))
         else:
-            rc, out, err = python_exec(pj["code"], job_dir, timeout_sec=settings.TOOL_TIMEOUT)
-        if rc != 0:
-            raise RuntimeError(f"python_exec failed: {err[:800]}")
-
-        # Collect writes
-        for k, relpath in pj.get("writes", {}).items():
-            path = os.path.join(job_dir, relpath)
-            if not os.path.exists(path):
-                raise RuntimeError(f"Expected output missing: {path}")
-            if path.endswith(".datauri"):
-                data = open(path, "r", encoding="utf-8").read()
-                if len(data.encode("utf-8")) > max_plot_bytes:
-                    raise RuntimeError("Plot exceeds size limit")
-                artefacts[k] = data
-            elif path.endswith(".json"):
-                artefacts[k] = json.load(open(path, "r", encoding="utf-8"))
+            produced[k] = path
+    return produced
+
+# --- Step memoization (see agent/memo.py) ---
+def _memo_inputs(spec: Dict[str, Any], artefacts: Dict[str, Any], workdir: str) -> List[str]:
+    args = spec.get("args", {})
+    if spec.get("tool") == "html_table_to_csv":
+        html = args.get("html")
+        return [artefacts[html[1:]]] if isinstance(html, str) and html.startswith("$") else []
+    return [_upload_path(args[k], workdir) for k in ("path", "sql_path") if args.get(k)]
+
+def _memoized(spec: Dict[str, Any], artefacts: Dict[str, Any], workdir: str, run) -> Dict[str, Any]:
+    memo = get_memo()
+    if memo is None or spec.get("tool") not in MEMO_TOOLS:
+        return run()
+    key = memo.key(spec, _memo_inputs(spec, artefacts, workdir))
+    cached = memo.restore(key, workdir)
+    if cached is not None:
+        return cached
+    produced = run()
+    memo.store(key, spec.get("tool"), produced, workdir)
+    return produced
+
+# --- Scheduler ---
+def _run_graph(steps: List[Dict[str, Any]], artefacts: Dict[str, Any], workdir: str, derived_dir: str,
+               max_plot_bytes: int, max_workers: int, deadline: Deadline|None=None,
+               errors: List[str]|None=None, catalog: Catalog|None=None) -> None:
+    """Run steps as their inputs become ready.
+
+    Without `errors` the first failure aborts the plan and is raised. With it,
+    failures are recorded there and only the steps that depend on a failed one
+    are skipped. Once `deadline` passes nothing new is started; running steps
+    stop at their own time caps (job timeouts, OCR/PDF timeouts, deadline
+    checks between ingest chunks) and are handed to app.main, which keeps the
+    workdir until they return. Whatever artefacts completed are kept.
+    """
+    lock = threading.Lock()
+    timeout = settings.TOOL_TIMEOUT
+
+    def run(st):
+        bind_deadline(deadline)  # this step's context only: tools cap their waits with it
+        with lock:
+            snapshot = dict(artefacts)
+        spec = st["spec"]
+        tool = "duckdb_query" if st["kind"] == "query" else spec.get("tool") or spec.get("id", "")
+        with span(st["kind"], tool=tool) as sp:
+            if st["kind"] == "scrape":
+                produced = _memoized(spec, snapshot, workdir, lambda: _run_scrape(spec, snapshot, derived_dir))
+            elif st["kind"] == "ingest":
+                sp.set(bytes_in=size_of(_memo_inputs(spec, snapshot, workdir)))
+                produced = _memoized(spec, snapshot, workdir, lambda: _run_ingest(spec, workdir, derived_dir))
+            elif st["kind"] == "query":
+                produced = _run_query(spec, snapshot, derived_dir, catalog)
             else:
-                artefacts[k] = path
+                job_timeout = max(1, int(deadline.cap(timeout))) if deadline else timeout
+                produced = _run_job(spec, st["index"], snapshot, derived_dir, max_plot_bytes, job_timeout)
+                sp.set(bytes_in=size_of([produced[n] for n in spec.get("reads", {}) if n in produced]))
+            sp.set(bytes_out=size_of(list(produced.values())))
+            return produced
 
-    # 4) Validate artefacts against contract
-    contract = plan.get('artefacts_contract', {})
+    def fail(msg: str, exc: BaseException|None=None):
+        nonlocal error
+        if errors is None:
+            if error is None:
+                error = exc or RuntimeError(msg)
+        else:
+            errors.append(msg)
+
+    pending = set(range(len(steps)))
+    done: set[int] = set()
+    failed: set[int] = set()
+    running: Dict[Any, int] = {}
+    error: BaseException | None = None
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    expired = False
+    try:
+        while pending or running:
+            if deadline is not None and deadline.expired():
+                expired = True
+                fail(f"deadline reached with {len(running)} step(s) running and {len(pending)} pending",
+                     TimeoutError("Plan execution exceeded the request deadline"))
+                break
+            # A step starts as soon as every producer it reads from has finished
+            if error is None:
+                for i in sorted(pending):
+                    if steps[i]["deps"] & failed:
+                        pending.discard(i)
+                        failed.add(i)
+                        fail(f"step {i} ({steps[i]['spec'].get('tool') or steps[i]['kind']}) skipped: input failed")
+                    elif steps[i]["deps"] <= done:
+                        pending.discard(i)
+                        # copy_context: spans land in this request's trace
+                        running[pool.submit(contextvars.copy_context().run, run, steps[i])] = i
+            if not running:
+                break
+            finished, _ = wait(list(running), timeout=deadline.remaining() if deadline else None,
+                               return_when=FIRST_COMPLETED)
+            for fut in finished:
+                i = running.pop(fut)
+                try:
+                    produced = fut.result()
+                except BaseException as e:
+                    failed.add(i)
+                    fail(f"step {i} ({steps[i]['spec'].get('tool') or steps[i]['kind']}) failed: {e}", e)
+                    continue
+                with lock:
+                    artefacts.update(produced)
+                done.add(i)
+    finally:
+        pool.shutdown(wait=not expired, cancel_futures=True)
+        if expired:
+            add_stragglers(running)
+    if error is not None:
+        raise error
+
+def _check_contract(contract: Dict[str, Any], artefacts: Dict[str, Any]) -> None:
     for name, expect in contract.items():
         if name not in artefacts:
             raise RuntimeError(f"Missing artefact: {name}")
@@ -148,4 +345,50 @@ def execute_plan(plan: Dict[str, Any], workdir: str, max_plot_bytes: int=100000)
         if 'data_uri' in expect and not (isinstance(v, str) and v.startswith('data:image/')):
             raise RuntimeError(f"{name} not data_uri")
 
+def execute_plan(plan: Dict[str, Any], workdir: str, max_plot_bytes: int=100000,
+                 deadline: Deadline|None=None, errors: List[str]|None=None) -> Dict[str, Any]:
+    """Run a plan and return its artefacts.
+
+    Passing an `errors` list switches to best-effort mode: failures, skipped
+    steps and contract violations are appended there instead of raised, and
+    the artefacts that did complete are returned.
+    """
+    artefacts: Dict[str, Any] = {}
+    derived_dir = os.path.join(workdir, "derived")
+    os.makedirs(derived_dir, exist_ok=True)
+
+    # 1) Scrapes, ingest, queries and python jobs as one dependency graph;
+    # queries share one DuckDB catalog for the whole plan
+    steps = _build_steps(plan)
+    catalog = Catalog(os.path.join(derived_dir, ".duckdb")) if plan.get("queries") else None
+    try:
+        _run_graph(steps, artefacts, workdir, derived_dir, max_plot_bytes, settings.EXECUTOR_WORKERS,
+                   deadline=deadline, errors=errors, catalog=catalog)
+    except Exception:
+        forget_plan(plan)
+        raise
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+    # 2) Validate artefacts against contract; a cached plan that fails is dropped
+    contract = plan.get('artefacts_contract', {})
+    if errors is None:
+        try:
+            _check_contract(contract, artefacts)
+        except RuntimeError:
+            forget_plan(plan)
+            raise
+    else:
+        for name, expect in contract.items():
+            try:
+                _check_contract({name: expect}, artefacts)
+            except RuntimeError as e:
+                errors.append(str(e))
+                artefacts.pop(name, None)  # wrong type: let the caller fall back to a placeholder
+        if errors:
+            forget_plan(plan)
+            return artefacts
+
+    remember_plan(plan)
     return artefacts
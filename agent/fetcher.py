@@ -0,0 +1,119 @@
+from __future__ import annotations
+import os, json, asyncio, hashlib, threading
+import urllib.parse as up
+from typing import Dict, Optional
+import httpx
+from app.settings import settings
+from agent.sandbox_lib import disk_lru
+
+# --- Host allowlist ---
+def _allowed(host: str, allowlist: tuple[str,...]) -> bool:
+    if not allowlist:
+        return True
+    return any(host.endswith(a) or host == a for a in allowlist)
+
+# --- On-disk LRU cache (body + validators per URL) ---
+class HttpCache:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _paths(self, url: str):
+        h = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, h + ".body"), os.path.join(self.root, h + ".meta")
+
+    def get(self, url: str) -> Optional[Dict]:
+        body, meta = self._paths(url)
+        with self._lock:
+            try:
+                with open(meta, "r", encoding="utf-8") as f:
+                    m = json.load(f)
+                with open(body, "rb") as f:
+                    m["content"] = f.read()
+            except (OSError, ValueError):
+                return None
+        return m
+
+    def touch(self, url: str) -> None:
+        disk_lru.touch(self._paths(url)[1])
+
+    def put(self, url: str, content: bytes, headers: httpx.Headers) -> None:
+        etag, last_mod = headers.get("etag"), headers.get("last-modified")
+        if "no-store" in headers.get("cache-control", "") or len(content) > self.max_bytes:
+            return
+        body, meta = self._paths(url)
+        with self._lock:
+            tmp = body + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, body)
+            with open(meta, "w", encoding="utf-8") as f:
+                json.dump({"url": url, "etag": etag, "last_modified": last_mod, "size": len(content)}, f)
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith(".meta"):
+                meta = os.path.join(self.root, name)
+                body = meta[:-5] + ".body"
+                try:
+                    entries.append((meta, [meta, body], os.path.getsize(body)))
+                except OSError:
+                    continue
+        disk_lru.evict(entries, self.max_bytes)
+
+# --- Shared async client on a background loop ---
+class Fetcher:
+    def __init__(self, cache: HttpCache|None, max_connections: int = 20, max_per_host: int = 6, timeout: float = 20):
+        self.cache = cache
+        self.max_per_host = max_per_host
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._timeout = timeout
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._client: httpx.AsyncClient|None = None
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="http-fetcher", daemon=True).start()
+
+    def _host_sem(self, host: str) -> asyncio.Semaphore:
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.max_per_host)
+        return self._hosts[host]
+
+    async def afetch(self, url: str, allowlist: tuple[str,...]=()) -> bytes:
+        host = up.urlparse(url).hostname or ""
+        if not _allowed(host, allowlist):
+            raise RuntimeError(f"Host not allowed: {host}")
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=self._limits, timeout=self._timeout, follow_redirects=True)
+
+        cached = await asyncio.to_thread(self.cache.get, url) if self.cache else None
+        headers = {}
+        if cached:
+            if cached.get("etag"): headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"): headers["If-Modified-Since"] = cached["last_modified"]
+        async with self._host_sem(host):
+            r = await self._client.get(url, headers=headers)
+        if r.status_code == 304 and cached:
+            self.cache.touch(url)
+            return cached["content"]
+        r.raise_for_status()
+        if self.cache:
+            await asyncio.to_thread(self.cache.put, url, r.content, r.headers)
+        return r.content
+
+    def fetch(self, url: str, allowlist: tuple[str,...]=()) -> bytes:
+        return asyncio.run_coroutine_threadsafe(self.afetch(url, allowlist), self._loop).result()
+
+_fetcher: Fetcher|None = None
+_fetcher_lock = threading.Lock()
+
+def get_fetcher() -> Fetcher:
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            cache = HttpCache(settings.HTTP_CACHE_DIR, settings.HTTP_CACHE_MAX_BYTES) if settings.HTTP_CACHE_DIR else None
+            _fetcher = Fetcher(cache, settings.HTTP_MAX_CONNECTIONS, settings.HTTP_MAX_PER_HOST)
+        return _fetcher
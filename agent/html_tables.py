@@ -0,0 +1,243 @@
+# agent/html_tables.py
+"""HTML table extraction over one parsed tree per page.
+
+Saved pages are parsed once with lxml straight from the file and kept in a small
+LRU keyed by the file's identity, so several html_table_to_csv steps on one page
+share the tree. Tables are picked by CSS selector, caption/heading match and
+index; rowspan/colspan are expanded into a rectangular grid and footnote markers
+are dropped, then the grid is written as csv/parquet/arrow without pandas.
+"""
+from __future__ import annotations
+import os, re, csv, codecs, threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+from app.settings import settings
+
+# --- Parsing (one tree per file) ---
+_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([\w:.-]+)""", re.I)
+
+_trees: "OrderedDict[tuple, Any]" = OrderedDict()
+_parsing: Dict[tuple, threading.Lock] = {}
+_lock = threading.Lock()
+
+def _parser(encoding: str):
+    from lxml import html as lh
+    return lh.HTMLParser(encoding=encoding, remove_comments=True, huge_tree=True)
+
+def _encoding(path: str) -> str:
+    with open(path, "rb") as f:
+        m = _CHARSET.search(f.read(8192))
+    if m:
+        try:
+            return codecs.lookup(m.group(1).decode("ascii")).name
+        except LookupError:
+            pass
+    return "utf-8"
+
+def _parse_file(path: str):
+    from lxml import html as lh
+    return lh.parse(path, _parser(_encoding(path))).getroot()
+
+def _is_path(html: str) -> bool:
+    return len(html) < 4096 and "<" not in html and os.path.isfile(html)
+
+def load(html: str):
+    """Document root for a saved page's path (cached by file identity) or an HTML string."""
+    if not _is_path(html):
+        from lxml import html as lh
+        return lh.document_fromstring(html.encode("utf-8"), parser=_parser("utf-8"))
+    st = os.stat(html)
+    ident = (os.path.abspath(html), st.st_size, st.st_mtime_ns, st.st_ino)
+    with _lock:
+        key_lock = _parsing.setdefault(ident, threading.Lock())
+    with key_lock:  # concurrent steps on one page wait for a single parse
+        with _lock:
+            root = _trees.get(ident)
+            if root is not None:
+                _trees.move_to_end(ident)
+                return root
+        try:
+            root = _parse_file(html)
+        finally:
+            with _lock:
+                _parsing.pop(ident, None)
+        with _lock:
+            if settings.HTML_TREE_CACHE > 0:
+                for k in [k for k in _trees if not os.path.exists(k[0])]:
+                    del _trees[k]  # request workdir already cleaned up
+                _trees[ident] = root
+                while len(_trees) > settings.HTML_TREE_CACHE:
+                    _trees.popitem(last=False)
+    return root
+
+# --- Table selection ---
+@lru_cache(maxsize=64)
+def _css(selector: str):
+    from lxml.cssselect import CSSSelector
+    try:
+        return CSSSelector(selector)
+    except Exception as e:
+        raise ValueError(f"Invalid css_selector {selector!r}: {e}")
+
+def _headings(root) -> Dict[Any, str]:
+    """Nearest preceding h1-h4 text per top-level table, in one document-order pass."""
+    out, heading = {}, ""
+    for el in root.xpath("//h1 | //h2 | //h3 | //h4 | //table[not(ancestor::table)]"):
+        if el.tag == "table":
+            out[el] = heading
+        else:
+            heading = cell_text(el)
+    return out
+
+def select_tables(root, selector: str|None=None, match: str|None=None, index: int|None=None) -> list:
+    """Tables under root picked by CSS selector (containers yield their tables), caption match and index."""
+    if selector:
+        found = []
+        for el in _css(selector)(root):
+            found.extend([el] if el.tag == "table" else el.xpath(".//table[not(ancestor::table)]"))
+        found = list({id(t): t for t in found}.values())
+    else:
+        found = root.xpath("//table[not(ancestor::table)]")
+    if match:
+        try:
+            pat = re.compile(match, re.I)
+        except re.error:
+            pat = re.compile(re.escape(match), re.I)
+        headings = _headings(root)
+        found = [t for t in found  # caption or heading
+                 if any(pat.search(cell_text(c)) for c in t.xpath("./caption")) or pat.search(headings.get(t, ""))]
+    if index is not None:
+        index = int(index)
+        found = found[index:index + 1] if -len(found) <= index < len(found) else []
+    return found
+
+# --- Cell text ---
+_SKIP_TAGS = {"style", "script", "noscript", "template"}
+_BREAK_TAGS = {"br", "p", "div", "li", "tr"}
+_NOTE = re.compile(r"\[(?:\d+|[a-z]|note \d+|nb \d+|citation needed)\]", re.I)
+_WS = re.compile(r"\s+")
+
+def _hidden(el) -> bool:
+    if el.tag in _SKIP_TAGS:
+        return True
+    cls = el.get("class") or ""
+    if "sortkey" in cls or (el.tag == "sup" and "reference" in cls):
+        return True
+    style = el.get("style")
+    return bool(style) and "display:none" in style.replace(" ", "").lower()
+
+def _text(el, out: List[str]) -> None:
+    if el.text:
+        out.append(el.text)
+    for child in el:
+        if isinstance(child.tag, str) and not _hidden(child):
+            if child.tag in _BREAK_TAGS:
+                out.append(" ")
+            _text(child, out)
+        if child.tail:
+            out.append(child.tail)
+
+def cell_text(cell) -> str:
+    """Visible text of a cell: footnote markers, sort keys and hidden spans removed."""
+    out: List[str] = []
+    _text(cell, out)
+    return _WS.sub(" ", _NOTE.sub("", "".join(out))).strip()
+
+# --- Grid (rowspan/colspan) ---
+def _span(value, cap: int) -> int:
+    m = re.match(r"\s*(\d+)", value or "")
+    return max(1, min(int(m.group(1)), cap)) if m else 1
+
+def table_grid(table) -> Tuple[List[str], List[List[str]]]:
+    """(columns, rows) of a table with spans expanded; leading all-<th>/<thead> rows form the header."""
+    grid: List[List[str]] = []
+    heads: List[bool] = []
+    carry: Dict[int, list] = {}  # column -> [rows left, text, is th]
+    for tr in table.xpath("./tr|./thead/tr|./tbody/tr|./tfoot/tr"):
+        row = {c: v[1] for c, v in carry.items()}
+        is_th = {c: v[2] for c, v in carry.items()}
+        new: Dict[int, list] = {}
+        col = 0
+        for cell in tr.xpath("./th|./td"):
+            while col in row:
+                col += 1
+            text = cell_text(cell)
+            rs, cs = _span(cell.get("rowspan"), 65534), _span(cell.get("colspan"), 1000)
+            for c in range(col, col + cs):
+                row[c], is_th[c] = text, cell.tag == "th"
+                if rs > 1:
+                    new[c] = [rs - 1, text, cell.tag == "th"]
+            col += cs
+        carry = {c: [v[0] - 1, v[1], v[2]] for c, v in carry.items() if v[0] > 1}
+        carry.update(new)
+        if not row:
+            continue
+        grid.append([row.get(c, "") for c in range(max(row) + 1)])
+        heads.append(all(is_th.values()) or tr.getparent().tag == "thead")
+
+    width = max((len(r) for r in grid), default=0)
+    grid = [r + [""] * (width - len(r)) for r in grid]
+    n_head = 0
+    while n_head < len(grid) - 1 and heads[n_head]:
+        n_head += 1
+    header, body = grid[:n_head], grid[n_head:]
+    columns = []
+    for c in range(width):
+        parts: List[str] = []
+        for r in header:
+            if r[c] and (not parts or parts[-1] != r[c]):
+                parts.append(r[c])
+        columns.append(" ".join(parts) or (f"Unnamed: {c}" if header else str(c)))
+    if header:
+        body = [r for r in body if r != header[-1]]  # header rows repeated inside long tables
+    return columns, body
+
+# --- Output ---
+_NUM = re.compile(r"[-+−]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?(?:[eE][-+]?\d+)?")
+
+def _typed(values: List[str]) -> list:
+    """Numbers (thousands separators allowed, like pd.read_html) become int/float; blanks become None."""
+    if not all(v == "" or _NUM.fullmatch(v) for v in values) or all(v == "" for v in values):
+        return values
+    out = []
+    for v in values:
+        if v == "":
+            out.append(None)
+            continue
+        v = v.replace(",", "").replace("−", "-")
+        out.append(float(v) if any(ch in v for ch in ".eE") else int(v))
+    if any(isinstance(x, float) for x in out):
+        out = [None if x is None else float(x) for x in out]
+    elif any(x is not None and not -2**63 <= x < 2**63 for x in out):
+        return values
+    return out
+
+def write_grid(columns: List[str], rows: List[List[str]], out_path: str, fmt: str = "csv") -> str:
+    from agent.tools import table_path, unique_names
+    columns = unique_names(columns)
+    typed = [_typed([r[c] for r in rows]) for c in range(len(columns))]
+    if fmt == "csv":
+        path = table_path(out_path, fmt)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(columns)
+            w.writerows(zip(*[["" if v is None else v for v in col] for col in typed]) if rows else [])
+        return path
+    import pyarrow as pa
+    from agent.catalog import save_arrow
+    return save_arrow(pa.table({name: pa.array(col, type=None if col else pa.string())
+                                for name, col in zip(columns, typed)}), out_path, fmt)
+
+def extract_table(html: str, out_path: str, fmt: str = "csv", selector: str|None=None,
+                  match: str|None=None, index: int|None=None) -> str:
+    """Write the first table picked by selector/match/index from a page path or HTML string."""
+    root = load(html)
+    tables = select_tables(root, selector, match, index)
+    if not tables:
+        picked = ", ".join(f"{k}={v!r}" for k, v in (("css_selector", selector), ("match", match), ("index", index))
+                           if v is not None)
+        raise RuntimeError("No tables found in HTML" + (f" for {picked}" if picked else ""))
+    columns, rows = table_grid(tables[0])
+    return write_grid(columns, rows, out_path, fmt)
@@ -0,0 +1,391 @@
+from __future__ import annotations
+import os, re, json
+from typing import Any, Dict, Iterator, List
+import numpy as np
+import pandas as pd
+from app.settings import settings
+from agent.deadline import check as check_deadline
+from agent.tools import csv_to_df, excel_to_df, save_table, table_path, _unique_columns
+
+# --- Streaming CSV/Excel ingest: chunked read, compact dtypes, incremental write ---
+_INTS = ("int8", "int16", "int32", "int64")
+
+class _Widen(Exception):
+    """A chunk does not fit the dtype inferred from the sample (or brings columns the sample lacked)."""
+    def __init__(self, col: str, dtype: str, more: Dict[str, str]|None=None):
+        self.col, self.dtype = col, dtype
+        self.updates = {col: dtype, **(more or {})}
+
+def _csv_chunks(path: str, rows: int, nrows: int|None=None) -> Iterator[pd.DataFrame]:
+    yield from pd.read_csv(path, chunksize=rows, nrows=nrows)
+
+def _excel_chunks(path: str, rows: int, nrows: int|None=None) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        it = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(it, None)
+        if header is None:
+            return
+        header = [f"Unnamed: {i}" if h is None else str(h) for i, h in enumerate(header)]
+        buf: List[tuple] = []
+        seen = 0
+        for row in it:
+            buf.append(row)
+            seen += 1
+            if len(buf) >= rows or seen == nrows:
+                yield pd.DataFrame.from_records(buf, columns=header).infer_objects()
+                buf = []
+                if seen == nrows:
+                    return
+        if buf:
+            yield pd.DataFrame.from_records(buf, columns=header).infer_objects()
+    finally:
+        wb.close()
+
+# --- JSON/NDJSON: records parsed incrementally and flattened into the same chunked pipeline ---
+try:
+    import orjson
+    _fast_loads, _fast_dumps = orjson.loads, lambda v: orjson.dumps(v).decode("utf-8")
+except ImportError:  # stdlib fallback
+    _fast_loads, _fast_dumps = json.loads, lambda v: json.dumps(v, ensure_ascii=False)
+
+_DEC = json.JSONDecoder()
+_NONWS = re.compile(r"\S")
+
+def _loads(line):
+    try:
+        return _fast_loads(line)
+    except ValueError:
+        return json.loads(line)  # ints beyond 64 bits, NaN/Infinity literals
+
+class _JsonStream:
+    """One JSON text read through a sliding buffer, a value at a time (C raw_decode)."""
+    def __init__(self, f, block: int = 1 << 20):
+        self.f, self.block, self.buf, self.pos, self.eof = f, block, "", 0, False
+
+    def _more(self) -> bool:
+        if self.eof:
+            return False
+        data = self.f.read(max(self.block, len(self.buf) - self.pos))  # doubles for values larger than a block
+        if not data:
+            self.eof = True
+            return False
+        self.buf, self.pos = self.buf[self.pos:] + data, 0
+        return True
+
+    def _error(self, what: str) -> ValueError:
+        return ValueError(f"Invalid JSON: expected {what} near {self.buf[self.pos:self.pos + 40]!r}")
+
+    def peek(self) -> str:
+        while True:
+            m = _NONWS.search(self.buf, self.pos)
+            if m:
+                self.pos = m.start()
+                return self.buf[self.pos]
+            self.pos = len(self.buf)
+            if not self._more():
+                return ""
+
+    def take(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise self._error(repr(ch))
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = _DEC.raw_decode(self.buf, self.pos)
+                if end < len(self.buf) or self.eof:  # a number may continue in the next block
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._more()
+
+    def array(self) -> Iterator[Any]:
+        self.take("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            ch = self.peek()
+            self.pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise self._error("',' or ']'")
+
+    def keys(self) -> Iterator[str]:
+        """Object keys; the caller consumes each value (value() or array()) before the next key."""
+        self.take("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.take(":")
+            yield key
+            ch = self.peek()
+            self.pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise self._error("',' or '}'")
+
+def _is_ndjson(path: str) -> bool:
+    if path.lower().endswith((".ndjson", ".jsonl")):
+        return True
+    with open(path, "rb") as f:
+        head = f.read(1 << 20)
+    first, sep, rest = head.lstrip(b"\xef\xbb\xbf \t\r\n").partition(b"\n")
+    if not sep or not rest.strip():
+        return False
+    try:
+        _loads(first)
+        return True
+    except ValueError:
+        return False
+
+def _drain(js: _JsonStream) -> None:
+    # Validate without holding more than one array element / member value at a time
+    ch = js.peek()
+    if ch == "[":
+        for _ in js.array():
+            pass
+    elif ch == "{":
+        for _ in js.keys():
+            _drain(js)
+    else:
+        js.value()
+
+def _object_records(js: _JsonStream, path: List[str]) -> Iterator[Any]:
+    # Stream the array at `path` (or the first array of objects); an object without one is a single record
+    rest = {}
+    for key in js.keys():
+        if path and key != path[0]:
+            rest[key] = js.value()
+            continue
+        if js.peek() == "{" and len(path) > 1:
+            yield from _object_records(js, path[1:])
+            return
+        if js.peek() != "[":
+            rest[key] = js.value()
+            continue
+        items = js.array()
+        first = next(items, None)
+        if path or isinstance(first, dict):
+            if first is not None:
+                yield first
+            yield from items
+            return
+        rest[key] = [first, *items] if first is not None else []
+    if path:
+        raise ValueError(f"No array at {'.'.join(path)!r} in JSON")
+    yield rest
+
+def json_records(path: str, records: str|None=None) -> Iterator[Any]:
+    """Records of an NDJSON file, a top-level JSON array or the array at `records` (dotted path) in an object."""
+    if _is_ndjson(path):
+        with open(path, "rb") as f:
+            for line in f:
+                line = line.strip().lstrip(b"\xef\xbb\xbf")
+                if line:
+                    yield _loads(line)
+        return
+    with open(path, "r", encoding="utf-8-sig") as f:
+        js = _JsonStream(f)
+        ch = js.peek()
+        if ch == "[":
+            yield from js.array()
+        elif ch == "{":
+            yield from _object_records(js, records.split(".") if records else [])
+        else:
+            yield js.value()
+
+def _flatten(rec: Any, out: Dict[str, Any]|None=None, prefix: str = "") -> Dict[str, Any]:
+    """Nested objects become dotted columns; arrays are kept as JSON text."""
+    if not isinstance(rec, dict):
+        return {"value": _fast_dumps(rec) if isinstance(rec, list) else rec}
+    out = {} if out is None else out
+    for k, v in rec.items():
+        t = type(v)  # exact types: JSON parsers only produce dict/list/str/int/float/bool/None
+        if t is dict and v:
+            _flatten(v, out, prefix + k + ".")
+        elif t is dict or t is list:
+            out[prefix + k] = _fast_dumps(v)
+        else:
+            out[prefix + k] = v
+    return out
+
+def _json_chunks(path: str, rows: int, nrows: int|None=None, records: str|None=None) -> Iterator[pd.DataFrame]:
+    buf: List[Dict[str, Any]] = []
+    for rec in json_records(path, records):
+        buf.append(_flatten(rec))
+        if len(buf) >= rows or len(buf) == nrows:
+            yield pd.DataFrame.from_records(buf)
+            if len(buf) == nrows:
+                return
+            buf = []
+    if buf:
+        yield pd.DataFrame.from_records(buf)
+
+def ingest_json(path: str, out_path: str) -> str:
+    """json_load output: a valid JSON upload is linked, not re-serialised; NDJSON becomes one array."""
+    if _is_ndjson(path):
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write("[")
+            for i, rec in enumerate(json_records(path)):
+                f.write(("," if i else "") + _fast_dumps(rec))
+            f.write("]")
+        return out_path
+    with open(path, "rb") as f:
+        bom = f.read(3) == b"\xef\xbb\xbf"
+    if bom or os.path.getsize(path) < settings.INGEST_STREAM_MIN_BYTES:
+        with open(path, "rb") as f:
+            obj = _loads(f.read().lstrip(b"\xef\xbb\xbf"))
+        if bom:  # readers expect plain UTF-8
+            with open(out_path, "w", encoding="utf-8") as f:
+                f.write(_fast_dumps(obj))
+            return out_path
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            js = _JsonStream(f)
+            _drain(js)
+            if js.peek():
+                raise js._error("end of JSON")
+    from agent.artefacts import link_input
+    return link_input(path, out_path)
+
+def _compact(s: pd.Series, fmt: str) -> str:
+    """Smallest safe dtype for a sample column."""
+    if pd.api.types.is_bool_dtype(s):
+        return "bool"
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return str(s.dtype)
+    if pd.api.types.is_integer_dtype(s):
+        lo, hi = (int(s.min()), int(s.max())) if len(s) else (0, 0)
+        floor = _INTS.index(f"int{settings.INGEST_MIN_INT_BITS}")
+        return next(t for t in _INTS[floor:] if np.iinfo(t).min <= lo and hi <= np.iinfo(t).max)
+    if pd.api.types.is_float_dtype(s):
+        return "float32" if _lossless32(s) else "float64"
+    # Dictionary-encoded strings only for parquet: an IPC file cannot change dictionaries between batches
+    if fmt == "parquet" and s.nunique(dropna=True) <= len(s) // 2:
+        return "category"
+    return "string"
+
+def _lossless32(s: pd.Series) -> bool:
+    v = s.dropna().to_numpy(dtype="float64")
+    with np.errstate(over="ignore"):
+        return bool((v.astype("float32").astype("float64") == v).all())
+
+def _coerce(chunk: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    out = {}
+    for c, t in dtypes.items():
+        s = chunk[c] if c in chunk else pd.Series([None] * len(chunk), dtype=object)
+        if t in _INTS:
+            if not pd.api.types.is_integer_dtype(s):
+                raise _Widen(c, "float64" if pd.api.types.is_numeric_dtype(s) else "string")
+            if len(s) and (s.min() < np.iinfo(t).min or s.max() > np.iinfo(t).max):
+                raise _Widen(c, "int64")
+            out[c] = s.astype(t)
+        elif t in ("float32", "float64"):
+            if not pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+                raise _Widen(c, "string")
+            if t == "float32" and not _lossless32(s):
+                raise _Widen(c, "float64")
+            out[c] = s.astype(t)
+        elif t == "bool":
+            if not pd.api.types.is_bool_dtype(s):
+                raise _Widen(c, "string")
+            out[c] = s
+        elif t.startswith("datetime64"):
+            if not pd.api.types.is_datetime64_any_dtype(s):
+                raise _Widen(c, "string")
+            out[c] = s
+        else:  # string / category: stored as Arrow strings
+            out[c] = s.astype("string[pyarrow]")
+    return pd.DataFrame(out)
+
+def _to_arrow(df: pd.DataFrame, dtypes: Dict[str, str]):
+    import pyarrow as pa
+    cols = []
+    for c in df.columns:
+        if dtypes[c] == "category":
+            cols.append(pa.array(df[c], type=pa.string()).dictionary_encode())
+        else:
+            cols.append(pa.array(df[c], from_pandas=True))
+    return pa.Table.from_arrays(cols, names=list(df.columns))
+
+def _chunk_rows(sample: pd.DataFrame, overhead: int = 3) -> int:
+    # Per-request ceiling shared by the steps that may run at once; parsing needs ~overhead x the frame
+    per_row = max(1, int(sample.memory_usage(deep=True).sum() / max(1, len(sample))))
+    budget = settings.INGEST_MEMORY_MB * 2**20 / max(1, settings.EXECUTOR_WORKERS) / overhead
+    return int(min(1_000_000, max(1_000, budget // per_row)))
+
+def _write_stream(chunks: Iterator[pd.DataFrame], dtypes: Dict[str, str], path: str, fmt: str) -> None:
+    writer = None
+    try:
+        for chunk in chunks:
+            check_deadline()  # a request past its deadline stops between chunks
+            chunk = _unique_columns(chunk)
+            new = {c: _compact(chunk[c], fmt) for c in chunk.columns if c not in dtypes}
+            if new:  # JSON records whose keys first appear after the sample
+                raise _Widen(next(iter(new)), new[next(iter(new))], new)
+            if list(chunk.columns) != list(dtypes):
+                chunk = chunk.reindex(columns=list(dtypes))
+            if fmt == "csv":
+                chunk.to_csv(path, index=False, mode="w" if writer is None else "a", header=writer is None)
+                writer = True
+                continue
+            table = _to_arrow(_coerce(chunk, dtypes), dtypes)
+            if writer is None:
+                if fmt == "parquet":
+                    import pyarrow.parquet as pq
+                    writer = pq.ParquetWriter(path, table.schema)
+                else:
+                    import pyarrow as pa
+                    # lz4 like DataFrame.to_feather, so both paths produce the same kind of file
+                    writer = pa.ipc.new_file(path, table.schema, options=pa.ipc.IpcWriteOptions(compression="lz4"))
+            writer.write_table(table)
+        if writer is None and fmt == "csv":
+            open(path, "w").close()
+    finally:
+        if writer is not None and writer is not True:
+            writer.close()
+
+def ingest_table(path: str, out_path: str, fmt: str = "csv", kind: str = "csv", records: str|None=None) -> str:
+    """csv_to_df/excel_to_df/json_to_df output for `path` in `fmt`; returns the path written.
+
+    Files under INGEST_STREAM_MIN_BYTES are read whole. Larger ones stream:
+    dtypes are inferred from the first INGEST_SAMPLE_ROWS rows and shrunk
+    (smaller ints, lossless float32, category/Arrow strings), then chunks
+    sized to INGEST_MEMORY_MB are coerced and appended to the output. A chunk
+    that does not fit the sampled dtype (or has new columns) widens and restarts.
+    """
+    if kind == "json":
+        if os.path.getsize(path) < settings.INGEST_STREAM_MIN_BYTES:
+            return save_table(pd.DataFrame.from_records([_flatten(r) for r in json_records(path, records)]), out_path, fmt)
+        read = lambda p, rows, nrows=None: _json_chunks(p, rows, nrows, records)
+    elif kind == "csv" or path.lower().endswith((".xlsx", ".xlsm")):
+        if os.path.getsize(path) < settings.INGEST_STREAM_MIN_BYTES:
+            return save_table(csv_to_df(path) if kind == "csv" else excel_to_df(path), out_path, fmt)
+        read = _csv_chunks if kind == "csv" else _excel_chunks
+    else:
+        return save_table(excel_to_df(path), out_path, fmt)
+    sample = pd.concat(list(read(path, settings.INGEST_SAMPLE_ROWS, settings.INGEST_SAMPLE_ROWS)) or [pd.DataFrame()])
+    sample = _unique_columns(sample)
+    dtypes = {c: _compact(sample[c], fmt) for c in sample.columns}
+    rows = _chunk_rows(sample, 12 if kind == "json" else 3)  # flattened record dicts cost ~4x their frame
+    del sample
+    out = table_path(out_path, fmt)
+    for _ in range(len(dtypes) + 8):
+        try:
+            _write_stream(read(path, rows), dtypes, out, fmt)
+            return out
+        except _Widen as w:
+            dtypes.update(w.updates)
+    raise RuntimeError(f"Could not settle column types for {os.path.basename(path)}")
@@ -0,0 +1,31 @@
+from __future__ import annotations
+import threading
+from contextlib import contextmanager
+from typing import Dict
+from app.settings import settings
+
+# --- Process-wide concurrency caps per resource class ---
+_sems: Dict[str, threading.BoundedSemaphore] = {}
+_guard = threading.Lock()
+
+def _limit(name: str) -> int:
+    return {"sandbox": settings.LIMIT_SANDBOX, "ocr": settings.LIMIT_OCR}.get(name, 0)
+
+@contextmanager
+def resource(name: str, timeout: float|None=None):
+    """Hold one slot of resource class `name` (sandbox, ocr) for the duration of the block.
+
+    Raises TimeoutError if no slot frees up within `timeout` seconds.
+    """
+    n = _limit(name)
+    if n <= 0:
+        yield
+        return
+    with _guard:
+        sem = _sems.setdefault(name, threading.BoundedSemaphore(n))
+    if not sem.acquire(timeout=timeout):
+        raise TimeoutError(f"no free {name} slot within {timeout:.1f}s")
+    try:
+        yield
+    finally:
+        sem.release()
@@ -1,91 +1,86 @@
-import json, os
-from typing import Any, Dict
+import json, os, time, random, asyncio, threading
+from collections import deque
+from typing import Any, Dict, Optional
 from app.settings import settings
+from agent.trace import span
 
 # Provider switch
-PROVIDER = os.getenv("LLM_PROVIDER", "openai")  # openai|azure|anthropic|local
-
-_client = None
-if PROVIDER == "openai":
-    try:
-        from openai import OpenAI
-        _client = OpenAI(api_key=settings.OPENAI_API_KEY)
-    except Exception:
-        _client = None
-elif PROVIDER == "azure":
-    try:
-        from openai import AzureOpenAI
-        _client = AzureOpenAI(
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-06-01"),
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        )
-    except Exception:
-        _client = None
-elif PROVIDER == "anthropic":
-    try:
-        import anthropic
-        _client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-    except Exception:
-        _client = None
-else:
-    _client = None  # replace with local inference client if desired
+PROVIDER = os.getenv("LLM_PROVIDER", "openai")  # openai|azure|anthropic|stub|local
 
 class LLMError(Exception):
     pass
 
 _DEF_TEMP = 0
+_NO_RETRY = {400, 401, 403, 404, 422}
 
-def llm_json(system: str, user: str, model: str) -> Dict[str, Any]:
-    if PROVIDER == "openai":
-        if _client is None:
-            raise LLMError("OpenAI client not configured")
-        resp = _client.chat.completions.create(
-            model=model,
-            temperature=_DEF_TEMP,
-            response_format={"type":"json_object"},
-            messages=[{"role":"system","content":system},{"role":"user","content":user}],
-        )
-        return json.loads(resp.choices[0].message.content)
-    elif PROVIDER == "azure":
-        if _client is None:
-            raise LLMError("Azure OpenAI client not configured")
-        resp = _client.chat.completions.create(
-            model=model,
-            temperature=_DEF_TEMP,
-            response_format={"type":"json_object"},
-            messages=[{"role":"system","content":system},{"role":"user","content":user}],
-        )
-        return json.loads(resp.choices[0].message.content)
-    elif PROVIDER == "anthropic":
-        if _client is None:
-            raise LLMError("Anthropic client not configured")
-        msg = _client.messages.create(
-            model=model,
-            max_tokens=4096,
-            system=system,
-            messages=[{"role":"user","content":user}],
-        )
-        content = "".join([b.text for b in msg.content if getattr(b, "type", "") == "text"])
-        return json.loads(content)
-    else:
-        raise LLMError("No LLM provider configured")
+# --- Clients (built lazily on the LLM loop, sharing one pooled HTTP client) ---
+_clients: Dict[str, Any] = {}
+
+def _http_client():
+    import httpx
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=settings.LLM_POOL_SIZE,
+                            max_keepalive_connections=settings.LLM_POOL_SIZE),
+        timeout=settings.LLM_TIMEOUT,
+    )
+
+def _client(provider: str):
+    if provider in _clients:
+        return _clients[provider]
+    client = None
+    try:
+        if provider == "openai":
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=_http_client(), max_retries=0)
+        elif provider == "azure":
+            from openai import AsyncAzureOpenAI
+            client = AsyncAzureOpenAI(
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-06-01"),
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                http_client=_http_client(), max_retries=0,
+            )
+        elif provider == "anthropic":
+            import anthropic
+            client = anthropic.AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"),
+                                              http_client=_http_client(), max_retries=0)
+    except Exception:
+        client = None  # replace with local inference client if desired
+    _clients[provider] = client
+    return client
+
+# --- Offline stub provider (tests/benchmarks) ---
+# LLM_STUB_FILE: JSON file {"json": <planner reply>, "array": <answerer reply>}
+# LLM_STUB_LATENCY: seconds per call; LLM_STUB_JITTER: extra uniform random seconds
+async def _stub_reply(kind: str):
+    delay = float(os.getenv("LLM_STUB_LATENCY", "0")) + random.random() * float(os.getenv("LLM_STUB_JITTER", "0"))
+    await asyncio.sleep(delay)
+    path = os.getenv("LLM_STUB_FILE")
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)[kind]
+    if kind == "json":
+        return {"scrapes": [], "ingest": [], "queries": [], "python_jobs": [], "artefacts_contract": {}}
+    return []
 
-def llm_array(system: str, user: str, model: str):
-    if PROVIDER in ("openai","azure"):
-        if _client is None:
-            raise LLMError("LLM client not configured")
-        resp = _client.chat.completions.create(
+async def _call(provider: str, kind: str, system: str, user: str, model: str):
+    if provider == "stub":
+        return await _stub_reply(kind)
+    client = _client(provider)
+    if provider in ("openai", "azure"):
+        if client is None:
+            raise LLMError(f"{'OpenAI' if provider == 'openai' else 'Azure OpenAI'} client not configured")
+        resp = await client.chat.completions.create(
             model=model,
             temperature=_DEF_TEMP,
-            response_format={"type":"json_array"},
+            response_format={"type": "json_object" if kind == "json" else "json_array"},
             messages=[{"role":"system","content":system},{"role":"user","content":user}],
         )
         return json.loads(resp.choices[0].message.content)
-    elif PROVIDER == "anthropic":
-        if _client is None:
+    elif provider == "anthropic":
+        if client is None:
             raise LLMError("Anthropic client not configured")
-        msg = _client.messages.create(
+        msg = await client.messages.create(
             model=model,
             max_tokens=4096,
             system=system,
@@ -95,3 +90,108 @@ def llm_array(system: str, user: str, model: str):
         return json.loads(content)
     else:
         raise LLMError("No LLM provider configured")
+
+# --- Latency tracking, concurrency limits, hedging, retries ---
+_latency: Dict[str, deque] = {}
+_sems: Dict[str, asyncio.Semaphore] = {}
+
+def _p95(provider: str) -> Optional[float]:
+    window = _latency.get(provider)
+    if not window or len(window) < 20:
+        return None
+    ordered = sorted(window)
+    return ordered[int(0.95 * (len(ordered) - 1))]
+
+async def _attempt(provider: str, kind: str, system: str, user: str, model: str, timeout: float):
+    sem = _sems.setdefault(provider, asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY))
+    async with sem:
+        t0 = time.monotonic()
+        out = await asyncio.wait_for(_call(provider, kind, system, user, model), timeout)
+        _latency.setdefault(provider, deque(maxlen=200)).append(time.monotonic() - t0)
+        return out
+
+async def _hedged(provider: str, kind: str, system: str, user: str, model: str, timeout: float):
+    p95 = _p95(provider)
+    if not settings.LLM_HEDGE_P95_SEC or p95 is None or p95 < settings.LLM_HEDGE_P95_SEC or p95 >= timeout:
+        return await _attempt(provider, kind, system, user, model, timeout)
+    # Tail is slow: if the first call outlives p95, race a second one against it
+    first = asyncio.ensure_future(_attempt(provider, kind, system, user, model, timeout))
+    done, _ = await asyncio.wait({first}, timeout=p95)
+    if done:
+        return first.result()
+    second = asyncio.ensure_future(_attempt(provider, kind, system, user, model, timeout - p95))
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for fut in done:
+            if fut.exception() is None:
+                for p in pending:
+                    p.cancel()
+                return fut.result()
+            error = fut.exception()
+    raise error
+
+def _retryable(e: BaseException) -> bool:
+    status = getattr(e, "status_code", None)
+    return not isinstance(e, LLMError) and status not in _NO_RETRY
+
+async def _request(kind: str, system: str, user: str, model: str, deadline: Optional[float] = None):
+    deadline = deadline or (time.monotonic() + settings.GLOBAL_TIMEOUT)
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMError("LLM deadline exceeded")
+        try:
+            return await _hedged(PROVIDER, kind, system, user, model, min(settings.LLM_TIMEOUT, remaining))
+        except Exception as e:
+            attempt += 1
+            if attempt > settings.LLM_MAX_RETRIES or not _retryable(e):
+                if isinstance(e, LLMError):
+                    raise
+                raise LLMError(f"LLM call failed after {attempt} attempt(s): {e}") from e
+            # Exponential backoff with full jitter, never past the deadline
+            backoff = random.uniform(0, settings.LLM_BACKOFF_BASE * (2 ** (attempt - 1)))
+            await asyncio.sleep(min(backoff, max(0.0, deadline - time.monotonic())))
+
+async def allm_json(system: str, user: str, model: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+    with span("llm", tool="json", bytes_in=len(system) + len(user)):
+        return await _run_on_loop(_request("json", system, user, model, deadline))
+
+async def allm_array(system: str, user: str, model: str, deadline: Optional[float] = None):
+    with span("llm", tool="array", bytes_in=len(system) + len(user)):
+        return await _run_on_loop(_request("array", system, user, model, deadline))
+
+# --- One background loop owns the clients; sync and async callers both use it ---
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-client", daemon=True).start()
+        return _loop
+
+async def _run_on_loop(coro):
+    loop = _get_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+def warm() -> None:
+    """Start the client loop and build the provider client ahead of the first call."""
+    async def _build():
+        if PROVIDER != "stub":
+            _client(PROVIDER)
+    asyncio.run_coroutine_threadsafe(_build(), _get_loop()).result()
+
+def llm_json(system: str, user: str, model: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+    with span("llm", tool="json", bytes_in=len(system) + len(user)):
+        return asyncio.run_coroutine_threadsafe(_request("json", system, user, model, deadline), _get_loop()).result()
+
+def llm_array(system: str, user: str, model: str, deadline: Optional[float] = None):
+    with span("llm", tool="array", bytes_in=len(system) + len(user)):
+        return asyncio.run_coroutine_threadsafe(_request("array", system, user, model, deadline), _get_loop()).result()
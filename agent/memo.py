@@ -0,0 +1,169 @@
+from __future__ import annotations
+import os, json, shutil, hashlib, threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from app.settings import settings
+from agent.artefacts import link_file
+from agent.sandbox_lib import disk_lru
+
+# Deterministic tools whose outputs are a pure function of args + input bytes
+MEMO_TOOLS = {
+    "html_table_to_csv", "pdf_to_text", "pdf_tables_to_csv", "image_ocr_to_text",
+    "excel_to_df", "csv_to_df", "json_load", "json_to_df", "sql_to_sqlite",
+}
+
+# Settings that change a tool's output bytes, so they are part of the key
+_OUTPUT_SETTINGS = (
+    "INGEST_FORMAT", "INGEST_MIN_INT_BITS", "INGEST_STREAM_MIN_BYTES", "INGEST_SAMPLE_ROWS",
+    "OCR_TARGET_DPI", "OCR_BINARIZE", "OCR_TILE_PX",
+)
+
+_MANIFEST = "manifest.json"
+_MAX_HASHES = 4096
+
+def _sha256(path: str) -> str:
+    d = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            d.update(chunk)
+    return d.hexdigest()
+
+def _rel(path: str, workdir: str) -> Optional[str]:
+    rel = os.path.relpath(os.path.abspath(path), os.path.abspath(workdir))
+    return None if rel.startswith("..") else rel
+
+class StepMemo:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hashes: "OrderedDict[tuple, str]" = OrderedDict()
+        os.makedirs(root, exist_ok=True)
+
+    def file_hash(self, path: str) -> str:
+        st = os.stat(path)
+        ident = (os.path.abspath(path), st.st_size, st.st_mtime_ns, st.st_ino)
+        with self._lock:
+            h = self._hashes.get(ident)
+            if h is not None:
+                self._hashes.move_to_end(ident)
+                return h
+        h = _sha256(path)
+        with self._lock:
+            self._hashes[ident] = h
+            while len(self._hashes) > _MAX_HASHES:
+                self._hashes.popitem(last=False)
+        return h
+
+    def key(self, spec: Dict[str, Any], inputs: List[str]) -> str:
+        ident = {
+            "tool": spec.get("tool"),
+            "args": spec.get("args", {}),
+            "writes": spec.get("writes", {}),
+            "settings": {name: getattr(settings, name) for name in _OUTPUT_SETTINGS},
+            "inputs": [self.file_hash(p) for p in inputs],
+        }
+        return hashlib.sha256(json.dumps(ident, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def restore(self, key: str, workdir: str) -> Optional[Dict[str, Any]]:
+        """Copy a cached step's output files into workdir; None on miss.
+
+        Outputs are reflinked or copied, never linked, so a job rewriting an
+        input in place cannot reach the entry; each copy is checked against the
+        hash recorded at store time and a mismatching entry is dropped.
+        """
+        entry = os.path.join(self.root, key)
+        try:
+            with open(os.path.join(entry, _MANIFEST), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        def _load(v):
+            if isinstance(v, dict) and "file" in v:
+                dest = os.path.join(workdir, v["rel"])
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                link_file(os.path.join(entry, v["file"]), dest)
+                if _sha256(dest) != v.get("sha256"):
+                    raise ValueError(f"memo entry {key} is corrupt")
+                return dest
+            if isinstance(v, list):
+                return [_load(x) for x in v]
+            return v["value"]
+
+        try:
+            produced = {k: _load(v) for k, v in manifest["produced"].items()}
+        except OSError:
+            return None  # evicted underneath us
+        except ValueError:
+            with self._lock:
+                shutil.rmtree(entry, ignore_errors=True)
+            return None
+        disk_lru.touch(os.path.join(entry, _MANIFEST))
+        return produced
+
+    def store(self, key: str, tool: str, produced: Dict[str, Any], workdir: str) -> None:
+        entry = os.path.join(self.root, key)
+        tmp = entry + f".tmp{os.getpid()}.{threading.get_ident()}"
+        files = [0]
+
+        def _save(v):
+            if isinstance(v, list):
+                return [_save(x) for x in v]
+            if isinstance(v, str) and os.path.isfile(v):
+                rel = _rel(v, workdir)
+                if rel is None:
+                    raise ValueError("output outside workdir")
+                name = f"{files[0]}_{os.path.basename(v)}"
+                files[0] += 1
+                shutil.copyfile(v, os.path.join(tmp, name))
+                return {"file": name, "rel": rel, "sha256": _sha256(os.path.join(tmp, name))}
+            return {"value": v}
+
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            manifest = {"tool": tool, "produced": {k: _save(v) for k, v in produced.items()}}
+            with open(os.path.join(tmp, _MANIFEST), "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            with self._lock:
+                if os.path.exists(entry):
+                    shutil.rmtree(tmp)
+                else:
+                    os.rename(tmp, entry)
+                self._evict()
+        except (OSError, ValueError):
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def invalidate(self, tool: str|None=None) -> int:
+        """Drop every entry (or only those produced by `tool`); returns how many were removed.
+
+        Directories without a manifest are stores still in flight and are left alone.
+        """
+        removed = 0
+        with self._lock:
+            for key in os.listdir(self.root):
+                entry = os.path.join(self.root, key)
+                try:
+                    with open(os.path.join(entry, _MANIFEST), "r", encoding="utf-8") as f:
+                        if tool is not None and json.load(f).get("tool") != tool:
+                            continue
+                except (OSError, ValueError):
+                    continue
+                shutil.rmtree(entry, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def _evict(self) -> None:
+        disk_lru.evict(disk_lru.dir_entries(self.root, _MANIFEST), self.max_bytes)
+
+_memo: StepMemo|None = None
+_memo_lock = threading.Lock()
+
+def get_memo() -> StepMemo|None:
+    global _memo
+    if not settings.MEMO_DIR:
+        return None
+    with _memo_lock:
+        if _memo is None:
+            _memo = StepMemo(settings.MEMO_DIR, settings.MEMO_MAX_BYTES)
+        return _memo
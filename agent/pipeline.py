@@ -0,0 +1,75 @@
+from __future__ import annotations
+import re
+from typing import Any, Dict, List
+from app.settings import settings
+from agent.deadline import Deadline
+from agent.planner import plan_from_questions
+from agent.executor import execute_plan
+from agent.answerer import batch_answer
+from agent.tools import parse_questions
+from agent.sandbox_lib.plotenc import encode_image
+
+# --- Typed placeholders for answers we could not produce in time ---
+def tiny_png_data_uri() -> str:
+    from PIL import Image
+    return encode_image(Image.new("RGB", (1, 1), (255, 255, 255)))
+
+_PLOT_Q = re.compile(r"\b(plot|chart|graph|draw|image|histogram|scatter|data uri|base64)\b", re.I)
+_FLOAT_Q = re.compile(r"\b(correlation|average|mean|median|ratio|slope|percent|rate|regression)\b", re.I)
+_INT_Q = re.compile(r"\b(how many|count|number of|which year|what year)\b", re.I)
+
+def placeholder(question: str, expect: str|None=None) -> Any:
+    expect = expect or ""
+    if "data_uri" in expect or (not expect and _PLOT_Q.search(question)):
+        return tiny_png_data_uri()
+    if "json scalar/float" in expect or (not expect and _FLOAT_Q.search(question)):
+        return 0.0
+    if "json scalar/int" in expect or (not expect and _INT_Q.search(question)):
+        return 0
+    return ""
+
+def _fill(questions: List[str], answers: List[Any], plan: Dict[str, Any]|None, artefacts: Dict[str, Any]) -> List[Any]:
+    contract = (plan or {}).get("artefacts_contract", {}) or {}
+    question_keys = (plan or {}).get("answer_keys") or []
+    out = []
+    for i, q in enumerate(questions):
+        keys = question_keys[i] if i < len(question_keys) and isinstance(question_keys[i], list) else []
+        a = answers[i] if i < len(answers) else None
+        if a is None and len(keys) == 1 and keys[0] in contract and keys[0] in artefacts:
+            a = artefacts[keys[0]]  # validated against the contract, usable as-is
+        if a is None:
+            a = placeholder(q, contract.get(keys[0]) if len(keys) == 1 else None)
+        out.append(a)
+    return out
+
+# --- One request, end to end, inside a time budget ---
+def answer_request(questions_txt: str, upload_paths: List[str], workdir: str, deadline: Deadline,
+                   errors: List[str]|None=None) -> List[Any]:
+    """Plan, execute and answer within `deadline`.
+
+    Planning and execution stop ANSWER_RESERVE_SEC early so the answerer
+    always gets a turn; anything that fails or runs out of time degrades to
+    artefacts that did complete, then to typed placeholders. What went wrong
+    is appended to `errors`.
+    """
+    questions = parse_questions(questions_txt) or [questions_txt]
+    work = deadline.reserve(settings.ANSWER_RESERVE_SEC)
+    errors = errors if errors is not None else []
+    plan, artefacts = None, {}
+    try:
+        plan = plan_from_questions(questions_txt, upload_paths, deadline=work)
+    except Exception as e:
+        errors.append(f"plan: {e}")
+    if plan is not None and not work.expired():
+        try:
+            artefacts = execute_plan(plan, workdir, settings.MAX_PLOT_BYTES, deadline=work, errors=errors)
+        except Exception as e:
+            errors.append(f"execute: {e}")
+    answers: List[Any] = []
+    if not deadline.expired():
+        try:
+            answers = batch_answer(questions, artefacts, (plan or {}).get("answer_keys"),
+                                   deadline=deadline, strict=False)
+        except Exception as e:
+            errors.append(f"answer: {e}")
+    return _fill(questions, answers, plan, artefacts)
@@ -0,0 +1,187 @@
+from __future__ import annotations
+import os, re, csv, json, time, sqlite3, hashlib, logging, threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from app.settings import settings
+
+# --- Key: normalized questions + attachment fingerprint ---
+_WS = re.compile(r"\s+")
+
+def normalize_questions(text: str) -> str:
+    return _WS.sub(" ", text).strip().lower()
+
+_schemas: "OrderedDict[tuple, List[str]]" = OrderedDict()  # file identity -> columns
+_schemas_lock = threading.Lock()
+
+def _schema(path: str) -> List[str]:
+    """Column headers, cached by file identity so an upload read while it arrived is not read again."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return []
+    ident = (os.path.abspath(path), st.st_size, st.st_mtime_ns, st.st_ino)
+    with _schemas_lock:
+        if ident in _schemas:
+            _schemas.move_to_end(ident)
+            return _schemas[ident]
+    cols = _read_schema(path)
+    with _schemas_lock:
+        _schemas[ident] = cols
+        while len(_schemas) > 256:
+            _schemas.popitem(last=False)
+    return cols
+
+def _read_schema(path: str) -> List[str]:
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext in (".csv", ".tsv"):
+            with open(path, "r", encoding="utf-8", errors="ignore", newline="") as f:
+                return next(csv.reader(f, delimiter="\t" if ext == ".tsv" else ","), [])
+        if ext in (".xlsx", ".xls"):
+            import pandas as pd
+            return [str(c) for c in pd.read_excel(path, nrows=0).columns]
+        if ext == ".parquet":
+            import pyarrow.parquet as pq
+            return list(pq.read_schema(path).names)
+    except Exception:
+        pass
+    return []
+
+def attachment_fingerprint(upload_paths: List[str]) -> List[Dict[str, Any]]:
+    """Names, types and column headers -- not contents -- of the attachments."""
+    fp = []
+    for p in sorted(upload_paths, key=os.path.basename):
+        fp.append({"name": os.path.basename(p), "type": os.path.splitext(p)[1].lower(), "columns": _schema(p)})
+    return fp
+
+def plan_key(questions_txt: str, upload_paths: List[str]) -> str:
+    ident = {
+        "q": normalize_questions(questions_txt),
+        "files": attachment_fingerprint(upload_paths),
+        "model": settings.MODEL_PLANNER,
+        "fmt": settings.INGEST_FORMAT,
+    }
+    return hashlib.sha256(json.dumps(ident, sort_keys=True).encode("utf-8")).hexdigest()
+
+def prefetch_upload(path: str) -> None:
+    """Fingerprint an upload as soon as it is on disk: its schema for plan_key and its
+    content hash for the step memo, so both keys are ready when the plan is."""
+    from agent.memo import get_memo
+    attachment_fingerprint([path])
+    memo = get_memo()
+    if memo is not None:
+        try:
+            memo.file_hash(path)
+        except OSError:
+            pass
+
+# --- Persistent LRU/TTL store (sqlite) ---
+log = logging.getLogger(__name__)
+
+class PlanCache:
+    """sqlite errors (e.g. "database is locked" with several workers on one file)
+    are logged and counted, never raised: a broken cache only means a replan."""
+
+    def __init__(self, path: str, max_entries: int, ttl_sec: int):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS plans (key TEXT PRIMARY KEY, plan TEXT NOT NULL, "
+                         "created REAL NOT NULL, last_used REAL NOT NULL, plan_sec REAL NOT NULL DEFAULT 0)")
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+        self.saved_sec = 0.0
+        self.errors = 0
+
+    def _failed(self, op: str, e: sqlite3.Error) -> None:
+        self.errors += 1
+        log.warning("plan cache %s failed: %s", op, e)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._db.execute("SELECT plan, created, plan_sec FROM plans WHERE key=?", (key,)).fetchone()
+                if row and now - row[1] > self.ttl_sec:
+                    self._db.execute("DELETE FROM plans WHERE key=?", (key,))
+                    self._db.commit()
+                    row = None
+                if row is not None:
+                    self._db.execute("UPDATE plans SET last_used=? WHERE key=?", (now, key))
+                    self._db.commit()
+            except sqlite3.Error as e:
+                self._failed("get", e)
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_sec += row[2]
+        return json.loads(row[0])
+
+    def put(self, key: str, plan: Dict[str, Any], plan_sec: float) -> None:
+        now = time.time()
+        with self._lock:
+            try:
+                self._db.execute("INSERT OR REPLACE INTO plans (key, plan, created, last_used, plan_sec) VALUES (?,?,?,?,?)",
+                                 (key, json.dumps(plan), now, now, plan_sec))
+                self._db.execute("DELETE FROM plans WHERE created < ?", (now - self.ttl_sec,))
+                self._db.execute("DELETE FROM plans WHERE key NOT IN "
+                                 "(SELECT key FROM plans ORDER BY last_used DESC LIMIT ?)", (self.max_entries,))
+                self._db.commit()
+            except sqlite3.Error as e:
+                self._db.rollback()
+                self._failed("put", e)
+
+    def invalidate(self, key: str|None=None) -> None:
+        with self._lock:
+            try:
+                if key is None:
+                    self._db.execute("DELETE FROM plans")
+                else:
+                    self._db.execute("DELETE FROM plans WHERE key=?", (key,))
+                self._db.commit()
+            except sqlite3.Error as e:
+                self._db.rollback()
+                self._failed("invalidate", e)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0, "saved_sec": round(self.saved_sec, 3),
+                "errors": self.errors}
+
+_cache: PlanCache|None = None
+_cache_lock = threading.Lock()
+
+def get_plan_cache() -> PlanCache|None:
+    global _cache
+    if not settings.PLAN_CACHE_PATH:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = PlanCache(settings.PLAN_CACHE_PATH, settings.PLAN_CACHE_MAX_ENTRIES, settings.PLAN_CACHE_TTL)
+            except sqlite3.Error as e:  # retried on the next call
+                log.warning("plan cache unavailable: %s", e)
+        return _cache
+
+def remember_plan(plan: Dict[str, Any]) -> None:
+    """Store a freshly generated plan once it has executed and passed its contract."""
+    meta = plan.get("_cache") or {}
+    cache = get_plan_cache()
+    if cache is None or not meta.get("key") or meta.get("hit"):
+        return
+    clean = {k: v for k, v in plan.items() if k != "_cache"}
+    cache.put(meta["key"], clean, meta.get("plan_sec", 0.0))
+
+def forget_plan(plan: Dict[str, Any]) -> None:
+    """Drop a cached plan that failed to execute or broke its contract, so the next request replans."""
+    meta = plan.get("_cache") or {}
+    cache = get_plan_cache()
+    if cache is not None and meta.get("key") and meta.get("hit"):
+        cache.invalidate(meta["key"])
@@ -1,15 +1,32 @@
-import os
-from typing import List, Dict, Any
+import os, time
+from typing import List, Dict, Any, Optional
 from agent.llm import llm_json
 from app.settings import settings
-from agent.prompts import PLANNER_SYSTEM, PLANNER_USER_TEMPLATE
+from agent.prompts import PLANNER_SYSTEM, PLANNER_USER_TEMPLATE, TABLE_READERS
+from agent.plan_cache import get_plan_cache, plan_key
+from agent.deadline import Deadline
+from agent.trace import span
 
-def plan_from_questions(questions_txt: str, upload_paths: List[str]) -> Dict[str, Any]:
+def plan_from_questions(questions_txt: str, upload_paths: List[str], deadline: Optional[Deadline]=None) -> Dict[str, Any]:
+    cache = get_plan_cache()
+    ckey = plan_key(questions_txt, upload_paths) if cache else None
+    if cache:
+        cached = cache.get(ckey)
+        if cached is not None:
+            cached["_cache"] = {"key": ckey, "hit": True}
+            return cached
+
+    t0 = time.monotonic()
     attachments = "\n".join(f"- {os.path.basename(p)}" for p in upload_paths)
-    user = PLANNER_USER_TEMPLATE.format(questions_txt=questions_txt, attachments=attachments)
-    plan = llm_json(PLANNER_SYSTEM, user, model=settings.MODEL_PLANNER)
+    fmt = settings.INGEST_FORMAT
+    user = PLANNER_USER_TEMPLATE.format(questions_txt=questions_txt, attachments=attachments,
+                                        table_format=fmt, table_reader=TABLE_READERS[fmt])
+    with span("plan", bytes_in=len(user)):
+        plan = llm_json(PLANNER_SYSTEM, user, model=settings.MODEL_PLANNER, deadline=deadline.at if deadline else None)
     # Minimal validation & defaults
-    for key in ("scrapes", "ingest", "python_jobs", "artefacts_contract"):
+    for key in ("scrapes", "ingest", "queries", "python_jobs", "artefacts_contract"):
         if key not in plan:
             plan.setdefault(key, [] if key != "artefacts_contract" else {})
+    # Cached by agent.plan_cache.remember_plan only after it executes cleanly
+    plan["_cache"] = {"key": ckey, "hit": False, "plan_sec": time.monotonic() - t0}
     return plan
@@ -4,6 +4,8 @@ PLANNER_SYSTEM = (
     "and use only Python standard library + pandas + numpy + matplotlib."
 )
 
+TABLE_READERS = {"csv": "pd.read_csv(path)", "parquet": "pd.read_parquet(path)", "arrow": "pd.read_feather(path)"}
+
 PLANNER_USER_TEMPLATE = """{questions_txt}
 
 Attachments:
@@ -11,25 +13,36 @@ Attachments:
 
 Tools available:
 - http_fetch(url) -> text or bytes
-- html_table_to_csv(html, css_selector?) -> csv path
-- pdf_to_text(path) -> txt path
-- pdf_tables_to_csv(path) -> list[csv paths]
+- html_table_to_csv(html, css_selector?, match?, index?) -> csv path  (first table matching css_selector,
+  match: regex on its caption/preceding heading, index: nth of those; rowspan/colspan expanded, footnotes dropped)
+- pdf_to_text(path, pages?) -> txt path  (pages: 1-based like "1-5,9"; omit for all)
+- pdf_tables_to_csv(path, pages?) -> list[csv paths]
 - image_ocr_to_text(path) -> txt path
 - csv_to_df(path) -> DataFrame (pandas)
 - excel_to_df(path) -> DataFrame (pandas)
-- json_load(path) -> JSON object
+- json_load(path) -> JSON object  (NDJSON becomes an array)
+- json_to_df(path, records?) -> DataFrame (pandas)  (records from a JSON array, NDJSON lines or the array at
+  `records`, a dotted key path; nested keys become "a.b" columns, lists JSON text; prefer it for large record dumps)
 - sql_to_sqlite(sql_path?, sql_str?) -> sqlite db path
-- python_exec(code, inputs:{name:path|json}) -> writes named outputs
-- save_plot_png_b64(plt_figure, max_bytes=100000) -> data_uri
+- duckdb_query(sql, reads:{{alias:$artefact}}) -> one output: .json (1x1 result -> scalar) or a table
+  (tables/json files become views named by alias; a sqlite db becomes schema alias, e.g. alias.tbl)
+- python_exec(code, inputs:{{name:path|json}}) -> writes named outputs
+- save_plot(fig, "<name>.datauri", max_bytes=100000) -> data_uri  (in python code: `from plotenc import save_plot`;
+  renders once and shrinks to fit the limit)
 - compose_json_array(items) -> final JSON array
 
-Return JSON object with keys: scrapes[], ingest[], python_jobs[], artefacts_contract{}
+Return JSON object with keys: scrapes[], ingest[], queries[], python_jobs[], artefacts_contract{{}}, answer_keys[]
+(queries: {{"id", "reads", "sql", "writes": {{name: file}}}} run duckdb_query; python_jobs may read their outputs)
+(answer_keys: one list of artefact names per question, in question order)
 Rules:
 - Prefer ≤2 scrapes unless strictly necessary.
 - Python code MUST create every file declared in `writes`.
-- Plots must be <100000 bytes when saved as PNG base64.
+- Plots must be <100000 bytes as a data URI: write them with plotenc.save_plot, never by hand.
 - No network calls inside Python code (scrapes only via tools).
 - Use only pandas/numpy/matplotlib.
+- Counts, sums, averages, filters, joins and group-bys go in queries (DuckDB SQL), not python_jobs;
+  keep python_jobs for plots and what SQL cannot express.
+- Tables from html_table_to_csv/pdf_tables_to_csv/csv_to_df/excel_to_df/json_to_df are stored as {table_format}; load them with {table_reader}.
 - Validate types exactly as per artefacts_contract.
 """
 
@@ -1,30 +1,264 @@
-import os, sys, subprocess, venv
+import os, sys, json, time, select, shutil, hashlib, subprocess, tempfile, threading, venv, queue
 from typing import Tuple
+from app.settings import settings
+from agent.limits import resource
+from agent.trace import span
+from agent.sandbox_lib import disk_lru
 
 class PyExecError(Exception):
     pass
 
+# --- Warm worker pool (see agent/sandbox_worker.py) ---
+_WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+_LIB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_lib")  # plotenc etc. for job code
+
+def _job_env() -> dict:
+    env = {"PYTHONHASHSEED": "0", "PYTHONPATH": _LIB}
+    if settings.PLOT_CACHE_DIR:
+        env["PLOT_CACHE_DIR"] = settings.PLOT_CACHE_DIR
+    return env
+
+class _Worker:
+    def __init__(self):
+        self.proc = subprocess.Popen([sys.executable, _WORKER], env=_job_env(),
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        self.jobs = 0
+        self.ready = False
+
+    def _readline(self, timeout: float) -> dict:
+        r, _, _ = select.select([self.proc.stdout], [], [], timeout)
+        if not r:
+            raise PyExecError("sandbox worker unresponsive")
+        line = self.proc.stdout.readline()
+        if not line:
+            raise PyExecError("sandbox worker died")
+        return json.loads(line)
+
+    def wait_ready(self, timeout: float = 60) -> None:
+        if not self.ready:
+            self._readline(timeout)
+            self.ready = True
+
+    def run(self, job: dict) -> dict:
+        self.wait_ready()
+        self.proc.stdin.write(json.dumps(job) + "\n")
+        self.proc.stdin.flush()
+        self.jobs += 1
+        return self._readline(job["timeout"] + 5)
+
+    def kill(self) -> None:
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=5)
+        except Exception:
+            pass
+
+class SandboxPool:
+    def __init__(self, size: int, recycle_after: int, mem_mb: int):
+        self.recycle_after = recycle_after
+        self.mem_mb = mem_mb
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        for _ in range(size):
+            self._idle.put(_Worker())
+
+    def _replace(self, w: _Worker) -> None:
+        w.kill()
+        self._idle.put(_Worker())
+
+    def warm(self, timeout: float = 60) -> None:
+        """Block until the idle workers have finished preloading."""
+        held = []
+        while True:
+            try:
+                held.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            for w in held:
+                w.wait_ready(timeout)
+        finally:
+            for w in held:
+                self._idle.put(w)
+
+    def run(self, code_path: str, workdir: str, timeout_sec: float, wait: float) -> Tuple[int,str,str]|None:
+        """Run a job on an idle worker; None if none frees up within `wait` seconds."""
+        with span("sandbox.start", tool="pool"):
+            try:
+                w = self._idle.get(timeout=wait)
+            except queue.Empty:
+                return None
+        try:
+            with span("sandbox.run", tool="pool") as sp:
+                res = w.run({"code_path": code_path, "cwd": os.path.abspath(workdir),
+                             "timeout": timeout_sec, "mem_mb": self.mem_mb, "env": _job_env()})
+                sp.set(child_rss=res.get("rss", 0))
+        except Exception:
+            self._replace(w)
+            raise
+        if w.proc.poll() is not None or w.jobs >= self.recycle_after:
+            self._replace(w)
+        else:
+            self._idle.put(w)
+        if res.get("timed_out"):
+            raise subprocess.TimeoutExpired(code_path, timeout_sec, res["stdout"], res["stderr"])
+        return res["rc"], res["stdout"], res["stderr"]
+
+_pool: SandboxPool|None = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> SandboxPool|None:
+    global _pool
+    if settings.SANDBOX_POOL_SIZE <= 0 or not hasattr(os, "fork"):
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(settings.SANDBOX_POOL_SIZE, settings.SANDBOX_RECYCLE_AFTER, settings.SANDBOX_MEM_MB)
+        return _pool
+
+def _run_child(cmd: list, cwd: str, env: dict, timeout_sec: float) -> Tuple[int,str,str,int]:
+    """subprocess.run(capture_output=True, text=True) that also returns the child's peak RSS
+    in bytes: reaped with wait4 so the figure is this job's, not every child's so far."""
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=out, stderr=err)
+        killed = threading.Event()
+        killer = threading.Timer(max(0.0, timeout_sec), lambda: (killed.set(), proc.kill()))
+        killer.start()
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+        finally:
+            killer.cancel()
+        proc.returncode = os.waitstatus_to_exitcode(status)  # reaped here; keep Popen from waiting again
+        out.seek(0); err.seek(0)
+        stdout = out.read().decode("utf-8", "replace")
+        stderr = err.read().decode("utf-8", "replace")
+    if killed.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout_sec, stdout, stderr)
+    return proc.returncode, stdout, stderr, usage.ru_maxrss * 1024  # kB on Linux
+
 def python_exec(code: str, workdir: str, timeout_sec: int = 40) -> Tuple[int,str,str]:
+    with resource("sandbox"):
+        return _python_exec(code, workdir, timeout_sec)
+
+def _python_exec(code: str, workdir: str, timeout_sec: float) -> Tuple[int,str,str]:
     code_path = os.path.join(workdir, "job.py")
     with open(code_path, "w", encoding="utf-8") as f:
         f.write(code)
-    env = {"PYTHONHASHSEED":"0"}
-    proc = subprocess.run([sys.executable, code_path], cwd=workdir, env=env,
-                          capture_output=True, text=True, timeout=timeout_sec)
-    return proc.returncode, proc.stdout, proc.stderr
+    pool = get_pool()
+    if pool is not None:
+        t0 = time.monotonic()
+        res = pool.run(code_path, workdir, timeout_sec, wait=min(settings.SANDBOX_POOL_WAIT, timeout_sec / 2))
+        if res is not None:
+            return res
+        timeout_sec -= time.monotonic() - t0  # all workers busy: cold subprocess in the time left
+    env = _job_env()
+    with span("sandbox.run", tool="subprocess") as sp:
+        rc, out, err, rss = _run_child([sys.executable, code_path], workdir, env, timeout_sec)
+        sp.set(child_rss=rss)
+    return rc, out, err
 
 ALLOW_PIP = {"pandas","numpy","matplotlib","duckdb","pdfplumber"}
 
-def python_exec_with_venv(code: str, workdir: str, pkgs: list[str]|None=None, timeout_sec: int = 40):
-    vdir = os.path.join(workdir, ".venv")
+# --- Content-addressed venv cache ---
+_READY = ".ready"
+_venv_locks: dict = {}
+_venv_locks_guard = threading.Lock()
+
+def _safe_pkgs(pkgs: list[str]|None) -> list[str]:
+    norm = {p.strip().lower().replace("_", "-").replace(" ", "") for p in (pkgs or []) if p and p.strip()}
+    return sorted(p for p in norm if p.split('==')[0] in ALLOW_PIP)
+
+def venv_key(pkgs: list[str]|None) -> str:
+    ident = json.dumps({"pkgs": _safe_pkgs(pkgs), "py": list(sys.version_info[:3]), "impl": sys.implementation.name,
+                        "plat": sys.platform})
+    return hashlib.sha256(ident.encode("utf-8")).hexdigest()[:20]
+
+def _venv_bin(vdir: str, name: str) -> str:
+    return os.path.join(vdir, 'bin', name) if os.name != 'nt' else os.path.join(vdir, 'Scripts', name + '.exe')
+
+def _lock_file(path: str, exclusive: bool, block: bool = True):
+    import fcntl
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+    try:
+        fcntl.flock(fd, flags if block else flags | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+def _unlock_file(fd) -> None:
+    if fd is not None:
+        os.close(fd)
+
+def _marker_size(vdir: str) -> int:
+    try:
+        return int(open(os.path.join(vdir, _READY), encoding="utf-8").read() or 0)
+    except (OSError, ValueError):
+        return 0
+
+def _evict_venvs(root: str, budget: int) -> None:
+    def _drop(paths):
+        vdir = paths[0]
+        fd = _lock_file(vdir + ".lock", exclusive=True, block=False)
+        if fd is None:
+            return False  # in use (including the env we just built)
+        try:
+            return disk_lru.remove(paths)
+        finally:
+            _unlock_file(fd)
+    disk_lru.evict(disk_lru.dir_entries(root, _READY, size=_marker_size), budget, drop=_drop)
+
+def _build_venv(vdir: str, safe: list[str], timeout_sec: int) -> None:
+    if os.path.exists(vdir):
+        shutil.rmtree(vdir)  # leftover from an interrupted build
     venv.EnvBuilder(with_pip=True).create(vdir)
-    pip = os.path.join(vdir, 'bin', 'pip') if os.name != 'nt' else os.path.join(vdir, 'Scripts', 'pip.exe')
-    py  = os.path.join(vdir, 'bin', 'python') if os.name != 'nt' else os.path.join(vdir, 'Scripts', 'python.exe')
-    if pkgs:
-        safe = [p for p in pkgs if p.split('==')[0] in ALLOW_PIP]
-        if safe:
-            subprocess.run([pip, 'install', '--no-cache-dir', *safe], cwd=workdir, check=True, timeout=timeout_sec)
-    code_path = os.path.join(workdir, 'job.py')
-    open(code_path,'w',encoding='utf-8').write(code)
-    proc = subprocess.run([py, code_path], cwd=workdir, capture_output=True, text=True, timeout=timeout_sec)
-    return proc.returncode, proc.stdout, proc.stderr
+    if safe:
+        cmd = [_venv_bin(vdir, 'pip'), 'install', '--no-cache-dir', '--disable-pip-version-check']
+        if settings.PIP_WHEELHOUSE:
+            cmd += ['--no-index', '--find-links', settings.PIP_WHEELHOUSE]
+        subprocess.run([*cmd, *safe], check=True, timeout=timeout_sec, capture_output=True)
+    with open(os.path.join(vdir, _READY), "w", encoding="utf-8") as f:
+        f.write(str(disk_lru.tree_size(vdir)))
+
+def ensure_venv(pkgs: list[str]|None, timeout_sec: int = 40) -> Tuple[str, int]:
+    """Return (venv dir, shared-lock fd) for the package set, building it once.
+
+    The caller must release the fd with _unlock_file once the job is done;
+    holding it keeps eviction away from an environment that is in use.
+    """
+    root = settings.VENV_CACHE_DIR
+    os.makedirs(root, exist_ok=True)
+    key = venv_key(pkgs)
+    vdir = os.path.join(root, key)
+    lock_path = os.path.join(root, key + ".lock")
+    with _venv_locks_guard:
+        tlock = _venv_locks.setdefault(key, threading.Lock())
+    with tlock:
+        fd = _lock_file(lock_path, exclusive=False)
+        if not os.path.exists(os.path.join(vdir, _READY)):
+            _unlock_file(fd)
+            xfd = _lock_file(lock_path, exclusive=True)
+            try:
+                if not os.path.exists(os.path.join(vdir, _READY)):
+                    with span("venv.build", children=True):
+                        _build_venv(vdir, _safe_pkgs(pkgs), timeout_sec)
+            finally:
+                _unlock_file(xfd)
+            fd = _lock_file(lock_path, exclusive=False)
+            _evict_venvs(root, settings.VENV_CACHE_MAX_BYTES)
+    disk_lru.touch(os.path.join(vdir, _READY))
+    return vdir, fd
+
+def python_exec_with_venv(code: str, workdir: str, pkgs: list[str]|None=None, timeout_sec: int = 40):
+    vdir, fd = ensure_venv(pkgs, timeout_sec)
+    try:
+        code_path = os.path.join(workdir, 'job.py')
+        open(code_path,'w',encoding='utf-8').write(code)
+        env = {**_job_env(), "PYTHONDONTWRITEBYTECODE": "1"}  # shared env stays read-only
+        with resource("sandbox"), span("sandbox.run", tool="venv") as sp:
+            rc, out, err, rss = _run_child([_venv_bin(vdir, 'python'), code_path], workdir, env, timeout_sec)
+            sp.set(child_rss=rss)
+        return rc, out, err
+    finally:
+        _unlock_file(fd)
@@ -0,0 +1,60 @@
+"""Size/count-capped disk caches that evict least recently used entries.
+
+An entry's "clock" file is touched on every hit, so its mtime orders eviction.
+Stdlib only: sandbox jobs import it next to plotenc.
+"""
+import os, shutil
+
+def touch(clock):
+    """Mark an entry as just used."""
+    try:
+        os.utime(clock)
+    except OSError:
+        pass
+
+def remove(paths):
+    for p in paths:
+        if os.path.isdir(p) and not os.path.islink(p):
+            shutil.rmtree(p, ignore_errors=True)
+        else:
+            try: os.remove(p)
+            except OSError: pass
+    return True
+
+def tree_size(path):
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for fn in files:
+            try: total += os.lstat(os.path.join(dirpath, fn)).st_size
+            except OSError: pass
+    return total
+
+def dir_entries(root, clock, size=tree_size):
+    """(clock path, [dir], bytes) per subdirectory of root that has a `clock` file.
+
+    Directories without one (still being written) are never candidates.
+    """
+    out = []
+    for e in os.scandir(root):
+        marker = os.path.join(e.path, clock)
+        if e.is_dir(follow_symlinks=False) and os.path.exists(marker):
+            try: out.append((marker, [e.path], size(e.path)))
+            except OSError: pass
+    return out
+
+def evict(entries, max_bytes=None, max_entries=None, drop=remove):
+    """Drop the oldest (clock, paths, bytes) entries until both caps hold.
+
+    `drop(paths)` returns False to keep an entry that is in use; returns how many were dropped.
+    """
+    aged = []
+    for clock, paths, size in entries:
+        try: aged.append((os.path.getmtime(clock), paths, size))
+        except OSError: pass
+    total, count, dropped = sum(a[2] for a in aged), len(aged), 0
+    for _, paths, size in sorted(aged, key=lambda a: a[0]):
+        if (max_bytes is None or total <= max_bytes) and (max_entries is None or count <= max_entries):
+            break
+        if drop(paths):
+            total, count, dropped = total - size, count - 1, dropped + 1
+    return dropped
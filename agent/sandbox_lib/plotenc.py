@@ -0,0 +1,151 @@
+"""Size-constrained plot encoder, importable from sandbox jobs (`from plotenc import save_plot`).
+
+A figure is rendered once. The encoder then searches palette quantisation,
+PNG compression, optional WebP and downscaling of that raster until the data
+URI fits the byte budget; the size of each miss predicts the next scale, so
+most plots take one or two encodes. Results are cached on disk by a hash of
+the rendered pixels (PLOT_CACHE_DIR), and every attempt is logged next to the
+output as <path>.log.json for the executor to report.
+
+Stdlib + Pillow (+ matplotlib for figures) only: it also runs inside venvs.
+"""
+import os, io, json, time, base64, hashlib, tempfile
+
+try:
+    from . import disk_lru
+except ImportError:  # top-level `plotenc` inside sandbox jobs
+    import disk_lru
+
+_CACHE_MAX_ENTRIES = 2000
+
+def _cache_dir():
+    return os.environ.get("PLOT_CACHE_DIR") or None
+
+def _cache_get(key):
+    d = _cache_dir()
+    if not d:
+        return None
+    path = os.path.join(d, key + ".datauri")
+    try:
+        with open(path, "r", encoding="ascii") as f:
+            uri = f.read()
+        disk_lru.touch(path)
+        return uri
+    except OSError:
+        return None
+
+def _cache_put(key, uri):
+    d = _cache_dir()
+    if not d:
+        return
+    try:
+        os.makedirs(d, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=d, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="ascii") as f:
+            f.write(uri)
+        os.replace(tmp, os.path.join(d, key + ".datauri"))
+        entries = [(e.path, [e.path], 0) for e in os.scandir(d) if e.name.endswith(".datauri")]
+        if len(entries) > _CACHE_MAX_ENTRIES:
+            disk_lru.evict(entries, max_entries=_CACHE_MAX_ENTRIES)
+    except OSError:
+        pass
+
+# --- Render once ---
+def render(fig, dpi=None):
+    """Rasterise a matplotlib figure to an RGB PIL image (the only render)."""
+    from PIL import Image
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi or fig.dpi, facecolor="white",
+                pil_kwargs={"compress_level": 1})
+    buf.seek(0)
+    return Image.open(buf).convert("RGB")
+
+# --- Encoding search ---
+def _encode(img, fmt, colors=None, quality=None):
+    buf = io.BytesIO()
+    if fmt == "webp":
+        img.save(buf, format="WEBP", quality=quality or 80, method=4)
+    else:
+        if colors:
+            from PIL import Image
+            img = img.quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+        img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+def _budget(max_bytes, mime):
+    # data URI = prefix + base64 (4 chars per 3 bytes)
+    return (max_bytes - len(f"data:{mime};base64,")) * 3 // 4
+
+def encode_image(img, max_bytes=100_000, webp=False, attempts=None):
+    """Smallest-effort data URI for a PIL image within max_bytes; appends attempt records to `attempts`."""
+    attempts = attempts if attempts is not None else []
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    w0, h0 = img.size
+
+    def attempt(strategy, im, fmt, **kw):
+        t0 = time.perf_counter()
+        data = _encode(im, fmt, **kw)
+        attempts.append({"strategy": strategy, "size": list(im.size), "bytes": len(data),
+                         "ms": round((time.perf_counter() - t0) * 1000, 2)})
+        return data
+
+    # 1) Full size, 256-colour palette PNG: exact for typical plots, near-lossless otherwise
+    mime = "image/png"
+    data = attempt("png-palette256", img, "png", colors=256)
+    if len(data) > _budget(max_bytes, mime) and webp:
+        mime = "image/webp"
+        data = attempt("webp-q80", img, "webp", quality=80)
+    # 2) Downscale the single render: bytes track pixel area, so the miss ratio predicts the scale
+    scale = 1.0
+    for i in range(6):
+        budget = _budget(max_bytes, mime)
+        if len(data) <= budget:
+            break
+        scale *= max(0.1, min(0.95, (budget / len(data)) ** 0.5 * 0.95))
+        size = (max(16, int(w0 * scale)), max(16, int(h0 * scale)))
+        from PIL import Image
+        im = img.resize(size, Image.LANCZOS)
+        if mime == "image/webp":
+            data = attempt(f"webp-q70@{scale:.2f}", im, "webp", quality=70)
+        else:
+            colors = 256 if i < 3 else 32
+            data = attempt(f"png-palette{colors}@{scale:.2f}", im, "png", colors=colors)
+    if len(data) > _budget(max_bytes, mime):
+        raise ValueError(f"plot does not fit {max_bytes} bytes (best {len(data)} B after {len(attempts)} attempts)")
+    return f"data:{mime};base64," + base64.b64encode(data).decode("ascii")
+
+def encode_figure(fig, max_bytes=100_000, webp=False, dpi=None, attempts=None):
+    """Data URI for a matplotlib figure within max_bytes (cached by rendered pixels)."""
+    attempts = attempts if attempts is not None else []
+    t0 = time.perf_counter()
+    img = render(fig, dpi)
+    attempts.append({"strategy": "render", "size": list(img.size), "bytes": 0,
+                     "ms": round((time.perf_counter() - t0) * 1000, 2)})
+    key = hashlib.sha256(img.tobytes() + repr((img.size, max_bytes, webp)).encode()).hexdigest()[:32]
+    uri = _cache_get(key)
+    if uri is not None:
+        attempts.append({"strategy": "cache", "size": list(img.size), "bytes": len(uri), "ms": 0.0})
+        return uri
+    uri = encode_image(img, max_bytes, webp, attempts)
+    _cache_put(key, uri)
+    return uri
+
+def save_plot_png_b64(fig, max_bytes=100_000, webp=False):
+    return encode_figure(fig, max_bytes, webp)
+
+def save_plot(fig, path, max_bytes=100_000, webp=False):
+    """Encode fig within max_bytes and write the data URI to path (e.g. "plot.datauri")."""
+    attempts = []
+    uri = encode_figure(fig, max_bytes, webp, attempts=attempts)
+    with open(path, "w", encoding="ascii") as f:
+        f.write(uri)
+    with open(path + ".log.json", "w", encoding="utf-8") as f:
+        json.dump(attempts, f)
+    return uri
+
+def shrink_data_uri(uri, max_bytes=100_000, attempts=None):
+    """Re-encode an oversized image data URI (e.g. from plain savefig) to fit max_bytes."""
+    from PIL import Image
+    raw = base64.b64decode(uri.split(",", 1)[1])
+    return encode_image(Image.open(io.BytesIO(raw)), max_bytes, attempts=attempts)
@@ -0,0 +1,104 @@
+"""Warm sandbox worker.
+
+Started once by agent.sandbox.SandboxPool with the heavy libraries already
+imported. For every job line on stdin it forks a throwaway child that runs the
+job in its own cwd with resource limits, so the warm parent is never dirtied.
+Replies with one JSON line per job on stdout.
+"""
+import os, sys, json, time, signal, runpy, tempfile, traceback
+
+def _preload():
+    try:
+        import numpy, pandas  # noqa: F401
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot  # noqa: F401
+        import PIL.Image  # noqa: F401
+        import plotenc  # noqa: F401  (agent/sandbox_lib, on PYTHONPATH)
+    except Exception:
+        pass
+    try:
+        import pyarrow  # noqa: F401  (parquet/arrow ingest outputs)
+    except Exception:
+        pass
+
+def _child(job, out_path, err_path):
+    try:
+        import resource
+        mem = int(job.get("mem_mb") or 0)
+        if mem > 0:
+            resource.setrlimit(resource.RLIMIT_AS, (mem * 1024 * 1024, mem * 1024 * 1024))
+        cpu = int(job.get("timeout") or 0)
+        if cpu > 0:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu + 1, cpu + 1))
+    except Exception:
+        pass
+    out_fd = os.open(out_path, os.O_WRONLY | os.O_TRUNC)
+    err_fd = os.open(err_path, os.O_WRONLY | os.O_TRUNC)
+    os.dup2(out_fd, 1); os.dup2(err_fd, 2)
+    sys.stdin.close()
+    sys.stdout = os.fdopen(1, "w", buffering=1)
+    sys.stderr = os.fdopen(2, "w", buffering=1)
+    os.chdir(job["cwd"])
+    os.environ.clear()
+    os.environ.update(job.get("env") or {"PYTHONHASHSEED": "0"})
+    sys.path[0] = job["cwd"]
+    sys.argv = [job["code_path"]]
+    rc = 0
+    try:
+        runpy.run_path(job["code_path"], run_name="__main__")
+    except SystemExit as e:
+        rc = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if e.code is not None and not isinstance(e.code, int):
+            print(e.code, file=sys.stderr)
+    except BaseException:
+        traceback.print_exc()
+        rc = 1
+    try:
+        sys.stdout.flush(); sys.stderr.flush()
+    finally:
+        os._exit(rc)
+
+def _run(job):
+    out_fd, out_path = tempfile.mkstemp(prefix="sbx-out-")
+    err_fd, err_path = tempfile.mkstemp(prefix="sbx-err-")
+    os.close(out_fd); os.close(err_fd)
+    t0 = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        _child(job, out_path, err_path)
+    deadline = t0 + float(job.get("timeout") or 40)
+    timed_out = False
+    while True:
+        done, status, usage = os.wait4(pid, os.WNOHANG)  # wait4: the job's own peak RSS
+        if done:
+            break
+        if time.monotonic() > deadline:
+            os.kill(pid, signal.SIGKILL)
+            _, status, usage = os.wait4(pid, 0)
+            timed_out = True
+            break
+        time.sleep(0.005)
+    rc = os.waitstatus_to_exitcode(status)
+    with open(out_path, "r", encoding="utf-8", errors="replace") as f: out = f.read()
+    with open(err_path, "r", encoding="utf-8", errors="replace") as f: err = f.read()
+    os.remove(out_path); os.remove(err_path)
+    return {"rc": rc, "stdout": out, "stderr": err, "timed_out": timed_out, "run_sec": time.monotonic() - t0,
+            "rss": usage.ru_maxrss * 1024}
+
+def main():
+    _preload()
+    reply = sys.stdout
+    sys.stdout = sys.stderr  # keep stray prints off the protocol channel
+    reply.write(json.dumps({"ready": True}) + "\n"); reply.flush()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            res = _run(json.loads(line))
+        except Exception as e:
+            res = {"rc": 1, "stdout": "", "stderr": f"sandbox worker error: {e}", "timed_out": False, "run_sec": 0.0}
+        reply.write(json.dumps(res) + "\n"); reply.flush()
+
+if __name__ == "__main__":
+    main()
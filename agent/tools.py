@@ -1,7 +1,10 @@
 from __future__ import annotations
-import os, re, json, requests
-from typing import Dict, Any, List
-import pandas as pd
+import os, re, json, threading
+from typing import TYPE_CHECKING, Dict, Any, List
+from agent.deadline import current as current_deadline
+from agent.trace import span
+if TYPE_CHECKING:  # pandas is imported by the tools that need it, keeping app startup light
+    import pandas as pd
 
 # --- Simple question extractor ---
 _QPAT = re.compile(r"^\s*(?:\d+[\).]|[-*])\s+(.*\S)", re.M)
@@ -12,63 +15,260 @@ def parse_questions(text: str) -> List[str]:
         return parts
     return qs
 
-# --- HTTP fetch with allowlist ---
-def _allowed(host: str, allowlist: tuple[str,...]) -> bool:
-    if not allowlist:
-        return True
-    return any(host.endswith(a) or host == a for a in allowlist)
-
+# --- HTTP fetch with allowlist (pooled, cached; see agent/fetcher.py) ---
 def http_fetch(url: str, allowlist: tuple[str,...]=()) -> bytes:
-    import urllib.parse as up
-    host = up.urlparse(url).hostname or ""
-    if not _allowed(host, allowlist):
-        raise RuntimeError(f"Host not allowed: {host}")
-    r = requests.get(url, timeout=20)
-    r.raise_for_status()
-    return r.content
-
-# --- HTML table to CSV ---
-def html_table_to_csv(html: str, css_selector: str|None, out_csv_path: str) -> str:
-    tables = pd.read_html(html)
-    if not tables:
-        raise RuntimeError("No tables found in HTML")
-    tables[0].to_csv(out_csv_path, index=False)
-    return out_csv_path
+    from agent.fetcher import get_fetcher
+    return get_fetcher().fetch(url, allowlist)
+
+# --- Table output (csv | parquet | arrow) ---
+TABLE_EXT = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+
+def table_path(out_path: str, fmt: str = "csv") -> str:
+    if fmt == "csv":
+        return out_path
+    root, ext = os.path.splitext(out_path)
+    return (root if ext.lower() in (".csv", ".xlsx", ".xls") else out_path) + TABLE_EXT[fmt]
+
+def unique_names(names) -> List[str]:
+    seen: Dict[str, int] = {}
+    cols = []
+    for c in names:
+        c = "" if c is None else str(c)
+        n = seen.get(c, 0)
+        seen[c] = n + 1
+        cols.append(c if n == 0 else f"{c}.{n}")
+    return cols
+
+def _unique_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = unique_names(df.columns)
+    return df
+
+def _write_columnar(df: pd.DataFrame, path: str, fmt: str) -> None:
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.reset_index(drop=True).to_feather(path)
+
+def save_table(df: pd.DataFrame, out_path: str, fmt: str = "csv") -> str:
+    """Write df as csv, parquet or arrow (IPC/Feather v2, memory-mappable); returns the path written."""
+    path = table_path(out_path, fmt)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+        return path
+    df = _unique_columns(df.copy(deep=False))
+    try:
+        _write_columnar(df, path, fmt)
+    except (TypeError, ValueError):
+        # Mixed-type object columns (common in scraped tables) are stored as strings
+        df = df.astype({c: "string" for c in df.columns if df[c].dtype == object})
+        _write_columnar(df, path, fmt)
+    return path
+
+def read_table(path: str) -> pd.DataFrame:
+    import pandas as pd
+    p = path.lower()
+    if p.endswith(".parquet"):
+        return pd.read_parquet(path)
+    if p.endswith((".arrow", ".feather")):
+        import pyarrow.feather as feather
+        return feather.read_table(path, memory_map=True).to_pandas()
+    return pd.read_csv(path)
+
+# --- HTML table to CSV (see agent/html_tables.py) ---
+def html_table_to_csv(html: str, css_selector: str|None, out_csv_path: str, fmt: str = "csv",
+                      match: str|None=None, index: int|None=None) -> str:
+    """html is markup or a saved page's path; the table is picked by css_selector, caption match and index."""
+    from agent.html_tables import extract_table
+    return extract_table(html, out_csv_path, fmt, css_selector, match, index)
 
 # --- PDF/Text/Image ingest ---
-def pdf_to_text(path: str) -> str:
+def parse_pages(spec, n_pages: int) -> List[int]:
+    """0-based page indices for a 1-based spec like "1-5,8", [1, 2] or None (all)."""
+    if spec is None or spec == "":
+        return list(range(n_pages))
+    if isinstance(spec, int):
+        spec = [spec]
+    parts = spec.split(",") if isinstance(spec, str) else spec
+    pages = set()
+    for part in parts:
+        if isinstance(part, int):
+            lo = hi = part
+        else:
+            part = part.strip()
+            if not part:
+                continue
+            lo_s, sep, hi_s = part.partition("-")
+            lo = int(lo_s) if lo_s.strip() else 1
+            hi = (int(hi_s) if hi_s.strip() else n_pages) if sep else lo
+        pages.update(range(max(lo, 1) - 1, min(hi, n_pages)))
+    return sorted(pages)
+
+def _page_chunks(pages: List[int], workers: int) -> List[List[int]]:
+    size = max(1, -(-len(pages) // (workers * 2)))  # ~2 chunks per worker for balance
+    return [pages[i:i+size] for i in range(0, len(pages), size)]
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def _pdf_executor():
+    global _pdf_pool
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing as mp
+    from app.settings import settings
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # spawn: callers run on executor threads, where fork is unsafe
+            _pdf_pool = ProcessPoolExecutor(max_workers=settings.PDF_WORKERS, mp_context=mp.get_context("spawn"))
+        return _pdf_pool
+
+def _reset_pdf_executor(pool, kill: bool = False) -> None:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    procs = list((getattr(pool, "_processes", None) or {}).values()) if kill else []
+    pool.shutdown(wait=False, cancel_futures=True)
+    for p in procs:  # stop pages still being parsed for a request that has given up
+        p.terminate()
+
+def _map_pages(path: str, pages, fn, *args) -> list:
+    """Run fn(path, page_chunk, *args) over page chunks, in parallel for large PDFs; results in page order."""
     import pdfplumber
-    text = []
+    from app.settings import settings
     with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            text.append(page.extract_text() or "")
-    out = path + ".txt"
-    with open(out, "w", encoding="utf-8") as f:
-        f.write("\n".join(text))
+        idx = parse_pages(pages, len(pdf.pages))
+    if settings.PDF_WORKERS <= 1 or len(idx) < settings.PDF_PARALLEL_MIN_PAGES:
+        return fn(path, idx, *args)
+    from concurrent.futures.process import BrokenProcessPool
+    chunks = _page_chunks(idx, settings.PDF_WORKERS)
+    pool = _pdf_executor()
+    out = []
+    deadline = current_deadline()
+    try:
+        for part in pool.map(fn, [path] * len(chunks), chunks, *[[a] * len(chunks) for a in args],
+                             timeout=deadline.remaining() if deadline else None):
+            out.extend(part)
+    except TimeoutError:
+        _reset_pdf_executor(pool, kill=True)
+        raise
+    except BrokenProcessPool:
+        # A worker died (OOM kill, crash): drop the pool so the next call builds
+        # a fresh one, and extract this file in-process
+        _reset_pdf_executor(pool)
+        return fn(path, idx, *args)
     return out
 
-def pdf_tables_to_csv(path: str, out_dir: str) -> List[str]:
+def _pdf_text_chunk(path: str, idx: List[int]) -> List[str]:
     import pdfplumber
-    os.makedirs(out_dir, exist_ok=True)
+    with pdfplumber.open(path) as pdf:
+        return [pdf.pages[i].extract_text() or "" for i in idx]
+
+def _pdf_tables_chunk(path: str, idx: List[int], out_dir: str, fmt: str) -> List[str]:
+    import pdfplumber
+    import pandas as pd
     csv_paths = []
     with pdfplumber.open(path) as pdf:
-        for pi, page in enumerate(pdf.pages):
-            tables = page.extract_tables() or []
+        for pi in idx:
+            tables = pdf.pages[pi].extract_tables() or []
             for ti, tbl in enumerate(tables):
                 if not tbl or not tbl[0]:
                     continue
-                import pandas as pd
                 df = pd.DataFrame(tbl[1:], columns=tbl[0])
                 out = os.path.join(out_dir, f"{os.path.basename(path)}.p{pi}.t{ti}.csv")
-                df.to_csv(out, index=False)
-                csv_paths.append(out)
+                csv_paths.append(save_table(df, out, fmt))
     return csv_paths
 
-def image_ocr_to_text(path: str) -> str:
+def pdf_pages_suffix(pages) -> str:
+    if pages is None or pages == "":
+        return ""
+    spec = ",".join(str(p) for p in pages) if isinstance(pages, list) else str(pages)
+    return ".pages" + re.sub(r"[^0-9-]+", "_", spec)
+
+def pdf_to_text(path: str, pages=None) -> str:
+    text = _map_pages(path, pages, _pdf_text_chunk)
+    out = path + pdf_pages_suffix(pages) + ".txt"
+    with open(out, "w", encoding="utf-8") as f:
+        f.write("\n".join(text))
+    return out
+
+def pdf_tables_to_csv(path: str, out_dir: str, fmt: str = "csv", pages=None) -> List[str]:
+    os.makedirs(out_dir, exist_ok=True)
+    return _map_pages(path, pages, _pdf_tables_chunk, out_dir, fmt)
+
+# --- OCR: preprocess to target DPI, tile tall scans, tiles in parallel ---
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+def _ocr_executor():
+    # Threads suffice: each tile is its own tesseract process; LIMIT_OCR caps them process-wide
+    global _ocr_pool
+    from concurrent.futures import ThreadPoolExecutor
+    from app.settings import settings
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            _ocr_pool = ThreadPoolExecutor(max_workers=settings.LIMIT_OCR or os.cpu_count() or 1,
+                                           thread_name_prefix="ocr")
+        return _ocr_pool
+
+def ocr_preprocess(img, target_dpi: int = 300, binarize: bool = True):
+    """Grayscale, rescale to target_dpi (when the scan says its dpi) and Otsu-binarize."""
+    import numpy as np
+    from PIL import Image, ImageOps
+    dpi = float((img.info.get("dpi") or (0, 0))[0] or 0)
+    img = ImageOps.exif_transpose(img).convert("L")
+    if dpi and abs(dpi - target_dpi) / target_dpi > 0.15:
+        scale = min(2.0, max(0.25, target_dpi / dpi))
+        img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+    img = ImageOps.autocontrast(img)
+    if binarize:
+        a = np.asarray(img)
+        hist = np.bincount(a.ravel(), minlength=256).astype(np.float64)
+        w = np.cumsum(hist)
+        m = np.cumsum(hist * np.arange(256))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            between = (m[-1] * w - m * w[-1]) ** 2 / (w * (w[-1] - w))
+        if np.count_nonzero(hist) > 1 and not np.isnan(between).all():  # blank page: nothing to threshold
+            t = int(np.nanargmax(between))
+            img = Image.fromarray(np.where(a > t, 255, 0).astype(np.uint8))
+    return img
+
+def ocr_tiles(img, tile_px: int = 2000, search_px: int = 200) -> list:
+    """Split a tall page into horizontal strips, cutting on blank rows so no text line is split."""
+    import numpy as np
+    if img.height <= tile_px * 1.25:
+        return [img]
+    ink = (np.asarray(img.convert("L")) < 128).sum(axis=1)
+    tiles, top = [], 0
+    while img.height - top > tile_px * 1.25:
+        target = top + tile_px
+        window = ink[target - search_px:target + search_px]
+        cut = target - search_px + int(np.argmin(window))  # emptiest row near the target
+        tiles.append(img.crop((0, top, img.width, cut)))
+        top = cut
+    tiles.append(img.crop((0, top, img.width, img.height)))
+    return tiles
+
+def _ocr_tile(tile, deadline=None) -> str:
     import pytesseract
+    from agent.limits import resource
+    with resource("ocr", timeout=deadline.remaining() if deadline else None):
+        if deadline is not None and deadline.expired():
+            raise TimeoutError("request deadline reached before OCR")
+        # tesseract is killed once the request deadline passes (0 = no limit)
+        return pytesseract.image_to_string(tile, timeout=deadline.remaining() if deadline else 0)
+
+def image_ocr_to_text(path: str) -> str:
     from PIL import Image
-    img = Image.open(path)
-    txt = pytesseract.image_to_string(img)
+    from app.settings import settings
+    img = ocr_preprocess(Image.open(path), settings.OCR_TARGET_DPI, settings.OCR_BINARIZE)
+    tiles = ocr_tiles(img, settings.OCR_TILE_PX)
+    deadline = current_deadline()
+    with span("ocr", tool="tesseract", children=True):  # tesseract runs as child processes
+        if len(tiles) == 1:
+            txt = _ocr_tile(tiles[0], deadline)
+        else:  # map keeps reading order and cancels tiles not yet started on timeout
+            txt = "\n".join(t.rstrip() for t in _ocr_executor().map(
+                _ocr_tile, tiles, [deadline] * len(tiles), timeout=deadline.remaining() if deadline else None))
     out = path + ".txt"
     with open(out, "w", encoding="utf-8") as f:
         f.write(txt)
@@ -76,9 +276,11 @@ def image_ocr_to_text(path: str) -> str:
 
 # --- File loaders ---
 def csv_to_df(path: str) -> pd.DataFrame:
+    import pandas as pd
     return pd.read_csv(path)
 
 def excel_to_df(path: str) -> pd.DataFrame:
+    import pandas as pd
     return pd.read_excel(path)
 
 def json_load(path: str):
@@ -101,18 +303,26 @@ def sql_to_sqlite(sql_path: str|None, sql_str: str|None, out_db: str) -> str:
         conn.close()
     return out_db
 
-# --- DuckDB helper ---
-import duckdb
-def duckdb_query(sql: str, tables: dict[str, str], out_path: str) -> str:
-    con = duckdb.connect()
+# --- DuckDB query (per-request catalog, Arrow results; see agent/catalog.py) ---
+def duckdb_query(sql: str, tables: dict[str, Any], out_path: str, fmt: str = "csv", catalog=None) -> Any:
+    """Run sql over `tables` (alias -> artefact) and return the artefact.
+
+    A .json out_path yields the JSON value (1x1 -> scalar); anything else is
+    written as a table in `fmt` and its path returned.
+    """
+    from agent.catalog import Catalog, arrow_to_json, save_arrow
+    own = catalog is None
+    catalog = catalog or Catalog()
     try:
-        for name, path in tables.items():
-            if path.lower().endswith('.parquet'):
-                con.execute(f"CREATE VIEW {name} AS SELECT * FROM read_parquet('{path}')")
-            else:
-                con.execute(f"CREATE VIEW {name} AS SELECT * FROM read_csv_auto('{path}')")
-        df = con.execute(sql).df()
-        df.to_csv(out_path, index=False)
-        return out_path
+        for name, value in tables.items():
+            catalog.bind(name, value)
+        result = catalog.query(sql)
     finally:
-        con.close()
+        if own:
+            catalog.close()
+    if out_path.lower().endswith(".json"):
+        value = arrow_to_json(result)
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        return value
+    return save_arrow(result, out_path, fmt)
@@ -0,0 +1,164 @@
+from __future__ import annotations
+import os, json, time, bisect, threading, contextvars
+from typing import Any, Dict, List, Optional, Tuple
+from app.settings import settings
+
+try:
+    import resource as _resource
+except ImportError:  # non-POSIX
+    _resource = None
+
+# --- Prometheus-style aggregates ---
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+_lock = threading.Lock()
+_hist: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+# Per-request span list, set by start_trace(); copied into worker threads with contextvars
+_current: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = contextvars.ContextVar("trace", default=None)
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def _rss() -> int:
+    """Current resident set size of this process in bytes (0 where /proc is missing)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _children_peak() -> int:
+    # High-water mark over every child waited for so far, not just this span's
+    if _resource is None:
+        return 0
+    return _resource.getrusage(_resource.RUSAGE_CHILDREN).ru_maxrss * 1024  # kB on Linux
+
+def _record(name: str, tool: str, dur: float, bytes_in: int, bytes_out: int, growth: int, child: int) -> None:
+    with _lock:
+        h = _hist.get((name, tool))
+        if h is None:
+            h = _hist[(name, tool)] = {"buckets": [0] * len(_BUCKETS), "count": 0, "sum": 0.0,
+                                       "bytes_in": 0, "bytes_out": 0, "growth": 0, "child": 0}
+        i = bisect.bisect_left(_BUCKETS, dur)
+        if i < len(_BUCKETS):
+            h["buckets"][i] += 1
+        h["count"] += 1
+        h["sum"] += dur
+        h["bytes_in"] += bytes_in
+        h["bytes_out"] += bytes_out
+        h["growth"] = max(h["growth"], growth)
+        h["child"] = max(h["child"], child)
+
+class _Span:
+    """RSS is sampled on entry and exit; the span reports the growth. Spans that run
+    child processes set child_rss (exact for sandbox jobs, via wait4); with
+    children=True and nothing set, RUSAGE_CHILDREN's high-water mark is used."""
+    __slots__ = ("name", "tool", "t0", "bytes_in", "bytes_out", "rss0", "child_rss", "children")
+
+    def __init__(self, name: str, tool: str, bytes_in: int, children: bool = False):
+        self.name, self.tool, self.bytes_in, self.bytes_out = name, tool, bytes_in, 0
+        self.child_rss, self.children = 0, children
+
+    def set(self, bytes_in: int|None=None, bytes_out: int|None=None, child_rss: int|None=None) -> None:
+        if bytes_in is not None: self.bytes_in = bytes_in
+        if bytes_out is not None: self.bytes_out = bytes_out
+        if child_rss is not None: self.child_rss = child_rss
+
+    def __enter__(self):
+        self.rss0 = _rss()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        child = self.child_rss or (_children_peak() if self.children else 0)
+        record(self.name, self.tool, time.perf_counter() - self.t0, self.bytes_in, self.bytes_out,
+               ok=exc_type is None, rss_delta=_rss() - self.rss0, child_rss=child)
+        return False
+
+def record(name: str, tool: str, seconds: float, bytes_in: int = 0, bytes_out: int = 0, ok: bool = True,
+           rss_delta: int = 0, child_rss: int = 0) -> None:
+    """Add a span timed elsewhere (e.g. inside a sandbox job)."""
+    if not settings.TRACE_ENABLED:
+        return
+    _record(name, tool, seconds, bytes_in, bytes_out, max(0, rss_delta), child_rss)
+    trace = _current.get()
+    if trace is not None:
+        entry = {"span": name, "tool": tool, "ms": round(seconds * 1000, 1), "in": bytes_in, "out": bytes_out,
+                 "rss_delta_mb": round(rss_delta / 2**20, 1), "ok": ok}
+        if child_rss:
+            entry["child_rss_mb"] = round(child_rss / 2**20, 1)
+        trace.append(entry)
+
+class _NoSpan:
+    __slots__ = ()
+    def set(self, bytes_in=None, bytes_out=None, child_rss=None): pass
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc, tb): return False
+
+_NOOP = _NoSpan()
+
+def span(name: str, tool: str = "", bytes_in: int = 0, children: bool = False):
+    """Time a block; a shared no-op when TRACE_ENABLED is off."""
+    if not settings.TRACE_ENABLED:
+        return _NOOP
+    return _Span(name, tool, bytes_in, children)
+
+def start_trace() -> List[Dict[str, Any]]:
+    trace: List[Dict[str, Any]] = []
+    _current.set(trace)
+    return trace
+
+def trace_header(trace: List[Dict[str, Any]], limit: int = 16000) -> str:
+    """Spans as compact JSON of at most `limit` chars; trailing spans that do not
+    fit are replaced by one {"span": "truncated", "dropped": n} entry."""
+    parts = [json.dumps(s, separators=(",", ":")) for s in trace]
+    if 2 + sum(len(p) + 1 for p in parts) <= limit + 1:
+        return "[" + ",".join(parts) + "]"
+    room, kept = limit - 80, []  # 80: room for the marker
+    for p in parts:
+        room -= len(p) + 1
+        if room < 0:
+            break
+        kept.append(p)
+    marker = {"span": "truncated", "tool": "", "ms": 0, "truncated": True, "dropped": len(parts) - len(kept)}
+    return "[" + ",".join(kept + [json.dumps(marker, separators=(",", ":"))]) + "]"
+
+def size_of(v: Any) -> int:
+    """Bytes behind an artefact value: file/dir size for paths, text length otherwise."""
+    if isinstance(v, list):
+        return sum(size_of(x) for x in v)
+    if isinstance(v, str):
+        try:
+            if os.path.isfile(v):
+                return os.path.getsize(v)
+        except (OSError, ValueError):
+            pass
+        return len(v)
+    return 0
+
+# --- /metrics exposition ---
+def render_metrics(gauges: Dict[str, float]|None=None) -> str:
+    lines = ["# TYPE tds_span_seconds histogram"]
+    with _lock:
+        items = sorted(_hist.items())
+        for (name, tool), h in items:
+            labels = f'span="{name}",tool="{tool}"'
+            acc = 0
+            for le, n in zip(_BUCKETS, h["buckets"]):
+                acc += n
+                lines.append(f'tds_span_seconds_bucket{{{labels},le="{le}"}} {acc}')
+            lines.append(f'tds_span_seconds_bucket{{{labels},le="+Inf"}} {h["count"]}')
+            lines.append(f"tds_span_seconds_sum{{{labels}}} {h['sum']:.6f}")
+            lines.append(f"tds_span_seconds_count{{{labels}}} {h['count']}")
+        lines.append("# TYPE tds_span_bytes_in_total counter")
+        lines += [f'tds_span_bytes_in_total{{span="{n}",tool="{t}"}} {h["bytes_in"]}' for (n, t), h in items]
+        lines.append("# TYPE tds_span_bytes_out_total counter")
+        lines += [f'tds_span_bytes_out_total{{span="{n}",tool="{t}"}} {h["bytes_out"]}' for (n, t), h in items]
+        lines.append("# TYPE tds_span_rss_growth_max_bytes gauge")
+        lines += [f'tds_span_rss_growth_max_bytes{{span="{n}",tool="{t}"}} {h["growth"]}' for (n, t), h in items]
+        lines.append("# TYPE tds_span_child_peak_rss_max_bytes gauge")
+        lines += [f'tds_span_child_peak_rss_max_bytes{{span="{n}",tool="{t}"}} {h["child"]}'
+                  for (n, t), h in items if h["child"]]
+    for name, value in (gauges or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,108 @@
+# app/admission.py
+from __future__ import annotations
+import math, time, asyncio
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict
+
+class Rejected(Exception):
+    def __init__(self, status: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.retry_after = retry_after
+        self.detail = detail
+
+class AdmissionController:
+    """Bounded admission for heavy requests, fair across clients.
+
+    At most `max_active` requests run at once. Others wait in per-client FIFO
+    queues served round-robin, so one noisy client cannot starve the rest.
+    A full queue (503), a client over its own share (429) or a wait longer
+    than `max_wait` (503) is rejected with a Retry-After estimate.
+    """
+
+    def __init__(self, max_active: int, max_queue: int, max_per_client: int, max_wait: float):
+        self.max_active = max(1, max_active)
+        self.max_queue = max_queue
+        self.max_per_client = max_per_client
+        self.max_wait = max_wait
+        self.active = 0
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._service = deque(maxlen=50)  # recent request durations
+        self._waits = deque(maxlen=500)
+        self.admitted = 0
+        self.rejected = {429: 0, 503: 0}
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _retry_after(self) -> int:
+        avg = (sum(self._service) / len(self._service)) if self._service else 5.0
+        return max(1, math.ceil(avg * (self.queued + 1) / self.max_active))
+
+    def _reject(self, status: int, detail: str) -> Rejected:
+        self.rejected[status] += 1
+        return Rejected(status, self._retry_after(), detail)
+
+    async def acquire(self, client: str) -> float:
+        """Wait for a slot; returns seconds spent queued."""
+        t0 = time.monotonic()
+        if self.active < self.max_active and not self.queued:
+            self.active += 1
+            self._admit(0.0)
+            return 0.0
+        if self.queued >= self.max_queue:
+            raise self._reject(503, "Server busy, queue full")
+        q = self._queues.setdefault(client, deque())
+        if len(q) >= self.max_per_client:
+            raise self._reject(429, "Too many queued requests from this client")
+        fut = asyncio.get_running_loop().create_future()
+        q.append(fut)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                self.release(0.0)  # slot was granted as we gave up
+            else:
+                fut.cancel()
+                self._drop(client, fut)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject(503, "Timed out waiting in queue")
+        wait = time.monotonic() - t0
+        self._admit(wait)
+        return wait
+
+    def _admit(self, wait: float) -> None:
+        self.admitted += 1
+        self._waits.append(wait)
+
+    def _drop(self, client: str, fut: asyncio.Future) -> None:
+        q = self._queues.get(client)
+        if q is not None:
+            try: q.remove(fut)
+            except ValueError: pass
+            if not q:
+                del self._queues[client]
+
+    def release(self, service_sec: float) -> None:
+        if service_sec:
+            self._service.append(service_sec)
+        self.active -= 1
+        # Round-robin: the client at the head gets one slot, then goes to the back
+        while self._queues and self.active < self.max_active:
+            client, q = self._queues.popitem(last=False)
+            fut = q.popleft()
+            if q:
+                self._queues[client] = q
+            if not fut.done():
+                self.active += 1
+                fut.set_result(True)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        pct = lambda p: round(waits[int(p * (len(waits) - 1))], 3) if waits else 0.0
+        return {"active": self.active, "queued": self.queued, "admitted": self.admitted,
+                "rejected_429": self.rejected[429], "rejected_503": self.rejected[503],
+                "wait_p50_sec": pct(0.5), "wait_p99_sec": pct(0.99),
+                "wait_max_sec": round(waits[-1], 3) if waits else 0.0}
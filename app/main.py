@@ -1,14 +1,44 @@
 # app/main.py
 from __future__ import annotations
-import io, time, base64
-from typing import List
+import os, time, asyncio, shutil, tempfile, contextvars
+from concurrent.futures import wait as wait_futures
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Tuple
 
-from fastapi import FastAPI, Request, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
-from PIL import Image
 
-app = FastAPI(title="TDS Minimal Test App")
+from app.settings import settings
+from app.uploads import stream_uploads, UploadTooLarge, UploadError
+from app.admission import AdmissionController, Rejected
+from agent.plan_cache import get_plan_cache, prefetch_upload
+from agent.deadline import Deadline, track_stragglers
+from agent.pipeline import answer_request, placeholder, tiny_png_data_uri  # noqa: F401
+from agent.tools import parse_questions
+from agent.trace import span, start_trace, trace_header, render_metrics
+from app.warmup import warm_up
+
+# --- Readiness: /health is 503 until this worker has warmed up ---
+_ready: Dict[str, Any] = {"ready": not settings.WARMUP, "warmup": None}
+
+async def _warm():
+    try:
+        _ready["warmup"] = await run_in_threadpool(warm_up)
+    finally:
+        _ready["ready"] = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")  # one core per tesseract: OCR tiles run side by side
+    task = asyncio.create_task(_warm()) if settings.WARMUP else None
+    yield
+    if task is not None:
+        task.cancel()
+
+app = FastAPI(title="TDS Minimal Test App", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -17,26 +47,107 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+admission = AdmissionController(settings.ADMIT_MAX_ACTIVE, settings.ADMIT_MAX_QUEUE,
+                                settings.ADMIT_MAX_PER_CLIENT, settings.ADMIT_MAX_WAIT)
+
 print(">>> Loaded minimal app.main. Routes: GET /health, POST /api and /api/")
 
 @app.get("/health")
 def health():
-    return {"status": "ok", "time": time.time()}
+    if not _ready["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting"}, headers={"Retry-After": "1"})
+    return {"status": "ok", "time": time.time(), "pid": os.getpid(), "warmup": _ready["warmup"]}
 
-def tiny_png_data_uri() -> str:
-    buf = io.BytesIO()
-    Image.new("RGB", (1, 1), (255, 255, 255)).save(buf, format="PNG", optimize=True)
-    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+@app.get("/stats")
+def stats():
+    cache = get_plan_cache()
+    return {"plan_cache": cache.stats() if cache else None, "admission": admission.stats()}
+
+@app.get("/metrics")
+def metrics():
+    a = admission.stats()
+    gauges = {"tds_admission_active": a["active"], "tds_admission_queued": a["queued"],
+              "tds_admission_wait_p99_seconds": a["wait_p99_sec"],
+              "tds_admission_rejected_total": a["rejected_429"] + a["rejected_503"]}
+    cache = get_plan_cache()
+    if cache:
+        c = cache.stats()
+        gauges.update({"tds_plan_cache_hit_rate": c["hit_rate"], "tds_plan_cache_saved_seconds": c["saved_sec"]})
+    return PlainTextResponse(render_metrics(gauges), media_type="text/plain; version=0.0.4")
+
+def _split_questions(uploads: List[Tuple[str, str]]) -> Tuple[str, List[str]]:
+    """Pick the questions file (by field or file name, else the first .txt) from the uploads."""
+    def is_q(field: str, path: str) -> bool:
+        return "question" in field.lower() or "question" in os.path.basename(path).lower()
+    chosen = next((p for f, p in uploads if is_q(f, p)), None)
+    chosen = chosen or next((p for _, p in uploads if p.lower().endswith(".txt")), uploads[0][1])
+    return chosen, [p for _, p in uploads if p != chosen]
 
 @app.post("/api")
 @app.post("/api/")
 async def api(request: Request):
-    form = await request.form()
-    uploads: List[UploadFile] = [
-        v for _, v in form.multi_items()
-        if hasattr(v, "filename") and hasattr(v, "file")
-    ]
-    if not uploads:
-        return JSONResponse(status_code=400, content={"detail": "Missing file upload. Include -F \"questions.txt=@question.txt\""})
-    # Always return a valid array quickly
-    return JSONResponse(content=[0, 0.0, tiny_png_data_uri()])
+    deadline = Deadline(settings.GLOBAL_TIMEOUT)
+    client = request.headers.get("x-client-id") or (request.client.host if request.client else "anon")
+    try:
+        await admission.acquire(client)
+    except Rejected as e:
+        return JSONResponse(status_code=e.status, content={"detail": e.detail},
+                            headers={"Retry-After": str(e.retry_after)})
+    started = time.monotonic()
+    trace = start_trace()
+    debug = settings.TRACE_DEBUG_HEADER and request.headers.get("x-debug-trace") == "1"
+    os.makedirs(settings.WORK_ROOT, exist_ok=True)
+    workdir = tempfile.mkdtemp(prefix="req-", dir=settings.WORK_ROOT)
+    pipeline: asyncio.Future|None = None
+    stragglers = track_stragglers()  # steps the executor left running at its deadline
+    deferred = False
+
+    async def release():
+        # The slot and the workdir stay taken until every thread of this request has
+        # returned, including a pipeline that overran and steps abandoned at the deadline
+        if pipeline is not None:
+            await asyncio.gather(pipeline, return_exceptions=True)
+        if stragglers:
+            await run_in_threadpool(wait_futures, stragglers)
+        admission.release(time.monotonic() - started)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    try:
+        # Each attachment is fingerprinted (plan-cache schema, memo hash) in the
+        # threadpool as soon as its part completes, while later parts still upload
+        prefetch: List[asyncio.Future] = []
+        try:
+            uploads = await stream_uploads(
+                request, os.path.join(workdir, "uploads"),
+                max_file_bytes=settings.MAX_UPLOAD_BYTES,
+                max_request_bytes=settings.MAX_REQUEST_BYTES,
+                on_file=lambda field, path: prefetch.append(
+                    asyncio.ensure_future(run_in_threadpool(prefetch_upload, path))),
+            )
+        except UploadTooLarge as e:
+            return JSONResponse(status_code=413, content={"detail": str(e)}, headers={"Connection": "close"})
+        except (UploadError, ValueError) as e:
+            return JSONResponse(status_code=400, content={"detail": f"Malformed upload: {e}"})
+        finally:
+            await asyncio.gather(*prefetch, return_exceptions=True)
+        if not uploads:
+            return JSONResponse(status_code=400, content={"detail": "Missing file upload. Include -F \"questions.txt=@question.txt\""})
+        q_path, attachments = _split_questions(uploads)
+        with open(q_path, "r", encoding="utf-8", errors="ignore") as f:
+            questions_txt = f.read()
+        with span("request", bytes_in=sum(os.path.getsize(p) for _, p in uploads)):
+            pipeline = asyncio.ensure_future(run_in_threadpool(
+                contextvars.copy_context().run, answer_request, questions_txt, attachments, workdir, deadline))
+            done, _ = await asyncio.wait({pipeline}, timeout=deadline.remaining() + 2)
+            if done:
+                answers = pipeline.result()
+            else:
+                # Pipeline overran its own budget: still return a correctly typed array
+                answers = [placeholder(q) for q in (parse_questions(questions_txt) or [questions_txt])]
+        headers = {"X-Trace": trace_header(trace)} if debug else None
+        deferred = not pipeline.done() or any(not f.done() for f in stragglers)
+        return JSONResponse(content=answers, headers=headers,
+                            background=BackgroundTask(release) if deferred else None)
+    finally:
+        if not deferred:
+            await release()
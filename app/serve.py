@@ -0,0 +1,84 @@
+# app/serve.py
+"""Preload-and-fork server.
+
+The master imports PRELOAD_MODULES and the app once, freezes the GC heap and
+forks WEB_WORKERS uvicorn workers on one shared listening socket, so the big
+libraries are shared copy-on-write instead of loaded per worker. Each worker
+warms up on its own (see app.warmup) and restarts if it dies.
+
+    python -m app.serve [--host 0.0.0.0] [--port 7860] [--workers N]
+"""
+from __future__ import annotations
+import os, gc, sys, time, signal, socket, argparse
+from app.settings import settings
+from app.warmup import preload
+
+def _listen(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def _serve(app, sock: socket.socket, host: str, port: int) -> None:
+    import uvicorn
+    uvicorn.Server(uvicorn.Config(app, host=host, port=port, lifespan="on")).run(sockets=[sock])
+
+def _spawn(app, sock: socket.socket, host: str, port: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        code = 0
+        try:
+            _serve(app, sock, host, port)
+        except BaseException:
+            code = 1
+        os._exit(code)
+    return pid
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=int(os.getenv("PORT", "7860")))
+    ap.add_argument("--workers", type=int, default=settings.WEB_WORKERS)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    took = preload(settings.PRELOAD_MODULES)
+    from app.main import app  # noqa: E402  (after the heavy imports it shares)
+    print(f">>> preloaded {len(took)} modules in {time.perf_counter() - t0:.2f} s", file=sys.stderr)
+    sock = _listen(args.host, args.port)
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        _serve(app, sock, args.host, args.port)
+        return
+
+    gc.collect()
+    gc.freeze()  # keep the collector from touching (and un-sharing) the preloaded heap
+    children = {_spawn(app, sock, args.host, args.port) for _ in range(args.workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try: os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError: pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f">>> worker {pid} exited, restarting", file=sys.stderr)
+            children.add(_spawn(app, sock, args.host, args.port))
+
+if __name__ == "__main__":
+    main()
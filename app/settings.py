@@ -1,4 +1,6 @@
+import os
 from typing import Optional, Tuple
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -6,18 +8,120 @@ class Settings(BaseSettings):
     MODEL_PLANNER: str = "gpt-4o-mini"
     MODEL_ANSWERER: str = "gpt-4o-mini"
 
+    # LLM client: pooled connections, per-provider concurrency, retries, hedging
+    LLM_POOL_SIZE: int = 20
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_TIMEOUT: float = 60.0        # per attempt, capped by the request deadline
+    LLM_MAX_RETRIES: int = 2
+    LLM_BACKOFF_BASE: float = 0.5
+    LLM_HEDGE_P95_SEC: float = 0.0   # hedge once observed p95 exceeds this (0 = off)
+
     # Timeouts (seconds)
     GLOBAL_TIMEOUT: int = 170
     TOOL_TIMEOUT: int = 40
+    ANSWER_RESERVE_SEC: int = 25  # held back from planning/execution for the answerer
+
+    # Plan cache ("" disables)
+    PLAN_CACHE_PATH: str = "/tmp/tds_cache/plans.sqlite"
+    PLAN_CACHE_MAX_ENTRIES: int = 500
+    PLAN_CACHE_TTL: int = 7 * 24 * 3600
+
+    # Executor: max plan steps running at once
+    EXECUTOR_WORKERS: int = 4
+
+    # PDF extraction: page chunks go to a process pool above this page count
+    PDF_WORKERS: int = max(1, min(4, os.cpu_count() or 1))
+    PDF_PARALLEL_MIN_PAGES: int = 16
+
+    # html_table_to_csv: parsed pages kept for further steps on the same file (0 = no reuse)
+    HTML_TREE_CACHE: int = 4
+
+    # Memoized outputs of deterministic ingest/scrape steps ("" disables)
+    MEMO_DIR: str = "/tmp/tds_cache/steps"
+    MEMO_MAX_BYTES: int = 1024 * 1024 * 1024
+
+    # Answerer: question batches sent to the LLM at once
+    ANSWER_CONCURRENCY: int = 4
+
+    # OCR: scans are rescaled to this dpi (when known), binarized and cut into strips this tall
+    OCR_TARGET_DPI: int = 300
+    OCR_BINARIZE: bool = True
+    OCR_TILE_PX: int = 2000
+
+    # Storage format for ingested tables: csv | parquet | arrow
+    INGEST_FORMAT: str = "csv"
+
+    # csv_to_df/excel_to_df/json_to_df stream files at least this large (chunked, compact dtypes);
+    # INGEST_MEMORY_MB is the per-request ceiling split across EXECUTOR_WORKERS
+    INGEST_STREAM_MIN_BYTES: int = 16 * 1024 * 1024
+    INGEST_SAMPLE_ROWS: int = 20_000
+    INGEST_MEMORY_MB: int = 512
+    INGEST_MIN_INT_BITS: int = 32  # narrower ints overflow silently in pandas arithmetic
+
+    # Per-request DuckDB catalog for duckdb_query steps (spills to derived/ past the limit)
+    DUCKDB_MEMORY_LIMIT: str = "1GB"
+    DUCKDB_THREADS: int = 0  # 0 = DuckDB default (all cores)
+
+    # Sandbox: warm pre-imported workers (0 = fresh subprocess per job)
+    SANDBOX_POOL_SIZE: int = 2
+    SANDBOX_RECYCLE_AFTER: int = 20  # jobs per worker before it is replaced
+    SANDBOX_MEM_MB: int = 2048       # address-space limit per job (0 = unlimited)
+    SANDBOX_POOL_WAIT: float = 2.0   # seconds to wait for an idle worker before a fresh subprocess
+
+    # Shared venvs for jobs that request extra packages
+    VENV_CACHE_DIR: str = "/tmp/tds_cache/venvs"
+    VENV_CACHE_MAX_BYTES: int = 4 * 1024 * 1024 * 1024
+    PIP_WHEELHOUSE: str = ""  # local dir of wheels for offline installs
 
     # Limits
     MAX_UPLOAD_BYTES: int = 25 * 1024 * 1024  # 25 MB per file
+    MAX_REQUEST_BYTES: int = 100 * 1024 * 1024  # whole multipart body
     MAX_PLOT_BYTES: int = 100_000
+    PLOT_CACHE_DIR: str = "/tmp/tds_cache/plots"  # encoded plots by rendered-pixel hash ("" disables)
+
+    # Admission control for /api
+    ADMIT_MAX_ACTIVE: int = 3       # requests running the pipeline at once
+    ADMIT_MAX_QUEUE: int = 12       # waiting requests before 503
+    ADMIT_MAX_PER_CLIENT: int = 4   # waiting requests per client before 429
+    ADMIT_MAX_WAIT: float = 60.0    # seconds a request may wait for a slot
+
+    # Concurrency caps per resource class, shared by all requests (0 = unlimited);
+    # LLM calls are capped by LLM_MAX_CONCURRENCY
+    LIMIT_SANDBOX: int = 0  # 0 = max(SANDBOX_POOL_SIZE, cpu count)
+    LIMIT_OCR: int = max(1, os.cpu_count() or 1)  # tesseract processes
+
+    # Tracing: span histograms on /metrics; per-request spans in an X-Trace
+    # response header when TRACE_DEBUG_HEADER is on and the request sends X-Debug-Trace: 1
+    TRACE_ENABLED: bool = True
+    TRACE_DEBUG_HEADER: bool = False
+
+    # Startup: app.serve imports PRELOAD_MODULES once and forks WEB_WORKERS workers that share
+    # them copy-on-write; each worker warms up (pools, clients, caches) before /health reports ready
+    WEB_WORKERS: int = 1
+    PRELOAD_MODULES: Tuple[str, ...] = ("numpy", "pandas", "pyarrow", "duckdb", "matplotlib.pyplot",
+                                        "pdfplumber", "PIL.Image", "httpx", "openai")
+    WARMUP: bool = True
+
+    # Per-request working directories (uploads/, derived/)
+    WORK_ROOT: str = "/tmp/tds_work"
 
     # Security / allowlists (e.g., ("en.wikipedia.org",))
     HTTP_ALLOWLIST: Tuple[str, ...] = tuple()
 
+    # HTTP client pool and on-disk response cache ("" disables the cache)
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_PER_HOST: int = 6
+    HTTP_CACHE_DIR: str = "/tmp/tds_cache/http"
+    HTTP_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
     # pydantic v2 settings config
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
+    @model_validator(mode="after")
+    def _derive_limits(self):
+        # After env/.env are applied, so the pool size used is the configured one
+        if self.LIMIT_SANDBOX <= 0:
+            self.LIMIT_SANDBOX = max(self.SANDBOX_POOL_SIZE, os.cpu_count() or 1)
+        return self
+
 settings = Settings()
@@ -0,0 +1,149 @@
+# app/uploads.py
+from __future__ import annotations
+import os, re
+from typing import Callable, List, Optional, Tuple
+
+from starlette.requests import Request
+
+try:  # python-multipart >= 0.0.13
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    from multipart.multipart import MultipartParser, parse_options_header
+
+class UploadTooLarge(Exception):
+    pass
+
+class UploadError(Exception):
+    pass
+
+_SAFE = re.compile(r"[^A-Za-z0-9._-]+")
+_MAX_FIELD_BYTES = 64 * 1024  # plain (non-file) form fields
+
+def _safe_name(filename: str) -> str:
+    name = _SAFE.sub("_", os.path.basename(filename.replace("\\", "/"))).lstrip(".")
+    return name or "upload"
+
+class _Sink:
+    """Multipart callbacks that write each file part straight to disk."""
+
+    def __init__(self, dest_dir: str, max_file: int, max_total: int):
+        self.dest_dir = dest_dir
+        self.max_file = max_file
+        self.max_total = max_total
+        self.total = 0
+        self.files: List[Tuple[str, str]] = []   # (field name, path)
+        self.completed: List[Tuple[str, str]] = []  # files finished since last drain
+        self._reset()
+
+    def _reset(self):
+        self._headers: dict = {}
+        self._field = b""
+        self._value = b""
+        self._fh = None
+        self._path = ""
+        self._name = ""
+        self._size = 0
+
+    def on_part_begin(self):
+        self._reset()
+
+    def on_header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        key = self._field.decode("latin-1").lower()
+        self._headers[key] = self._headers.get(key, b"") + data[start:end]
+
+    def on_header_end(self):
+        self._field = b""
+
+    def on_headers_finished(self):
+        _, opts = parse_options_header(self._headers.get("content-disposition", b""))
+        self._name = opts.get(b"name", b"").decode("utf-8", "replace")
+        filename = opts.get(b"filename")
+        if filename is None:
+            return
+        name = _safe_name(filename.decode("utf-8", "replace"))
+        path = os.path.join(self.dest_dir, name)
+        n = 1
+        while os.path.exists(path):
+            path = os.path.join(self.dest_dir, f"{n}_{name}")
+            n += 1
+        self._path = path
+        self._fh = open(path, "wb")
+
+    def on_part_data(self, data, start, end):
+        size = end - start
+        self._size += size
+        self.total += size
+        if self.total > self.max_total:
+            raise UploadTooLarge(f"Request exceeds {self.max_total} bytes")
+        if self._fh is None:
+            if self._size > _MAX_FIELD_BYTES:
+                raise UploadTooLarge(f"Form field '{self._name}' too large")
+            self._value += data[start:end]
+            return
+        if self._size > self.max_file:
+            raise UploadTooLarge(f"File '{os.path.basename(self._path)}' exceeds {self.max_file} bytes")
+        self._fh.write(data[start:end])
+
+    def on_part_end(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+            self.files.append((self._name, self._path))
+            self.completed.append((self._name, self._path))
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+async def stream_uploads(
+    request: Request,
+    dest_dir: str,
+    max_file_bytes: int,
+    max_request_bytes: int,
+    on_file: Optional[Callable[[str, str], None]] = None,
+) -> List[Tuple[str, str]]:
+    """Stream a multipart body to dest_dir chunk by chunk.
+
+    Size limits are enforced while the body arrives, so an oversized request
+    is rejected without buffering it. on_file(field, path) is called as soon as
+    each file part is closed on disk, including parts completed by the final
+    boundary. Returns (field name, path) for every file.
+    """
+    ctype, opts = parse_options_header(request.headers.get("content-type", ""))
+    boundary = opts.get(b"boundary")
+    if ctype != b"multipart/form-data" or not boundary:
+        raise UploadError("Expected multipart/form-data")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_request_bytes:
+        raise UploadTooLarge(f"Request exceeds {max_request_bytes} bytes")
+
+    os.makedirs(dest_dir, exist_ok=True)
+    sink = _Sink(dest_dir, max_file_bytes, max_request_bytes)
+    callbacks = {
+        name: getattr(sink, name) for name in (
+            "on_part_begin", "on_part_data", "on_part_end", "on_header_field",
+            "on_header_value", "on_header_end", "on_headers_finished",
+        )
+    }
+    parser = MultipartParser(boundary, callbacks)
+
+    def drain():
+        done, sink.completed = sink.completed, []
+        if on_file is not None:
+            for field, path in done:
+                on_file(field, path)
+
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                parser.write(chunk)
+                drain()
+        parser.finalize()
+        drain()
+    finally:
+        sink.close()
+    return sink.files
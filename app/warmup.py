@@ -0,0 +1,60 @@
+# app/warmup.py
+from __future__ import annotations
+import time, importlib
+from typing import Dict, Iterable
+from app.settings import settings
+
+def preload(modules: Iterable[str]) -> Dict[str, float]:
+    """Import modules (missing optional ones are skipped); returns seconds per module."""
+    took = {}
+    for name in modules:
+        t0 = time.perf_counter()
+        try:
+            mod = importlib.import_module(name)
+            if name == "matplotlib.pyplot":
+                mod.switch_backend("Agg")
+        except Exception:
+            continue
+        took[name] = round(time.perf_counter() - t0, 3)
+    return took
+
+def _fonts() -> None:
+    # First text render builds matplotlib's font cache and glyph tables
+    import io
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(1, 1))
+    ax.set_title("warm")
+    fig.savefig(io.BytesIO(), format="png")
+    plt.close(fig)
+
+def _sandbox() -> None:
+    from agent.sandbox import get_pool
+    pool = get_pool()
+    if pool is not None:
+        pool.warm()
+
+def warm_up() -> Dict[str, float]:
+    """Everything a first request would otherwise pay for, per worker process.
+
+    Runs after fork: it starts threads and child processes, which must not
+    exist in the preloading parent.
+    """
+    from agent.plan_cache import get_plan_cache
+    from agent.memo import get_memo
+    from agent import llm
+    steps = {
+        "imports": lambda: preload(settings.PRELOAD_MODULES),
+        "fonts": _fonts,
+        "sandbox": _sandbox,
+        "caches": lambda: (get_plan_cache(), get_memo()),
+        "llm": llm.warm,
+    }
+    took = {}
+    for name, fn in steps.items():
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception:
+            pass  # a cold path is still a working path
+        took[name] = round(time.perf_counter() - t0, 3)
+    return took
@@ -0,0 +1,40 @@
+"""Overload /api in-process with the stub LLM and report latency and rejections.
+
+    LLM_PROVIDER=stub LLM_STUB_LATENCY=0.5 python -m bench.admission_load [requests] [clients]
+"""
+import sys, time, asyncio, statistics
+from collections import Counter
+import httpx
+from app.main import app
+
+QUESTIONS = b"1) How many rows?\n2) What is the correlation between A and B?\n"
+
+async def _one(client: httpx.AsyncClient, cid: int, results: list):
+    t0 = time.perf_counter()
+    r = await client.post("/api/", files={"questions.txt": ("questions.txt", QUESTIONS)},
+                          headers={"X-Client-Id": f"c{cid}"})
+    results.append((r.status_code, time.perf_counter() - t0, r.headers.get("retry-after")))
+
+async def _run(n: int, clients: int):
+    results: list = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(_one(client, i % clients, results) for i in range(n)))
+        wall = time.perf_counter() - t0
+        stats = (await client.get("/stats")).json()["admission"]
+    ok = sorted(t for s, t, _ in results if s == 200)
+    codes = Counter(s for s, _, _ in results)
+    pct = lambda p: ok[int(p * (len(ok) - 1))] * 1000 if ok else 0.0
+    print(f"{n} requests from {clients} clients in {wall:.1f} s: {dict(codes)}")
+    if ok:
+        print(f"  200s: p50 {statistics.median(ok)*1000:.0f} ms  p95 {pct(0.95):.0f} ms  p99 {pct(0.99):.0f} ms")
+    print(f"  admission: {stats}")
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    asyncio.run(_run(n, clients))
+
+if __name__ == "__main__":
+    main()
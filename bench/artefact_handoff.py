@@ -0,0 +1,38 @@
+"""Time and peak RSS of handing a large input to a job: read+write through
+Python vs agent.artefacts.link_file (a reflink where the filesystem supports
+it, else shutil.copyfile). The method link_file used is printed with its row.
+
+    python -m bench.artefact_handoff [size_mb]
+"""
+import os, sys, time, tempfile, resource, subprocess
+
+def _copy(src, dst):
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fdst.write(fsrc.read())
+
+def _child(mode, src, dst):
+    from agent.artefacts import link_file
+    t0 = time.perf_counter()
+    how = _copy(src, dst) if mode == "read+write" else link_file(src, dst)
+    dt = time.perf_counter() - t0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    used = f"  (used: {how})" if how else ""
+    print(f"{mode:>16}: {dt*1000:8.1f} ms  peak RSS {rss:7.1f} MB{used}")
+
+def main():
+    if sys.argv[1:2] == ["--child"]:
+        return _child(*sys.argv[2:5])
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as d:
+        src = os.path.join(d, "input.bin")
+        with open(src, "wb") as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1024 * 1024))
+        print(f"input: {size_mb} MB")
+        for mode in ("read+write", "reflink/copyfile"):
+            # fresh process per mode so peak RSS is not shared
+            subprocess.run([sys.executable, "-m", "bench.artefact_handoff", "--child", mode, src,
+                            os.path.join(d, mode.replace("/", "_") + ".out")], check=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Group-by over an ingested table: duckdb_query step vs pandas in the sandbox.
+
+    python -m bench.duckdb_query [rows]
+
+Both read the same ingest output (INGEST_FORMAT) and write the same result;
+peak RSS is the max resident size of the process doing the work.
+"""
+import os, sys, time, resource, tempfile, multiprocessing as mp
+from app.settings import settings
+from agent.tools import save_table, duckdb_query
+from agent.sandbox import python_exec
+from bench.ingest_format import _frame
+
+SQL = "SELECT cat, COUNT(*) AS n, AVG(x) AS x, MAX(y) AS y FROM t GROUP BY cat ORDER BY cat"
+PANDAS = """
+import time, resource, pandas as pd
+t0 = time.perf_counter()
+path = "{path}"
+df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_feather(path) if path.endswith(".arrow") else pd.read_csv(path)
+out = df.groupby("cat").agg(n=("id", "size"), x=("x", "mean"), y=("y", "max")).reset_index()
+out.to_csv("out.csv", index=False)
+print(time.perf_counter() - t0, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+def _duck(path: str, out: str, q):
+    t0 = time.perf_counter()
+    duckdb_query(SQL, {"t": path}, out, fmt=settings.INGEST_FORMAT)
+    q.put((time.perf_counter() - t0, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    with tempfile.TemporaryDirectory() as d:
+        path = save_table(_frame(rows), os.path.join(d, "t.csv"), settings.INGEST_FORMAT)
+        print(f"{rows} rows, {settings.INGEST_FORMAT} {os.path.getsize(path) / 2**20:.0f} MB")
+
+        ctx = mp.get_context("fork")
+        q = ctx.Queue()
+        p = ctx.Process(target=_duck, args=(path, os.path.join(d, "duck.csv"), q))
+        p.start()
+        sec, rss = q.get()
+        p.join()
+        print(f"  duckdb_query: {sec:6.2f} s  peak RSS {rss / 1024:6.0f} MB")
+
+        job = os.path.join(d, "job")
+        os.makedirs(job)
+        t0 = time.perf_counter()
+        rc, out, err = python_exec(PANDAS.format(path=path), job, timeout_sec=600)
+        wall = time.perf_counter() - t0
+        if rc != 0:
+            print(err[-800:])
+            return
+        sec, rss = out.split()
+        print(f"  pandas job  : {float(sec):6.2f} s  peak RSS {int(rss) / 1024:6.0f} MB  ({wall:.2f} s incl. sandbox)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""End-to-end /api benchmark with the stub LLM and generated fixtures.
+
+Every request runs the real pipeline (upload streaming, planning, the step
+graph, sandboxed python, answering) in-process. The stub planner returns one
+plan that touches every tool: http_fetch and html_table_to_csv against a
+local HTTP server, plus csv/excel/pdf text+tables/OCR/json/sql ingest, duckdb_query steps
+for the scalar answers and a python job that reads the rest and draws a plot.
+
+    python -m bench.e2e [--sizes small,medium] [--concurrency 1,3,8] [--requests N]
+                        [--latency 0.2] [--warm] [--out results.json]
+    python -m bench.e2e --compare old.json new.json
+
+Plan, memo, HTTP and plot caches are disabled unless --warm is given, so the numbers
+measure cold work. Results (throughput, p50/p95/p99, peak RSS of the process
+tree, per-stage time from X-Trace) go to bench/results/e2e-<commit>.json.
+"""
+import os, json, time, shutil, asyncio, argparse, platform, tempfile, threading, subprocess
+import http.server, socketserver
+from collections import Counter, defaultdict
+import numpy as np
+import pandas as pd
+
+SIZES = {"small": (1_000, 2), "medium": (20_000, 8), "large": (200_000, 30)}  # (rows, pdf pages)
+QUESTIONS = ("1) How many rows are in sales.csv?\n"
+             "2) What is the correlation between price and qty?\n"
+             "3) Which region has the largest total?\n"
+             "4) Draw a scatter plot of price against qty as a base64 data URI.\n")
+
+# --- Fixtures ---
+def _frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": np.arange(rows),
+        "region": rng.choice(["north", "south", "east", "west"], rows),
+        "price": rng.normal(100, 15, rows).round(2),
+        "qty": rng.integers(1, 50, rows),
+        "day": pd.date_range("2020-01-01", periods=rows, freq="min").strftime("%Y-%m-%d"),
+    })
+
+def _png(path: str, lines: int) -> None:
+    from PIL import Image, ImageDraw
+    img = Image.new("L", (1200, 40 + 28 * lines), 255)
+    draw = ImageDraw.Draw(img)
+    for i in range(lines):
+        draw.text((20, 20 + 28 * i), f"Invoice {1000 + i}  total {i * 17.5:.2f}  region north", fill=0)
+    img.save(path)
+
+def make_fixtures(root: str, size: str) -> str:
+    from bench.pdf_extract import make_pdf
+    rows, pages = SIZES[size]
+    d = os.path.join(root, size)
+    os.makedirs(d, exist_ok=True)
+    df = _frame(rows)
+    df.to_csv(os.path.join(d, "sales.csv"), index=False)
+    _frame(max(100, rows // 10), seed=1).to_excel(os.path.join(d, "stock.xlsx"), index=False)
+    df.head(max(100, rows // 10)).to_json(os.path.join(d, "orders.json"), orient="records")
+    make_pdf(os.path.join(d, "report.pdf"), pages)
+    _png(os.path.join(d, "scan.png"), 10)
+    with open(os.path.join(d, "schema.sql"), "w") as f:
+        f.write("CREATE TABLE t(id INTEGER, region TEXT, price REAL, qty INTEGER);\n")
+        for r in df.head(max(100, rows // 10)).itertuples(index=False):
+            f.write(f"INSERT INTO t VALUES({r.id},'{r.region}',{r.price},{r.qty});\n")
+    df.head(200).to_html(os.path.join(d, "page.html"), index=False, classes="wikitable")
+    with open(os.path.join(d, "questions.txt"), "w") as f:
+        f.write(QUESTIONS)
+    return d
+
+# --- Stub plan using every tool ---
+JOB = r'''
+import os, json, glob, sqlite3
+import pandas as pd
+from plotenc import save_plot
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+def table(name):
+    path = glob.glob(name + ".*")[0] if not os.path.exists(name) else name
+    if path.endswith(".parquet"): return pd.read_parquet(path)
+    if path.endswith(".arrow"): return pd.read_feather(path)
+    return pd.read_csv(path)
+
+sales = table("sales")
+stock = table("stock")
+web = table("web")
+text = "".join(open(p, errors="ignore").read() for p in ("report_text", "scan_text") if os.path.exists(p))
+orders = json.load(open("orders"))
+con = sqlite3.connect("db")
+db_rows = con.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+con.close()
+
+json.dump({"stock": len(stock), "web": len(web), "text": len(text),
+           "orders": len(orders), "db": db_rows}, open("seen.json", "w"))
+fig, ax = plt.subplots(figsize=(4, 3), dpi=60)
+sample = sales.sample(min(len(sales), 2000), random_state=0)
+ax.scatter(sample["price"], sample["qty"], s=2)
+save_plot(fig, "plot.datauri")
+'''
+
+def stub_plan(url: str, fmt: str, ocr: bool = True) -> dict:
+    from agent.tools import TABLE_EXT
+    ext = TABLE_EXT[fmt]
+    plan = {
+        "scrapes": [
+            {"id": "s1", "tool": "http_fetch", "args": {"url": url}, "writes": {"html": "page.html"}},
+            {"id": "s2", "tool": "html_table_to_csv", "args": {"html": "$page.html", "css_selector": "table.wikitable"},
+             "writes": {"csv": "web.csv"}},
+        ],
+        "ingest": [
+            {"tool": "csv_to_df", "args": {"path": "$UPLOADS/sales.csv"}, "writes": {"df": "sales.csv"}},
+            {"tool": "excel_to_df", "args": {"path": "$UPLOADS/stock.xlsx"}, "writes": {"df": "stock.csv"}},
+            {"tool": "pdf_to_text", "args": {"path": "$UPLOADS/report.pdf"}, "writes": {"text": "report.txt"}},
+            {"tool": "pdf_tables_to_csv", "args": {"path": "$UPLOADS/report.pdf"}, "writes": {"csvs": "pdf_csvs"}},
+            {"tool": "image_ocr_to_text", "args": {"path": "$UPLOADS/scan.png"}, "writes": {"text": "scan.txt"}},
+            {"tool": "json_load", "args": {"path": "$UPLOADS/orders.json"}, "writes": {"json": "orders.json"}},
+            {"tool": "json_to_df", "args": {"path": "$UPLOADS/orders.json"}, "writes": {"df": "orders.csv"}},
+            {"tool": "sql_to_sqlite", "args": {"sql_path": "$UPLOADS/schema.sql"}, "writes": {"db": "t.sqlite"}},
+        ],
+        "queries": [
+            {"id": "q1", "reads": {"sales": "$sales.csv"}, "sql": "SELECT COUNT(*) FROM sales", "writes": {"a1": "a1.json"}},
+            {"id": "q2", "reads": {"sales": "$sales.csv"}, "sql": "SELECT corr(price, qty) FROM sales",
+             "writes": {"a2": "a2.json"}},
+            {"id": "q3", "reads": {"sales": "$sales.csv"},
+             "sql": "SELECT region FROM sales GROUP BY region ORDER BY SUM(qty) DESC LIMIT 1", "writes": {"a3": "a3.json"}},
+            {"id": "q4", "reads": {"sales": "$sales.csv", "db": "$t.sqlite", "orders": "$orders.csv"},
+             "sql": "SELECT s.region, COUNT(*) AS n, AVG(t.price) AS price FROM sales s JOIN db.t USING (id) "
+                    "JOIN orders o USING (id) GROUP BY 1 ORDER BY 1", "writes": {"by_region": "by_region.csv"}},
+        ],
+        "python_jobs": [
+            {"id": "p1", "code": JOB,
+             "reads": {"sales" + ext: "$sales.csv", "stock" + ext: "$stock.csv", "web" + ext: "$web.csv",
+                       "report_text": "$report.txt", "scan_text": "$scan.txt", "orders": "$orders.json",
+                       "db": "$t.sqlite"},
+             "writes": {"seen": "seen.json", "plot": "plot.datauri"}},
+        ],
+        "artefacts_contract": {"a1": "json scalar/int", "a2": "json scalar/float", "a3": "json scalar/string",
+                               "plot": "data_uri/png under 100000 bytes"},
+        "answer_keys": [["a1"], ["a2"], ["a3"], ["plot"]],
+    }
+    if not ocr:  # no tesseract binary here: a failing step would skip the job that reads it
+        plan["ingest"] = [a for a in plan["ingest"] if a["tool"] != "image_ocr_to_text"]
+        del plan["python_jobs"][0]["reads"]["scan_text"]
+    return plan
+
+def _serve(directory: str):
+    handler = lambda *a, **k: http.server.SimpleHTTPRequestHandler(*a, directory=directory, **k)
+    http.server.SimpleHTTPRequestHandler.log_message = lambda *a: None
+    srv = socketserver.ThreadingTCPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+# --- Peak RSS of this process and its children (sandbox workers, pdf pool) ---
+def _tree_rss() -> int:
+    me, kids, total = os.getpid(), {}, 0
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                parts = f.read().rsplit(")", 1)[1].split()
+            kids.setdefault(int(parts[1]), []).append(int(pid))
+        except OSError:
+            pass
+    stack = [me]
+    while stack:
+        pid = stack.pop()
+        stack += kids.get(pid, [])
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            pass
+    return total
+
+class _RssSampler(threading.Thread):
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak, self._done = 0, threading.Event()
+    def run(self):
+        while not self._done.wait(0.05):
+            self.peak = max(self.peak, _tree_rss())
+    def stop(self) -> int:
+        self._done.set()
+        self.join()
+        return self.peak
+
+# --- Load ---
+async def _one(client, files: dict, cid: int, results: list):
+    body = {name: (name, open(path, "rb").read()) for name, path in files.items()}
+    t0 = time.perf_counter()
+    r = await client.post("/api/", files=body, headers={"X-Client-Id": f"c{cid}", "X-Debug-Trace": "1"})
+    dur = time.perf_counter() - t0
+    stages = defaultdict(float)
+    for s in json.loads(r.headers.get("x-trace", "[]")):
+        stages[s["span"] + (f":{s['tool']}" if s["tool"] else "")] += s["ms"]
+    ok = r.status_code == 200 and isinstance(r.json(), list) and isinstance(r.json()[0], int) and r.json()[0] > 0
+    results.append({"status": r.status_code, "sec": dur, "ok": ok, "stages": dict(stages)})
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return round(xs[int(p * (len(xs) - 1))] * 1000, 1) if xs else 0.0
+
+async def run_level(app, files: dict, concurrency: int, n: int) -> dict:
+    import httpx
+    results: list = []
+    sampler = _RssSampler()
+    sampler.start()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=900) as client:
+        sem = asyncio.Semaphore(concurrency)
+        async def bounded(i):
+            async with sem:
+                await _one(client, files, i % concurrency, results)
+        t0 = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(n)))
+        wall = time.perf_counter() - t0
+    peak = sampler.stop()
+    lat = [r["sec"] for r in results if r["status"] == 200]
+    stages = defaultdict(list)
+    for r in results:
+        for k, ms in r["stages"].items():
+            stages[k].append(ms / 1000)
+    return {
+        "concurrency": concurrency, "requests": n, "wall_sec": round(wall, 3),
+        "throughput_rps": round(n / wall, 3), "status": dict(Counter(r["status"] for r in results)),
+        "complete": sum(r["ok"] for r in results),
+        "p50_ms": _pct(lat, 0.5), "p95_ms": _pct(lat, 0.95), "p99_ms": _pct(lat, 0.99),
+        "peak_rss_mb": round(peak / 2**20, 1),
+        "stages_p50_ms": {k: _pct(v, 0.5) for k, v in sorted(stages.items())},
+    }
+
+def _commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(old_path: str, new_path: str) -> None:
+    old, new = json.load(open(old_path)), json.load(open(new_path))
+    index = {(r["size"], r["concurrency"]): r for r in old["runs"]}
+    print(f"{old['commit']} -> {new['commit']}")
+    for r in new["runs"]:
+        o = index.get((r["size"], r["concurrency"]))
+        if not o:
+            continue
+        cells = []
+        for k in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb"):
+            delta = (r[k] - o[k]) / o[k] * 100 if o[k] else 0.0
+            cells.append(f"{k} {o[k]} -> {r[k]} ({delta:+.0f}%)")
+        print(f"{r['size']:>6} c={r['concurrency']:<3} " + "  ".join(cells))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="small,medium")
+    ap.add_argument("--concurrency", default=None, help="comma list, default 1,3,2*ADMIT_MAX_ACTIVE")
+    ap.add_argument("--requests", type=int, default=0, help="per level, default 2*concurrency (min 3)")
+    ap.add_argument("--latency", type=float, default=0.2, help="stub LLM seconds per call")
+    ap.add_argument("--warm", action="store_true", help="keep plan/memo/HTTP caches enabled")
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = ap.parse_args()
+    if args.compare:
+        return compare(*args.compare)
+
+    root = tempfile.mkdtemp(prefix="bench-e2e-")
+    stub = os.path.join(root, "stub.json")
+    os.environ.update({"LLM_PROVIDER": "stub", "LLM_STUB_FILE": stub, "LLM_STUB_LATENCY": str(args.latency)})
+    from app.settings import settings
+    settings.TRACE_ENABLED = settings.TRACE_DEBUG_HEADER = True
+    settings.HTTP_ALLOWLIST = ("127.0.0.1",)
+    if not args.warm:
+        settings.PLAN_CACHE_PATH = settings.MEMO_DIR = settings.HTTP_CACHE_DIR = settings.PLOT_CACHE_DIR = ""
+    from app.main import app
+
+    ocr = shutil.which("tesseract") is not None
+    if not ocr:
+        print("tesseract not found: image_ocr_to_text left out of the plan")
+    levels = [int(c) for c in args.concurrency.split(",")] if args.concurrency \
+        else sorted({1, 3, 2 * settings.ADMIT_MAX_ACTIVE})
+    runs = []
+    for size in args.sizes.split(","):
+        d = make_fixtures(root, size)
+        srv = _serve(d)
+        with open(stub, "w") as f:
+            json.dump({"json": stub_plan(f"http://127.0.0.1:{srv.server_address[1]}/page.html", settings.INGEST_FORMAT, ocr),
+                       "array": [None, None, None, None]}, f)
+        files = {n: os.path.join(d, n) for n in
+                 ("questions.txt", "sales.csv", "stock.xlsx", "report.pdf", "scan.png", "orders.json", "schema.sql")}
+        for c in levels:
+            res = asyncio.run(run_level(app, files, c, args.requests or max(3, 2 * c)))
+            res["size"] = size
+            res["upload_bytes"] = sum(os.path.getsize(p) for p in files.values())
+            runs.append(res)
+            print(f"{size:>6} c={c:<3} {res['throughput_rps']:.2f} req/s  p50 {res['p50_ms']:.0f} ms  "
+                  f"p95 {res['p95_ms']:.0f} ms  p99 {res['p99_ms']:.0f} ms  rss {res['peak_rss_mb']} MB  "
+                  f"complete {res['complete']}/{res['requests']}  {res['status']}")
+        srv.shutdown()
+
+    commit = _commit()
+    out = args.out or os.path.join(os.path.dirname(__file__), "results", f"e2e-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"commit": commit, "time": time.time(), "host": platform.node(), "cpus": os.cpu_count(),
+                   "python": platform.python_version(), "stub_latency": args.latency, "warm": args.warm,
+                   "ingest_format": settings.INGEST_FORMAT, "ocr": ocr, "runs": runs}, f, indent=1)
+    print(f"wrote {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""html_table_to_csv on large saved pages: the old path (read the page into a str,
+pd.read_html every table, keep tables[0]) vs agent/html_tables.py (one lxml
+parse, only the selected tables are built).
+
+    python -m bench.html_tables [tables] [rows_per_table]
+
+The page looks like a long Wikipedia article: prose, infoboxes, rowspan/colspan
+headers and footnotes. "x3" pulls three different tables off the same page, which
+the old path does with three full read_html passes and the new one with one
+(cached) parse. Each run happens in a fresh forked process so ru_maxrss is its own peak.
+"""
+import io, os, sys, time, random, resource, tempfile, multiprocessing as mp
+
+def make_page(path: str, tables: int, rows: int, seed: int = 0) -> None:
+    rnd = random.Random(seed)
+    words = "film gross studio release director box office record worldwide opening weekend".split()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<!DOCTYPE html><html><head><meta charset="utf-8"><title>List</title></head><body>')
+        for t in range(tables):
+            f.write(f"<h2>Section {t}</h2>")
+            f.write("<p>" + " ".join(rnd.choice(words) for _ in range(400)) + '<sup class="reference">[1]</sup></p>')
+            f.write(f'<table class="wikitable sortable"><caption>Table {t}</caption><thead>'
+                    '<tr><th rowspan="2">Rank</th><th rowspan="2">Title</th><th colspan="2">Gross</th>'
+                    '<th rowspan="2">Year</th></tr><tr><th>Worldwide</th><th>Domestic</th></tr></thead><tbody>')
+            for r in range(rows):
+                year = f'<td rowspan="2">{1990 + r % 30}</td>' if r % 2 == 0 else ""
+                f.write(f"<tr><td>{r + 1}</td><td><i>{rnd.choice(words).title()} {r}</i>"
+                        f'<sup class="reference">[{r % 9}]</sup></td>'
+                        f"<td>${rnd.randrange(10**8, 3 * 10**9):,}</td><td>{rnd.randrange(10**7, 10**9):,}</td>{year}</tr>")
+            f.write("</tbody></table>")
+        f.write("</body></html>")
+
+def _old(path, out, picks):
+    import pandas as pd
+    from agent.tools import save_table
+    for i, _ in enumerate(picks):
+        html = open(path, "r", encoding="utf-8", errors="ignore").read()
+        save_table(pd.read_html(io.StringIO(html))[0], f"{out}.{i}.csv")
+
+def _new(path, out, picks):
+    from agent.tools import html_table_to_csv
+    for i, match in enumerate(picks):
+        html_table_to_csv(path, "table.wikitable", f"{out}.{i}.csv", match=match)
+
+def _child(fn, path, out, picks, q):
+    import pandas, lxml.html  # noqa: F401  (imports are not part of the measurement)
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    fn(path, out, picks)
+    q.put((time.perf_counter() - t0, base, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+def main():
+    tables = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    ctx = mp.get_context("fork")
+    with tempfile.TemporaryDirectory() as d:
+        page = os.path.join(d, "page.html")
+        make_page(page, tables, rows)
+        size = os.path.getsize(page)
+        print(f"{tables} tables x {rows} rows, {size / 2**20:.1f} MB page")
+        for label, picks in (("x1", [r"^Table 0$"]),
+                             ("x3", [r"^Table 0$", rf"^Table {tables // 2}$", rf"^Table {tables - 1}$"])):
+            for name, fn in (("old", _old), ("new", _new)):
+                q = ctx.Queue()
+                p = ctx.Process(target=_child, args=(fn, page, os.path.join(d, name), picks, q))
+                p.start()
+                sec, base, peak = q.get()
+                p.join()
+                grown = (peak - base) * 1024
+                print(f"  {label} {name}: {sec:6.2f} s  peak +{grown / 2**20:6.0f} MB ({grown / size:4.1f}x page)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Parse time and file size of ingest outputs: CSV vs Parquet vs Arrow IPC.
+
+    python -m bench.ingest_format [rows]
+"""
+import os, sys, time, tempfile
+import numpy as np
+import pandas as pd
+from agent.tools import save_table, read_table
+
+def _frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "id": np.arange(rows),
+        "x": rng.normal(size=rows),
+        "y": rng.integers(0, 1_000_000, size=rows),
+        "when": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 10**6, size=rows), unit="s"),
+        "cat": rng.choice(["alpha", "beta", "gamma", "delta"], size=rows),
+        "label": pd.Series(rng.integers(0, 10**9, size=rows)).astype(str),
+    })
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    df = _frame(rows)
+    with tempfile.TemporaryDirectory() as d:
+        for fmt in ("csv", "parquet", "arrow"):
+            t0 = time.perf_counter()
+            path = save_table(df, os.path.join(d, "t.csv"), fmt)
+            t_write = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            back = read_table(path)
+            t_read = time.perf_counter() - t0
+            kept = (back.dtypes == df.dtypes).sum()
+            print(f"{fmt:>8}: {os.path.getsize(path)/2**20:8.1f} MB  write {t_write:6.2f} s  "
+                  f"read {t_read:6.2f} s  dtypes kept {kept}/{len(df.columns)}")
+
+if __name__ == "__main__":
+    main()
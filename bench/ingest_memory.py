@@ -0,0 +1,46 @@
+"""Peak RSS of csv_to_df ingest: whole-file read vs streaming (agent/ingest.py).
+
+    python -m bench.ingest_memory [rows]
+
+Each run happens in a fresh forked process so ru_maxrss is its own peak.
+"""
+import os, sys, time, resource, tempfile, multiprocessing as mp
+from app.settings import settings
+from agent.tools import csv_to_df, save_table
+from agent.ingest import ingest_table
+from bench.ingest_format import _frame
+
+def _whole(src, out, fmt):
+    return save_table(csv_to_df(src), out, fmt)
+
+def _stream(src, out, fmt):
+    settings.INGEST_STREAM_MIN_BYTES = 0
+    return ingest_table(src, out, fmt)
+
+def _child(fn, src, out, fmt, q):
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    path = fn(src, out, fmt)
+    q.put((time.perf_counter() - t0, base, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, os.path.getsize(path)))
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    ctx = mp.get_context("fork")
+    with tempfile.TemporaryDirectory() as d:
+        src = os.path.join(d, "upload.csv")
+        _frame(rows).to_csv(src, index=False)
+        size = os.path.getsize(src)
+        print(f"{rows} rows, {size / 2**20:.0f} MB csv, INGEST_MEMORY_MB={settings.INGEST_MEMORY_MB}")
+        for fmt in ("csv", "parquet", "arrow"):
+            for label, fn in (("whole", _whole), ("stream", _stream)):
+                q = ctx.Queue()
+                p = ctx.Process(target=_child, args=(fn, src, os.path.join(d, f"{label}.csv"), fmt, q))
+                p.start()
+                sec, base, peak, out = q.get()
+                p.join()
+                grown = (peak - base) * 1024
+                print(f"{fmt:>8} {label:>6}: {sec:6.2f} s  peak +{grown / 2**20:6.0f} MB "
+                      f"({grown / size:4.1f}x file)  output {out / 2**20:6.1f} MB")
+
+if __name__ == "__main__":
+    main()
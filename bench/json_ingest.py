@@ -0,0 +1,99 @@
+"""JSON uploads: json_load before (json.load + json.dump) vs now (validate, link),
+and json_to_df (streamed, flattened, typed) vs loading + json_normalize in pandas.
+
+    python -m bench.json_ingest [records]
+
+Each run happens in a fresh forked process so ru_maxrss is its own peak. The
+last lines time one DuckDB group-by over the raw JSON vs the json_to_df output.
+"""
+import os, sys, json, time, random, resource, tempfile, multiprocessing as mp
+from app.settings import settings
+
+def make_json(path: str, n: int, ndjson: bool = False, seed: int = 0) -> None:
+    rnd = random.Random(seed)
+    cities = ["Paris", "Delhi", "Lima", "Oslo", "Cairo", "Quito", "Seoul", "Perth"]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("" if ndjson else "[")
+        for i in range(n):
+            rec = {"id": i, "ts": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T10:00:00Z",
+                   "user": {"name": f"user{rnd.randrange(50_000)}", "city": rnd.choice(cities),
+                            "geo": {"lat": round(rnd.uniform(-90, 90), 5), "lon": round(rnd.uniform(-180, 180), 5)}},
+                   "amount": round(rnd.uniform(1, 500), 2), "items": rnd.randrange(1, 9),
+                   "tags": rnd.sample(["new", "promo", "gift", "bulk"], rnd.randrange(3)), "paid": rnd.random() < 0.8}
+            f.write(json.dumps(rec) + "\n" if ndjson else ("," if i else "") + json.dumps(rec))
+        f.write("" if ndjson else "]")
+
+def _old_load(src, out):
+    with open(src, "r", encoding="utf-8") as f:
+        obj = json.load(f)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    return out
+
+def _new_load(src, out):
+    from agent.ingest import ingest_json
+    return ingest_json(src, out)
+
+def _old_table(src, out):
+    import pandas as pd
+    from agent.tools import save_table
+    with open(src, "r", encoding="utf-8") as f:
+        text = f.read()
+    try:
+        obj = json.loads(text)
+    except ValueError:  # NDJSON
+        obj = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return save_table(pd.json_normalize(obj), out, "parquet")
+
+def _new_table(src, out):
+    from agent.ingest import ingest_table
+    return ingest_table(src, out, "parquet", kind="json")
+
+def _child(fn, src, out, q):
+    import pandas, pyarrow, agent.ingest  # noqa: F401  (imports are not part of the measurement)
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    try:
+        path = fn(src, out)
+    except ValueError as e:  # json.load rejects NDJSON
+        q.put((None, str(e), 0, None))
+        return
+    q.put((time.perf_counter() - t0, base, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, path))
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    ctx = mp.get_context("fork")
+    with tempfile.TemporaryDirectory() as d:
+        for kind in ("json", "ndjson"):
+            src = os.path.join(d, f"dump.{kind}")
+            make_json(src, n, ndjson=kind == "ndjson")
+            size = os.path.getsize(src)
+            print(f"{kind}: {n} records, {size / 2**20:.0f} MB, INGEST_MEMORY_MB={settings.INGEST_MEMORY_MB}")
+            outs = {}
+            for label, fn in (("json_load old", _old_load), ("json_load new", _new_load),
+                              ("table old", _old_table), ("json_to_df new", _new_table)):
+                out = os.path.join(d, label.replace(" ", "_") + (".json" if "load" in label else ".csv"))
+                q = ctx.Queue()
+                p = ctx.Process(target=_child, args=(fn, src, out, q))
+                p.start()
+                sec, base, peak, outs[label] = q.get()
+                p.join()
+                if sec is None:
+                    print(f"  {label:>15}: fails ({base[:50]})")
+                    continue
+                grown = (peak - base) * 1024
+                print(f"  {label:>15}: {sec:6.2f} s  peak +{grown / 2**20:6.0f} MB ({grown / size:4.1f}x file)")
+
+            import duckdb
+            sql = "SELECT \"user.city\" AS city, count(*), sum(amount) FROM {} GROUP BY 1"
+            con = duckdb.connect()
+            for label, rel in (("raw json", f"(SELECT user.city AS \"user.city\", amount FROM read_json_auto('{src}'))"),
+                               ("json_to_df", f"read_parquet('{outs['json_to_df new']}')")):
+                t0 = time.perf_counter()
+                con.execute(sql.format(rel)).fetchall()
+                print(f"  duckdb group-by over {label:>10}: {time.perf_counter() - t0:6.2f} s")
+            con.close()
+            os.remove(src)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""LLM client throughput against the local stub provider.
+
+    LLM_PROVIDER=stub LLM_STUB_LATENCY=0.2 LLM_STUB_JITTER=0.3 python -m bench.llm_throughput [requests] [concurrency]
+"""
+import os, sys, time, asyncio, statistics
+from app.settings import settings
+from agent import llm
+
+async def _one(lat: list):
+    t0 = time.perf_counter()
+    await llm.allm_array("system", "user", model="stub")
+    lat.append(time.perf_counter() - t0)
+
+async def _run(n: int) -> list:
+    lat: list = []
+    await asyncio.gather(*(_one(lat) for _ in range(n)))
+    return lat
+
+def main():
+    if llm.PROVIDER != "stub":
+        sys.exit("set LLM_PROVIDER=stub")
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    if len(sys.argv) > 2:
+        settings.LLM_MAX_CONCURRENCY = int(sys.argv[2])
+    for hedge in (0.0, 0.01):
+        settings.LLM_HEDGE_P95_SEC = hedge
+        asyncio.run(_run(40))  # warm the latency window
+        t0 = time.perf_counter()
+        lat = sorted(asyncio.run(_run(n)))
+        wall = time.perf_counter() - t0
+        print(f"hedge={'on ' if hedge else 'off'} concurrency={settings.LLM_MAX_CONCURRENCY}: "
+              f"{n / wall:7.1f} req/s  p50 {statistics.median(lat)*1000:6.0f} ms  "
+              f"p95 {lat[int(0.95 * (n - 1))]*1000:6.0f} ms  p99 {lat[int(0.99 * (n - 1))]*1000:6.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""OCR of generated scans with known text: one raw tesseract call per image,
+images one after another, vs image_ocr_to_text (preprocessed, tiled, parallel).
+
+    python -m bench.ocr [images] [lines_per_image]
+
+Accuracy is the word-level similarity (difflib) between OCR output and the
+text that was drawn.
+"""
+import os, sys, time, random, difflib, shutil, tempfile
+from concurrent.futures import ThreadPoolExecutor
+import matplotlib
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from app.settings import settings
+from agent.tools import image_ocr_to_text
+
+WORDS = ("revenue quarter region north south east west total growth margin invoice customer "
+         "product shipped pending returned average median units price discount 2019 2020 2021").split()
+
+def make_scan(path: str, lines: int, seed: int) -> str:
+    rnd = random.Random(seed)
+    font = ImageFont.truetype(os.path.join(matplotlib.get_data_path(), "fonts/ttf/DejaVuSans.ttf"), 40)
+    text = [" ".join(rnd.choice(WORDS) for _ in range(8)) for _ in range(lines)]
+    img = Image.new("RGB", (2550, 120 + 64 * lines), (228, 226, 220))  # 8.5in wide at 300 dpi, greyish paper
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(text):
+        draw.text((120, 60 + 64 * i), line, fill=(50, 50, 60), font=font)
+    img = img.filter(ImageFilter.GaussianBlur(0.8))
+    img.save(path, dpi=(300, 300))
+    return "\n".join(text)
+
+def _accuracy(truth: str, got: str) -> float:
+    return difflib.SequenceMatcher(None, truth.split(), got.split(), autojunk=False).ratio()
+
+def _baseline(path: str) -> str:
+    import pytesseract
+    return pytesseract.image_to_string(Image.open(path))
+
+def _pipeline(path: str) -> str:
+    with open(image_ocr_to_text(path), encoding="utf-8") as f:
+        return f.read()
+
+def main():
+    if shutil.which("tesseract") is None:
+        print("tesseract binary not found; install tesseract-ocr to run this benchmark")
+        return
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    lines = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    with tempfile.TemporaryDirectory() as d:
+        scans = []
+        for i in range(n):
+            p = os.path.join(d, f"scan{i}.png")
+            scans.append((p, make_scan(p, lines, i)))
+        print(f"{n} scans x {lines} lines, LIMIT_OCR={settings.LIMIT_OCR}, tile {settings.OCR_TILE_PX}px")
+
+        t0 = time.perf_counter()
+        base = [_baseline(p) for p, _ in scans]
+        t_base = time.perf_counter() - t0
+        # Images run side by side, as separate ingest steps do in the executor
+        os.environ.setdefault("OMP_THREAD_LIMIT", "1")  # as app.main sets at startup
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=settings.EXECUTOR_WORKERS) as pool:
+            new = list(pool.map(_pipeline, [p for p, _ in scans]))
+        t_new = time.perf_counter() - t0
+
+        acc = lambda outs: sum(_accuracy(t, o) for (_, t), o in zip(scans, outs)) / n
+        print(f"  baseline: {t_base:6.2f} s  accuracy {acc(base):.3f}")
+        print(f"  pipeline: {t_new:6.2f} s  accuracy {acc(new):.3f}  speedup {t_base / t_new:.1f}x")
+
+if __name__ == "__main__":
+    main()
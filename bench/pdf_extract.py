@@ -0,0 +1,44 @@
+"""pdf_to_text / pdf_tables_to_csv: serial vs page-parallel on a generated PDF.
+
+    python -m bench.pdf_extract [pages]
+"""
+import os, sys, time, tempfile
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from app.settings import settings
+from agent.tools import pdf_to_text, pdf_tables_to_csv
+
+def make_pdf(path: str, pages: int) -> None:
+    with PdfPages(path) as pdf:
+        for i in range(pages):
+            fig, ax = plt.subplots(figsize=(8.27, 11.69))
+            ax.axis("off")
+            ax.text(0.05, 0.95, f"Report page {i + 1}", fontsize=14, va="top")
+            for j in range(30):
+                ax.text(0.05, 0.9 - j * 0.015, f"Line {j} of page {i + 1}: lorem ipsum dolor sit amet {i * j}", fontsize=7)
+            rows = [[f"r{r}", str(i * r), f"{r * 1.5:.1f}"] for r in range(12)]
+            ax.table(cellText=rows, colLabels=["name", "value", "score"], bbox=[0.05, 0.05, 0.9, 0.35])
+            pdf.savefig(fig)
+            plt.close(fig)
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as d:
+        src = os.path.join(d, "report.pdf")
+        make_pdf(src, pages)
+        workers = settings.PDF_WORKERS
+        for label, n in (("serial", 1), (f"{workers} workers", workers)):
+            settings.PDF_WORKERS = n
+            t0 = time.perf_counter()
+            txt = pdf_to_text(src)
+            t_text = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            csvs = pdf_tables_to_csv(src, os.path.join(d, f"tables{n}"))
+            t_tab = time.perf_counter() - t0
+            print(f"{label:>10}: text {t_text:6.2f} s ({os.path.getsize(txt)} B)  "
+                  f"tables {t_tab:6.2f} s ({len(csvs)} csv)")
+
+if __name__ == "__main__":
+    main()
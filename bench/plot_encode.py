@@ -0,0 +1,61 @@
+"""Fitting plots under MAX_PLOT_BYTES: re-render-at-lower-dpi loop vs plotenc.
+
+    python -m bench.plot_encode
+
+The naive loop is what job code typically does by hand: savefig, check the
+size, drop the dpi, savefig again.
+"""
+import io, time, base64, tempfile, os
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from app.settings import settings
+from agent.sandbox_lib import plotenc
+
+def _figures():
+    rng = np.random.default_rng(0)
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.plot(np.cumsum(rng.normal(size=500)))
+    ax.set_title("line")
+    yield "line", fig
+    fig, ax = plt.subplots(figsize=(10, 8))
+    x = rng.normal(size=200_000)
+    ax.scatter(x, x + rng.normal(size=x.size), s=1, c=rng.random(x.size), cmap="viridis")
+    yield "scatter 200k", fig
+    fig, ax = plt.subplots(figsize=(12, 9))
+    im = ax.imshow(rng.random((400, 400)), cmap="magma")
+    fig.colorbar(im)
+    yield "noisy heatmap", fig
+
+def _naive(fig, max_bytes):
+    tries, dpi = 0, 100
+    while True:
+        tries += 1
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=dpi)
+        uri = "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode()
+        if len(uri) <= max_bytes or dpi <= 10:
+            return uri, tries
+        dpi = int(dpi * 0.8)
+
+def main():
+    max_bytes = settings.MAX_PLOT_BYTES
+    os.environ["PLOT_CACHE_DIR"] = tempfile.mkdtemp(prefix="plotenc-")
+    for name, fig in _figures():
+        t0 = time.perf_counter()
+        uri, tries = _naive(fig, max_bytes)
+        t_naive = time.perf_counter() - t0
+        for label in ("plotenc", "plotenc cached"):
+            attempts = []
+            t0 = time.perf_counter()
+            out = plotenc.encode_figure(fig, max_bytes, attempts=attempts)
+            t_enc = time.perf_counter() - t0
+            steps = ", ".join(f"{a['strategy']} {a['bytes']}B {a['ms']:.0f}ms" for a in attempts)
+            print(f"{name:>14} {label:>15}: {t_enc * 1000:6.0f} ms  {len(out):6d} B  [{steps}]")
+        print(f"{name:>14} {'naive dpi loop':>15}: {t_naive * 1000:6.0f} ms  {len(uri):6d} B  ({tries} renders"
+              f"{', over budget' if len(uri) > max_bytes else ''})")
+        plt.close(fig)
+
+if __name__ == "__main__":
+    main()
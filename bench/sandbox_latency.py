@@ -0,0 +1,32 @@
+"""Per-job python_exec latency: fresh subprocess vs warm worker pool.
+
+    python -m bench.sandbox_latency [jobs]
+"""
+import sys, time, tempfile, statistics
+from app.settings import settings
+import agent.sandbox as sb
+
+JOB = "import pandas as pd, numpy as np\nimport matplotlib.pyplot as plt\nprint(pd.DataFrame({'a': np.arange(10)}).a.sum())\n"
+
+def _measure(n: int) -> list:
+    times = []
+    with tempfile.TemporaryDirectory() as d:
+        for _ in range(n):
+            t0 = time.perf_counter()
+            rc, out, err = sb.python_exec(JOB, d, timeout_sec=settings.TOOL_TIMEOUT)
+            times.append(time.perf_counter() - t0)
+            assert rc == 0, err
+    return times
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    settings.SANDBOX_POOL_SIZE = 0
+    cold = _measure(n)
+    settings.SANDBOX_POOL_SIZE = 1
+    sb.get_pool()._idle.queue[0].wait_ready()
+    warm = _measure(n)
+    for name, t in (("subprocess", cold), ("warm pool", warm)):
+        print(f"{name:>10}: median {statistics.median(t)*1000:.1f} ms  max {max(t)*1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Cold start and memory per worker: plain uvicorn vs app.serve (preload + fork + warm-up).
+
+    python -m bench.startup [workers]
+
+For each mode: seconds until /health is 200, first /api latency (stub LLM),
+then RSS and PSS of the web processes. PSS splits shared pages between the
+processes mapping them, so copy-on-write sharing shows up there, not in RSS.
+Sandbox workers are reported separately.
+"""
+import os, sys, time, json, socket, subprocess
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _mem(pid: int):
+    rss = pss = 0
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"): rss = int(line.split()[1])
+                elif line.startswith("Pss:"): pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss / 1024, pss / 1024
+
+def _children(pid: int):
+    # Scan /proc: task/<tid>/children only lists children forked by that thread
+    out = []
+    for d in os.listdir("/proc"):
+        if not d.isdigit():
+            continue
+        try:
+            with open(f"/proc/{d}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            out.append(int(d))
+    return out
+
+def _cmdline(pid: int) -> str:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode()
+    except OSError:
+        return ""
+
+def run(label: str, cmd, env_extra: dict, workers: int):
+    port = _free_port()
+    env = {**os.environ, "LLM_PROVIDER": "stub", "PORT": str(port), **env_extra}
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([a.format(port=port) for a in cmd], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    ready = None
+    try:
+        with httpx.Client(timeout=5) as c:
+            while time.perf_counter() - t0 < 180:
+                try:
+                    if c.get(url + "/health").status_code == 200:
+                        ready = time.perf_counter() - t0
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.05)
+            t1 = time.perf_counter()
+            r = c.post(url + "/api/", files={"questions.txt": ("questions.txt", b"1) How many rows?\n")}, timeout=120)
+            first = time.perf_counter() - t1
+        time.sleep(0.5)
+        web = [proc.pid] + [p for p in _children(proc.pid) if "sandbox_worker" not in _cmdline(p)]
+        sandbox = [c for p in web for c in _children(p) if "sandbox_worker" in _cmdline(c)]
+        mem = [_mem(p) for p in web]
+        sb = [_mem(p) for p in sandbox]
+        servers = mem[1:] if len(mem) > 1 else mem
+        res = {"mode": label, "workers": workers, "ready_sec": round(ready or -1, 2),
+               "first_api_ms": round(first * 1000), "status": r.status_code,
+               "worker_rss_mb": round(sum(m[0] for m in servers) / len(servers), 1),
+               "worker_pss_mb": round(sum(m[1] for m in servers) / len(servers), 1),
+               "web_total_pss_mb": round(sum(m[1] for m in mem), 1),
+               "sandbox_total_pss_mb": round(sum(m[1] for m in sb), 1)}
+        print(json.dumps(res))
+        return res
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    py = sys.executable
+    run("uvicorn (no warm-up)", [py, "-m", "uvicorn", "app.main:app", "--port", "{port}"], {"WARMUP": "false"}, 1)
+    run("uvicorn", [py, "-m", "uvicorn", "app.main:app", "--port", "{port}"], {}, 1)
+    run("app.serve", [py, "-m", "app.serve", "--host", "127.0.0.1", "--workers", str(n)], {}, n)
+    run("uvicorn --workers", [py, "-m", "uvicorn", "app.main:app", "--port", "{port}", "--workers", str(n)], {}, n)
+
+if __name__ == "__main__":
+    main()
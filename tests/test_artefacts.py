@@ -0,0 +1,11 @@
+from agent.artefacts import link_input
+
+def test_job_rewrite_does_not_reach_source(tmp_path):
+    src, dst = tmp_path / "in.csv", tmp_path / "job" / "in.csv"
+    src.write_text("a\n1\n")
+    dst.parent.mkdir()
+    link_input(str(src), str(dst))
+    with open(dst, "r+") as f:
+        f.write("b\n300\n")
+    assert src.read_text() == "a\n1\n"
+    assert src.stat().st_ino != dst.stat().st_ino
@@ -0,0 +1,22 @@
+import csv
+from agent.tools import duckdb_query
+
+def _csv(tmp_path):
+    path = tmp_path / "t.csv"
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["x", "price"])
+        w.writerows([(i, f"{i}.25") for i in range(10)])
+    return str(path)
+
+def test_integer_sum_and_count_stay_int(tmp_path):
+    t = _csv(tmp_path)
+    total = duckdb_query("SELECT SUM(x) FROM t", {"t": t}, str(tmp_path / "s.json"))
+    count = duckdb_query("SELECT COUNT(*) FROM t", {"t": t}, str(tmp_path / "c.json"))
+    assert (total, type(total)) == (45, int)
+    assert (count, type(count)) == (10, int)
+
+def test_fractional_decimal_is_float(tmp_path):
+    t = _csv(tmp_path)
+    v = duckdb_query("SELECT SUM(CAST(price AS DECIMAL(10,2))) FROM t", {"t": t}, str(tmp_path / "p.json"))
+    assert (v, type(v)) == (47.5, float)
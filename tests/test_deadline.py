@@ -0,0 +1,52 @@
+import os, time
+from concurrent.futures import wait
+from fastapi.testclient import TestClient
+from agent import executor
+from agent.deadline import Deadline, track_stragglers
+import app.main as main
+
+def _steps(n, chain=True):
+    return [{"kind": "python_job", "spec": {"id": f"j{i}"}, "index": i, "deps": {i - 1} if chain and i else set()}
+            for i in range(n)]
+
+def _fake_jobs(monkeypatch, seconds):
+    started = []
+
+    def run_job(spec, index, snapshot, derived_dir, max_plot_bytes, timeout):
+        started.append(index)
+        time.sleep(seconds)
+        return {spec["id"]: index}
+    monkeypatch.setattr(executor, "_run_job", run_job)
+    return started
+
+def test_nothing_starts_after_the_deadline(monkeypatch, tmp_path):
+    started = _fake_jobs(monkeypatch, 0)
+    errors = []
+    executor._run_graph(_steps(2), {}, str(tmp_path), str(tmp_path), 1000, 2, deadline=Deadline(0), errors=errors)
+    assert started == [] and "deadline reached" in errors[0]
+
+def test_running_steps_are_handed_over_not_forgotten(monkeypatch, tmp_path):
+    _fake_jobs(monkeypatch, 0.5)
+    stragglers = track_stragglers()
+    artefacts, errors = {}, []
+    executor._run_graph(_steps(2), artefacts, str(tmp_path), str(tmp_path), 1000, 2,
+                        deadline=Deadline(0.1), errors=errors)
+    assert artefacts == {} and len(stragglers) == 1
+    wait(stragglers, timeout=5)
+    assert all(f.done() for f in stragglers)
+
+def test_slot_and_workdir_outlive_an_overrunning_pipeline(monkeypatch):
+    events = []
+
+    def answer_request(questions_txt, attachments, workdir, deadline):
+        time.sleep(deadline.remaining() + 2.5)  # past the handler's own wait
+        events.append(("pipeline done", os.path.isdir(workdir)))
+        return [1]
+
+    monkeypatch.setattr(main.settings, "GLOBAL_TIMEOUT", 0.2)
+    monkeypatch.setattr(main, "answer_request", answer_request)
+    release = main.admission.release
+    monkeypatch.setattr(main.admission, "release", lambda sec: (events.append(("release", None)), release(sec)))
+    r = TestClient(main.app).post("/api/", files={"questions.txt": ("questions.txt", b"1) How many?\n")})
+    assert r.status_code == 200 and r.json() != [1]  # placeholders, sent at the deadline
+    assert events == [("pipeline done", True), ("release", None)]
@@ -0,0 +1,73 @@
+import os, time, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx, pytest
+from agent.fetcher import Fetcher, HttpCache
+
+class _Handler(BaseHTTPRequestHandler):
+    body = b"v1"
+    validators = {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    seen = []
+
+    def do_GET(self):
+        cond = {k: self.headers[k] for k in ("If-None-Match", "If-Modified-Since") if self.headers[k]}
+        fresh = any(k in cond and cond[k] == self.validators.get(v) for k, v in
+                    (("If-None-Match", "ETag"), ("If-Modified-Since", "Last-Modified")))
+        self.seen.append((self.path, 304 if fresh else 200, cond))
+        self.send_response(304 if fresh else 200)
+        for k, v in self.validators.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", "0" if fresh else str(len(self.body)))
+        self.end_headers()
+        if not fresh:
+            self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    _Handler.seen = []
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}", _Handler
+    srv.shutdown()
+    srv.server_close()
+
+def test_miss_then_revalidated_hit(server, tmp_path):
+    base, handler = server
+    f = Fetcher(HttpCache(str(tmp_path), 1 << 20))
+    assert f.fetch(base + "/a") == b"v1"
+    assert f.fetch(base + "/a") == b"v1"
+    assert [s[1] for s in handler.seen] == [200, 304]
+    assert handler.seen[1][2] == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+
+def test_last_modified_only(server, tmp_path, monkeypatch):
+    base, handler = server
+    monkeypatch.setattr(handler, "validators", {"Last-Modified": "Tue, 02 Jan 2024 00:00:00 GMT"})
+    f = Fetcher(HttpCache(str(tmp_path), 1 << 20))
+    f.fetch(base + "/b")
+    assert f.fetch(base + "/b") == b"v1"
+    assert [s[1] for s in handler.seen] == [200, 304]
+
+def test_changed_resource_is_refetched(server, tmp_path, monkeypatch):
+    base, handler = server
+    f = Fetcher(HttpCache(str(tmp_path), 1 << 20))
+    assert f.fetch(base + "/c") == b"v1"
+    monkeypatch.setattr(handler, "body", b"v2")
+    monkeypatch.setattr(handler, "validators", {"ETag": '"v2"'})
+    assert f.fetch(base + "/c") == b"v2"
+    assert f.fetch(base + "/c") == b"v2"
+    assert [s[1] for s in handler.seen] == [200, 200, 304]
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = HttpCache(str(tmp_path), 10)
+    cache.put("u1", b"aaaa", httpx.Headers())
+    cache.put("u2", b"bbbb", httpx.Headers())
+    past = time.time() - 60
+    os.utime(cache._paths("u1")[1], (past, past))
+    os.utime(cache._paths("u2")[1], (past - 60, past - 60))
+    cache.touch("u2")
+    cache.put("u3", b"cccc", httpx.Headers())
+    assert cache.get("u1") is None
+    assert cache.get("u2")["content"] == b"bbbb"
+    assert cache.get("u3")["content"] == b"cccc"
@@ -0,0 +1,57 @@
+import os
+from agent.memo import StepMemo
+from app.settings import settings
+
+def _stored(tmp_path):
+    memo = StepMemo(str(tmp_path / "memo"), 1 << 20)
+    work = tmp_path / "w0"
+    (work / "derived").mkdir(parents=True)
+    out = work / "derived" / "t.csv"
+    out.write_text("x\n3\n")
+    memo.store("k", "csv_to_df", {"t": str(out), "n": 1}, str(work))
+    return memo
+
+def test_restore_is_isolated_from_job_writes(tmp_path):
+    memo = _stored(tmp_path)
+    for i in range(3):
+        got = memo.restore("k", str(tmp_path / f"r{i}"))
+        assert got["n"] == 1
+        with open(got["t"], "r+") as f:
+            assert f.read() == "x\n3\n"
+            f.seek(0)
+            f.write("x\n300\n")  # a job rewriting its input in place
+
+def test_corrupt_entry_is_a_miss_and_dropped(tmp_path):
+    memo = _stored(tmp_path)
+    entry = tmp_path / "memo" / "k"
+    data = next(p for p in entry.iterdir() if p.name != "manifest.json")
+    data.write_text("x\n300\n")
+    assert memo.restore("k", str(tmp_path / "r")) is None
+    assert not entry.exists()
+
+def test_invalidate_skips_inflight_stores(tmp_path):
+    memo = _stored(tmp_path)
+    inflight = tmp_path / "memo" / "j.tmp1.2"
+    inflight.mkdir()
+    assert memo.invalidate() == 1
+    assert inflight.exists()
+
+def test_key_covers_output_settings(tmp_path, monkeypatch):
+    memo = StepMemo(str(tmp_path / "memo"), 1 << 20)
+    spec = {"tool": "image_ocr_to_text", "args": {}}
+    before = memo.key(spec, [])
+    monkeypatch.setattr(settings, "OCR_TARGET_DPI", settings.OCR_TARGET_DPI + 1)
+    assert memo.key(spec, []) != before
+
+def test_eviction_keeps_recently_used(tmp_path):
+    memo = StepMemo(str(tmp_path / "memo"), 1 << 20)
+    work = tmp_path / "w"
+    work.mkdir()
+    for k in ("a", "b", "c"):
+        (work / f"{k}.bin").write_bytes(b"0" * 400)
+        memo.store(k, "csv_to_df", {"t": str(work / f"{k}.bin")}, str(work))
+        os.utime(tmp_path / "memo" / k / "manifest.json", (1000 + ord(k), 1000 + ord(k)))
+    memo.restore("a", str(tmp_path / "r"))
+    memo.max_bytes = 1200
+    memo._evict()
+    assert sorted(os.listdir(tmp_path / "memo")) == ["a", "c"]
@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+from PIL import Image
+from agent.tools import ocr_preprocess
+
+@pytest.mark.parametrize("img", [Image.new("L", (100, 100), 255), Image.new("RGB", (100, 100), (30, 90, 200))])
+def test_blank_image_skips_binarization(img):
+    out = ocr_preprocess(img)
+    assert out.mode == "L" and out.size == (100, 100)
+    assert len(np.unique(np.asarray(out))) == 1
+
+def test_two_tone_image_is_binarized():
+    a = np.full((100, 100), 200, np.uint8)
+    a[40:60, 10:90] = 60
+    out = np.asarray(ocr_preprocess(Image.fromarray(a)))
+    assert set(np.unique(out)) == {0, 255} and (out[40:60, 10:90] == 0).all()
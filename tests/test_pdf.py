@@ -0,0 +1,29 @@
+import os
+import pytest
+from agent import tools
+from app.settings import settings
+from bench.pdf_extract import make_pdf
+
+def _dies_in_worker(path, idx):
+    if os.getpid() != int(os.environ["TDS_TEST_PARENT"]):
+        os._exit(1)  # a worker killed mid-job (OOM, crash)
+    return tools._pdf_text_chunk(path, idx)
+
+@pytest.fixture
+def pdf(tmp_path, monkeypatch):
+    monkeypatch.setenv("TDS_TEST_PARENT", str(os.getpid()))
+    monkeypatch.setattr(settings, "PDF_WORKERS", 2)
+    monkeypatch.setattr(settings, "PDF_PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(tools, "_pdf_pool", None)
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, 4)
+    yield path
+    if tools._pdf_pool is not None:
+        tools._pdf_pool.shutdown()
+
+def test_broken_pool_falls_back_and_is_rebuilt(pdf):
+    expected = tools._pdf_text_chunk(pdf, list(range(4)))
+    assert tools._map_pages(pdf, None, _dies_in_worker) == expected
+    assert tools._pdf_pool is None
+    assert tools._map_pages(pdf, None, tools._pdf_text_chunk) == expected
+    assert tools._pdf_pool is not None
@@ -0,0 +1,48 @@
+import pytest
+from agent import plan_cache
+from agent.executor import execute_plan
+
+@pytest.fixture
+def cache(monkeypatch):
+    c = plan_cache.PlanCache(":memory:", 10, 3600)
+    monkeypatch.setattr(plan_cache, "get_plan_cache", lambda: c)
+    return c
+
+def _cached_plan(cache, contract):
+    cache.put("k", {"artefacts_contract": contract}, 1.0)
+    plan = cache.get("k")
+    plan["_cache"] = {"key": "k", "hit": True}
+    return plan
+
+def test_cached_plan_failing_contract_is_evicted(cache, tmp_path):
+    plan = _cached_plan(cache, {"answer": "json scalar/int"})
+    with pytest.raises(RuntimeError, match="Missing artefact"):
+        execute_plan(plan, str(tmp_path))
+    assert cache.get("k") is None
+
+def test_cached_plan_failing_best_effort_is_evicted(cache, tmp_path):
+    plan = _cached_plan(cache, {"answer": "json scalar/int"})
+    errors = []
+    execute_plan(plan, str(tmp_path), errors=errors)
+    assert errors and cache.get("k") is None
+
+def test_cached_plan_that_passes_is_kept(cache, tmp_path):
+    plan = _cached_plan(cache, {})
+    execute_plan(plan, str(tmp_path))
+    assert cache.get("k") == {"artefacts_contract": {}}
+
+class _LockedDB:
+    def execute(self, *args):
+        raise plan_cache.sqlite3.OperationalError("database is locked")
+
+    def commit(self): pass
+    def rollback(self): pass
+
+def test_sqlite_errors_never_break_a_request(cache, tmp_path):
+    plan = _cached_plan(cache, {})
+    cache._db = _LockedDB()
+    assert cache.get("k") is None
+    plan["_cache"] = {"key": "k2", "hit": False}
+    assert execute_plan(plan, str(tmp_path)) == {}  # remember_plan hits the locked db
+    cache.invalidate("k")
+    assert cache.stats()["errors"] == 3
@@ -0,0 +1,13 @@
+import os
+from agent.sandbox_lib import plotenc
+
+def test_cache_keeps_most_recent_entries(tmp_path, monkeypatch):
+    monkeypatch.setenv("PLOT_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(plotenc, "_CACHE_MAX_ENTRIES", 2)
+    for i, key in enumerate("abc"):
+        plotenc._cache_put(key, f"data:image/png;base64,{key}")
+        os.utime(tmp_path / f"{key}.datauri", (1000 + i, 1000 + i))
+    assert plotenc._cache_get("a") is None
+    assert plotenc._cache_get("b") == "data:image/png;base64,b"
+    plotenc._cache_put("d", "data:image/png;base64,d")
+    assert sorted(os.listdir(tmp_path)) == ["b.datauri", "d.datauri"]
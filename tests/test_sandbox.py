@@ -0,0 +1,19 @@
+import queue
+from agent import sandbox
+from app.settings import Settings
+
+def test_limit_sandbox_derived_from_configured_pool(monkeypatch):
+    monkeypatch.setenv("SANDBOX_POOL_SIZE", "512")
+    assert Settings().LIMIT_SANDBOX == 512
+    monkeypatch.setenv("LIMIT_SANDBOX", "3")
+    assert Settings().LIMIT_SANDBOX == 3
+
+class _BusyPool(sandbox.SandboxPool):
+    def __init__(self):
+        self._idle = queue.Queue()
+
+def test_busy_pool_falls_back_to_subprocess(monkeypatch, tmp_path):
+    monkeypatch.setattr(sandbox, "get_pool", _BusyPool)
+    monkeypatch.setattr(sandbox.settings, "SANDBOX_POOL_WAIT", 0.05)
+    rc, out, _ = sandbox._python_exec("print(6 * 7)", str(tmp_path), timeout_sec=20)
+    assert (rc, out.strip()) == (0, "42")
@@ -0,0 +1,40 @@
+import json
+from agent import sandbox
+from agent.trace import span, start_trace, trace_header
+
+def _spans(n):
+    return [{"span": f"step{i}", "tool": "csv_to_df", "ms": 1.5, "in": 10, "out": 20, "rss_delta_mb": 0.0, "ok": True}
+            for i in range(n)]
+
+def test_small_trace_is_unchanged():
+    spans = _spans(3)
+    assert json.loads(trace_header(spans)) == spans
+
+def test_large_trace_drops_trailing_spans_and_stays_valid():
+    spans = _spans(2000)
+    out = trace_header(spans, limit=16000)
+    assert len(out) <= 16000
+    got = json.loads(out)
+    assert got[:-1] == spans[:len(got) - 1]
+    assert got[-1]["truncated"] is True and got[-1]["dropped"] == 2000 - (len(got) - 1)
+
+def test_span_reports_its_own_rss_growth():
+    trace = start_trace()
+    with span("small"):
+        pass
+    with span("alloc"):
+        buf = bytearray(64 << 20)
+        buf[::4096] = b"x" * len(buf[::4096])  # touch every page
+    del buf
+    small, alloc = trace
+    assert alloc["rss_delta_mb"] >= 50 and small["rss_delta_mb"] < 50
+    assert "child_rss_mb" not in small
+
+def test_subprocess_sandbox_span_reports_child_peak(tmp_path, monkeypatch):
+    monkeypatch.setattr(sandbox.settings, "SANDBOX_POOL_SIZE", 0)
+    trace = start_trace()
+    rc, out, _ = sandbox.python_exec("b = bytearray(80 << 20); b[::4096] = b'x' * len(b[::4096]); print(len(b))",
+                                     str(tmp_path))
+    assert (rc, out.strip()) == (0, str(80 << 20))
+    run = [s for s in trace if s["span"] == "sandbox.run"][-1]
+    assert run["tool"] == "subprocess" and run["child_rss_mb"] >= 80
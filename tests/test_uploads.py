@@ -0,0 +1,33 @@
+import asyncio
+from starlette.requests import Request
+from app.uploads import stream_uploads
+
+def _request(body: bytes, boundary: str, chunk: int) -> Request:
+    parts = [body[i:i + chunk] for i in range(0, len(body), chunk)]
+
+    async def receive():
+        data = parts.pop(0) if parts else b""
+        return {"type": "http.request", "body": data, "more_body": bool(parts)}
+
+    headers = [(b"content-type", f"multipart/form-data; boundary={boundary}".encode())]
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive)
+
+def _body(boundary: str, files: dict) -> bytes:
+    out = b""
+    for name, data in files.items():
+        out += (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{name}\"\r\n"
+                f"Content-Type: application/octet-stream\r\n\r\n").encode() + data + b"\r\n"
+    return out + f"--{boundary}--\r\n".encode()
+
+def test_on_file_sees_every_part_as_it_completes(tmp_path):
+    files = {"questions.txt": b"1) rows?\n", "data.csv": b"x\n" + b"1\n" * 5000}
+    seen, sizes = [], []
+
+    def on_file(field, path):
+        seen.append(field)
+        sizes.append(open(path, "rb").read() == files[field])
+
+    got = asyncio.run(stream_uploads(_request(_body("b0undary", files), "b0undary", 1024), str(tmp_path),
+                                     1 << 20, 1 << 20, on_file=on_file))
+    assert seen == ["questions.txt", "data.csv"] == [f for f, _ in got]
+    assert all(sizes)  # each file was complete on disk when announced
@@ -0,0 +1,62 @@
+import os, threading, zipfile
+import pytest
+from agent import sandbox
+
+def _wheel(dirpath) -> None:
+    """A pure-python wheel for `tdsdemo`, so installs run offline from a wheelhouse."""
+    info = "tdsdemo-1.0.dist-info"
+    files = {
+        "tdsdemo.py": "ANSWER = 42\n",
+        f"{info}/METADATA": "Metadata-Version: 2.1\nName: tdsdemo\nVersion: 1.0\n",
+        f"{info}/WHEEL": "Wheel-Version: 1.0\nGenerator: test\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+    }
+    files[f"{info}/RECORD"] = "".join(f"{name},,\n" for name in files) + f"{info}/RECORD,,\n"
+    with zipfile.ZipFile(os.path.join(dirpath, "tdsdemo-1.0-py3-none-any.whl"), "w") as z:
+        for name, text in files.items():
+            z.writestr(name, text)
+
+@pytest.fixture
+def venvs(tmp_path, monkeypatch):
+    wheels = tmp_path / "wheels"
+    wheels.mkdir()
+    _wheel(str(wheels))
+    monkeypatch.setattr(sandbox.settings, "PIP_WHEELHOUSE", str(wheels))
+    monkeypatch.setattr(sandbox.settings, "VENV_CACHE_DIR", str(tmp_path / "venvs"))
+    monkeypatch.setattr(sandbox, "ALLOW_PIP", sandbox.ALLOW_PIP | {"tdsdemo"})
+    builds = []
+    real = sandbox._build_venv
+    monkeypatch.setattr(sandbox, "_build_venv", lambda vdir, safe, t: (builds.append(safe), real(vdir, safe, t)))
+    return tmp_path / "venvs", builds
+
+def test_concurrent_callers_share_one_offline_build(venvs, tmp_path):
+    root, builds = venvs
+    got = []
+
+    def call():
+        vdir, fd = sandbox.ensure_venv(["tdsdemo"], timeout_sec=120)
+        got.append(vdir)
+        sandbox._unlock_file(fd)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert builds == [["tdsdemo"]] and len(set(got)) == 1
+
+    rc, out, _ = sandbox.python_exec_with_venv("import tdsdemo; print(tdsdemo.ANSWER)", str(tmp_path),
+                                                pkgs=["tdsdemo"], timeout_sec=120)
+    assert (rc, out.strip()) == (0, "42")
+    assert builds == [["tdsdemo"]]  # repeat call is a hit
+
+def test_eviction_skips_env_in_use(venvs, monkeypatch):
+    root, builds = venvs
+    monkeypatch.setattr(sandbox.settings, "VENV_CACHE_MAX_BYTES", 1)
+    held, held_fd = sandbox.ensure_venv(["tdsdemo"], timeout_sec=120)
+    try:
+        other, fd = sandbox.ensure_venv([], timeout_sec=120)
+        sandbox._unlock_file(fd)
+        sandbox._evict_venvs(str(root), 1)
+        assert os.path.isdir(held) and not os.path.exists(other)
+    finally:
+        sandbox._unlock_file(held_fd)
+    sandbox._evict_venvs(str(root), 1)
+    assert not os.path.exists(held)